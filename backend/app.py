@@ -1,19 +1,27 @@
-from flask import Flask, request, jsonify
+from flask import Flask, request, jsonify, Response, stream_with_context, g
 from flask_cors import CORS
 import os
 import logging
 from dotenv import load_dotenv
 from config import Config
+from services.ai_service import ANSWER_UNAVAILABLE_MESSAGE, StreamInterrupted
 from services.course_builder import CourseBuilder
+from services.job_manager import CourseJobManager
+from utils.rate_limit import rate_limiter_stats
+from utils.single_flight import single_flight_stats
+from utils.metrics import CONTENT_TYPE as METRICS_CONTENT_TYPE, counter, histogram, render_metrics
+from utils.cache import build_tiered_cache
+from utils.documents import DocumentExtractor, DocumentExtractionTimeout, SpooledUpload, EXTRACTORS
 from functools import wraps
 import traceback
-from typing import Dict, Any, List
+import hashlib
+from contextlib import contextmanager
+from typing import Callable, Dict, Any, List
 import time
+import json
+import queue
+import threading
 from werkzeug.utils import secure_filename
-from io import BytesIO
-from PyPDF2 import PdfReader
-from docx import Document as DocxDocument
-from pptx import Presentation
 
 # Load environment variables
 load_dotenv()
@@ -50,6 +58,14 @@ except Exception as e:
     logger.error(f"Failed to initialize course builder: {e}")
     course_builder = None
 
+# Background executor for asynchronous course generation jobs
+job_manager = CourseJobManager(
+    course_builder,
+    max_workers=Config.JOB_WORKERS,
+    result_ttl=Config.JOB_RESULT_TTL,
+    path=Config.CACHE_DB_PATH
+) if course_builder else None
+
 # Validate configuration on startup
 try:
     Config.validate_config()
@@ -110,6 +126,97 @@ def validate_video_urls(data: Dict[str, Any]) -> List[str]:
     
     return validated_urls
 
+def parse_position_seconds(data: Dict[str, Any]):
+    """Read the optional playback position from an ask-question payload"""
+    position = data.get('position_seconds')
+    if position is None:
+        return None
+    if isinstance(position, bool) or not isinstance(position, (int, float)) or position < 0:
+        raise ValueError("'position_seconds' must be a non-negative number")
+    return float(position)
+
+# Server-Sent Events helpers
+SSE_KEEPALIVE_SECONDS = 15
+
+def format_sse(event: str, data: Any) -> str:
+    """Serialize one Server-Sent Event frame"""
+    return f"event: {event}\ndata: {json.dumps(data, default=str)}\n\n"
+
+def sse_response(events) -> Response:
+    """Wrap an SSE frame generator in a non-buffered streaming response"""
+    return Response(
+        stream_with_context(events),
+        mimetype='text/event-stream',
+        headers={
+            'Cache-Control': 'no-cache',
+            'X-Accel-Buffering': 'no'
+        }
+    )
+
+def background_sse(run: Callable[[Callable[[str, Any], None]], None], name: str):
+    """Call run(emit) on a background thread and yield what it emits as SSE frames.
+    
+    Keep-alive comments are sent while run is silent, so proxies don't drop the
+    connection during long phases. An exception from run becomes an 'error' event.
+    """
+    events: "queue.Queue" = queue.Queue()
+    
+    def worker():
+        try:
+            run(lambda event, payload: events.put((event, payload)))
+        except Exception as e:
+            logger.error(f"Streaming {name} failed: {e}")
+            events.put(("error", {"error": "Internal server error", "message": str(e)}))
+        finally:
+            events.put(None)
+    
+    threading.Thread(target=worker, name=f'{name}-stream', daemon=True).start()
+    
+    def generate():
+        while True:
+            try:
+                item = events.get(timeout=SSE_KEEPALIVE_SECONDS)
+            except queue.Empty:
+                yield ": keep-alive\n\n"
+                continue
+            if item is None:
+                break
+            yield format_sse(*item)
+    
+    return generate()
+
+# Per-route request metrics, keyed by URL rule so path parameters don't multiply series
+REQUEST_SECONDS = histogram(
+    'studyweave_http_request_duration_seconds',
+    'Request latency by route, until the response body (including streams) is sent',
+    ['method', 'route']
+)
+REQUESTS = counter(
+    'studyweave_http_requests_total',
+    'Requests by route and status code',
+    ['method', 'route', 'status']
+)
+
+@app.before_request
+def start_request_timer():
+    g.request_started = time.perf_counter()
+
+@app.after_request
+def record_request_metrics(response):
+    started = g.get('request_started')
+    if started is None:
+        return response
+    route = request.url_rule.rule if request.url_rule else 'unmatched'
+    method, status = request.method, str(response.status_code)
+
+    def observe():
+        REQUEST_SECONDS.observe(time.perf_counter() - started, method=method, route=route)
+        REQUESTS.inc(method=method, route=route, status=status)
+
+    # Streamed responses are still being generated here; record once they are closed
+    response.call_on_close(observe)
+    return response
+
 # Enhanced health check endpoint
 @app.route('/api/health', methods=['GET'])
 @handle_errors
@@ -131,9 +238,24 @@ def health_check():
         "status": "healthy" if status_code == 200 else "degraded",
         "message": "StudyWeave AI Backend Running",
         "services": services_status,
+        "caches": {
+            **course_builder.youtube_service.cache_stats(),
+            'concepts': course_builder.ai_service.concept_cache.stats(),
+            'answers': course_builder.ai_service.answer_cache.stats(),
+            'upload_notes': upload_notes_cache.stats()
+        } if course_builder else {},
+        "rate_limiters": rate_limiter_stats(),
+        "single_flight": single_flight_stats(),
+        "document_extraction": document_extractor.stats(),
         "version": "1.0.0"
     }), status_code
 
+# Prometheus scrape endpoint
+@app.route('/api/metrics', methods=['GET'])
+@handle_errors
+def metrics():
+    return Response(render_metrics(), content_type=METRICS_CONTENT_TYPE)
+
 # Main course generation endpoint
 @app.route('/api/generate-course', methods=['POST'])
 @handle_errors
@@ -165,10 +287,13 @@ def generate_course():
             "message": str(e)
         }), 400
     
+    # 'refresh' bypasses cached concept extractions for this request
+    use_cache = not bool(data.get('refresh', False))
+    
     logger.info(f"Generating course from {len(video_urls)} video URLs")
     
     # Build the course using our services
-    course_data = course_builder.build_course_from_videos(video_urls)
+    course_data = course_builder.build_course_from_videos(video_urls, use_cache=use_cache)
     
     if isinstance(course_data, dict) and "error" in course_data:
         return jsonify(course_data), 400
@@ -180,6 +305,132 @@ def generate_course():
     logger.info(f"Successfully generated course with {course_data.get('total_concepts', 0)} concepts")
     return jsonify(course_data)
 
+# Streaming course generation: emits SSE events as each pipeline stage completes
+@app.route('/api/generate-course/stream', methods=['POST'])
+@handle_errors
+def generate_course_stream():
+    """
+    Streaming variant of /api/generate-course
+    Emits one event per CourseBuilder stage, then a final 'course' (or 'error') event
+    """
+    if not course_builder:
+        return jsonify({
+            "error": "Service unavailable",
+            "message": "Course generation service is not available"
+        }), 503
+    
+    data = request.get_json(force=True)
+    if not data:
+        return jsonify({
+            "error": "Invalid request",
+            "message": "No JSON data provided"
+        }), 400
+    
+    try:
+        video_urls = validate_video_urls(data)
+    except ValueError as e:
+        return jsonify({
+            "error": "Invalid input",
+            "message": str(e)
+        }), 400
+    
+    use_cache = not bool(data.get('refresh', False))
+    
+    def run_build(emit):
+        course_data = course_builder.build_course_from_videos(
+            video_urls,
+            use_cache=use_cache,
+            on_progress=emit
+        )
+        if isinstance(course_data, dict) and "error" in course_data:
+            emit("error", course_data)
+        else:
+            course_data["generated_at"] = int(time.time())
+            course_data["api_version"] = "1.0.0"
+            emit("course", course_data)
+    
+    logger.info(f"Streaming course generation for {len(video_urls)} video URLs")
+    return sse_response(background_sse(run_build, 'course'))
+
+# Asynchronous course generation: returns a job ID immediately
+@app.route('/api/jobs/generate-course', methods=['POST'])
+@handle_errors
+def submit_course_job():
+    """
+    Queue course generation on the background executor
+    Poll /api/jobs/<job_id> for per-video progress and the finished course
+    """
+    if not job_manager:
+        return jsonify({
+            "error": "Service unavailable",
+            "message": "Course generation service is not available"
+        }), 503
+    
+    data = request.get_json(force=True)
+    if not data:
+        return jsonify({
+            "error": "Invalid request",
+            "message": "No JSON data provided"
+        }), 400
+    
+    try:
+        video_urls = validate_video_urls(data)
+    except ValueError as e:
+        return jsonify({
+            "error": "Invalid input",
+            "message": str(e)
+        }), 400
+    
+    job_id = job_manager.submit(video_urls, use_cache=not bool(data.get('refresh', False)))
+    if not job_id:
+        return jsonify({
+            "error": "Too many jobs",
+            "message": "The job queue is full. Please try again shortly."
+        }), 429
+    
+    return jsonify({
+        "job_id": job_id,
+        "status": "queued",
+        "status_url": f"/api/jobs/{job_id}",
+        "api_version": "1.0.0"
+    }), 202
+
+@app.route('/api/jobs/<job_id>', methods=['GET'])
+@handle_errors
+def get_course_job(job_id):
+    """Return job status, per-video progress and, once finished, the result"""
+    if not job_manager:
+        return jsonify({
+            "error": "Service unavailable",
+            "message": "Course generation service is not available"
+        }), 503
+    
+    job = job_manager.get(job_id)
+    if job is None:
+        return jsonify({
+            "error": "Not found",
+            "message": "Unknown or expired job ID"
+        }), 404
+    
+    job["api_version"] = "1.0.0"
+    return jsonify(job)
+
+# YouTube Data API quota usage
+@app.route('/api/quota', methods=['GET'])
+@handle_errors
+def quota_status():
+    """Rolling 24-hour YouTube Data API quota usage and which call types are still allowed"""
+    if not course_builder:
+        return jsonify({
+            "error": "Service unavailable",
+            "message": "YouTube service is not available"
+        }), 503
+    
+    return jsonify({
+        **course_builder.youtube_service.quota.status(),
+        "api_version": "1.0.0"
+    })
+
 # Preview endpoint for quick video info
 @app.route('/api/preview-videos', methods=['POST'])
 @handle_errors
@@ -211,10 +462,13 @@ def preview_videos():
             "message": str(e)
         }), 400
     
+    # Listing caption tracks is optional; clients can skip it for the cheapest preview
+    check_transcripts = bool(data.get('check_transcripts', True))
+    
     logger.info(f"Previewing {len(video_urls)} video URLs")
     
     # Get just video info without AI processing
-    preview_data = course_builder.get_video_info_only(video_urls)
+    preview_data = course_builder.get_video_info_only(video_urls, check_transcripts=check_transcripts)
     
     # Add metadata
     preview_data["previewed_at"] = int(time.time())
@@ -236,118 +490,276 @@ def ask_question():
     video = data.get('video') or {}
     concept = data.get('concept') or {}
 
+    try:
+        position_seconds = parse_position_seconds(data)
+    except ValueError as e:
+        return jsonify({"error": "Invalid input", "message": str(e)}), 400
+
     answer = course_builder.ai_service.answer_question(
         question=data['question'],
         video_data=video if isinstance(video, dict) else None,
         concept=concept if isinstance(concept, dict) else None,
+        position_seconds=position_seconds,
     )
 
     return jsonify({
         "answer": answer,
+        # The model could not be reached and the answer is a stock apology
+        "degraded": answer == ANSWER_UNAVAILABLE_MESSAGE,
         "answered_at": int(time.time()),
         "api_version": "1.0.0"
     })
 
-# Helpers to extract text from uploads
-def extract_text_from_pdf(stream: BytesIO) -> str:
-    try:
-        reader = PdfReader(stream)
-        return "\n".join(page.extract_text() or '' for page in reader.pages)
-    except Exception:
-        return ''
+@app.route('/api/ask-question/stream', methods=['POST'])
+@handle_errors
+def ask_question_stream():
+    """Streaming variant of /api/ask-question: 'chunk' events as tokens arrive, then 'done'.
+    'done' carries truncated: true when the answer was cut off by an upstream error."""
+    if not course_builder:
+        return jsonify({"error": "Service unavailable", "message": "AI service not available"}), 503
+
+    data = request.get_json(force=True)
+    if not data or not isinstance(data.get('question'), str):
+        return jsonify({"error": "Invalid input", "message": "'question' is required"}), 400
+
+    video = data.get('video') or {}
+    concept = data.get('concept') or {}
 
-def extract_text_from_docx(stream: BytesIO) -> str:
     try:
-        doc = DocxDocument(stream)
-        return "\n".join(p.text for p in doc.paragraphs)
-    except Exception:
-        return ''
+        position_seconds = parse_position_seconds(data)
+    except ValueError as e:
+        return jsonify({"error": "Invalid input", "message": str(e)}), 400
+
+    def generate():
+        truncated = False
+        try:
+            for chunk in course_builder.ai_service.stream_answer(
+                question=data['question'],
+                video_data=video if isinstance(video, dict) else None,
+                concept=concept if isinstance(concept, dict) else None,
+                position_seconds=position_seconds,
+            ):
+                yield format_sse('chunk', {'text': chunk})
+        except StreamInterrupted:
+            truncated = True
+        yield format_sse('done', {
+            'truncated': truncated,
+            'answered_at': int(time.time()),
+            'api_version': '1.0.0'
+        })
+
+    return sse_response(generate())
 
-def extract_text_from_pptx(stream: BytesIO) -> str:
+# Uploaded documents are parsed in a separate process pool so a pathological file
+# can't block request threads
+document_extractor = DocumentExtractor(
+    workers=Config.DOCUMENT_WORKERS,
+    timeout=Config.DOCUMENT_EXTRACT_TIMEOUT,
+    max_chars=Config.DOCUMENT_MAX_CHARS
+)
+
+# Study notes and suggestions for uploads, keyed by a hash of the uploaded content
+upload_notes_cache = build_tiered_cache(
+    namespace='upload_notes',
+    maxsize=Config.UPLOAD_NOTES_CACHE_SIZE,
+    ttl=Config.UPLOAD_NOTES_CACHE_TTL,
+    path=Config.CACHE_DB_PATH,
+    compress=True
+)
+
+def wants_refresh() -> bool:
+    """Whether the request asks to bypass cached results ('refresh' in query, form or JSON)"""
+    value = request.args.get('refresh') or request.form.get('refresh')
+    if value is None:
+        value = (request.get_json(silent=True) or {}).get('refresh', False)
+    if isinstance(value, str):
+        return value.strip().lower() in ('1', 'true', 'yes')
+    return bool(value)
+
+@contextmanager
+def uploaded_content():
+    """Yield (content_hash, load_text, error_response) for an uploaded file or JSON 'transcript'.
+    
+    Files are spooled to a temp file and hashed while copied; text is only extracted when
+    load_text() is called, so cached results skip extraction entirely. load_text returns
+    (text, error_response). error_response is a Flask response tuple when the upload has
+    an unsupported type or could not be processed.
+    """
+    if 'file' in request.files:
+        f = request.files['file']
+        filename = secure_filename(f.filename or '')
+        ext = ('.' + filename.rsplit('.', 1)[-1].lower()) if '.' in filename else ''
+        if ext not in EXTRACTORS:
+            yield None, None, (jsonify({"error": "Invalid file type", "message": "Use PDF, PPTX, or DOCX"}), 400)
+            return
+        
+        with SpooledUpload(f.stream, ext) as upload:
+            def load_text():
+                try:
+                    return document_extractor.extract(upload.path, ext), None
+                except DocumentExtractionTimeout:
+                    return None, (jsonify({
+                        "error": "Document too complex",
+                        "message": "The file took too long to process; try a smaller or simpler document"
+                    }), 422)
+            
+            yield upload.content_hash, load_text, None
+        return
+    
+    payload = request.get_json(silent=True) or {}
+    text = payload.get('transcript')
+    content_hash = hashlib.sha256(f"text:{text or ''}".encode('utf-8')).hexdigest()
+    yield content_hash, lambda: (text, None), None
+
+def upload_cache_key(content_hash: str) -> str:
+    # Notes depend on how much of the text is extracted and how it is split into prompts
+    return f"{content_hash}:{Config.DOCUMENT_MAX_CHARS}:{Config.UPLOAD_TEXT_MAX_CHARS}:{Config.NOTES_CHUNK_CHARS}"
+
+def upload_topic(text: str) -> str:
+    """Search query for video suggestions: the first 10 words of the text"""
+    return " ".join(text.strip().split()[:10])
+
+def cached_upload_notes(content_hash: str):
+    """Stored notes for this content, refreshing empty suggestions; None on a miss"""
+    key = upload_cache_key(content_hash)
+    cached = upload_notes_cache.get(key)
+    if cached is None:
+        return None
+    if not cached.get('recommended_videos'):
+        # Suggestions may have been skipped by the search quota when the notes were stored
+        cached = {**cached, 'recommended_videos': suggest_videos(cached.get('topic', ''))}
+        if cached['recommended_videos']:
+            upload_notes_cache.set(key, cached)
+    return cached
+
+def store_upload_notes(content_hash: str, text: str, notes: str, recommended_videos: List[Dict[str, Any]]) -> None:
+    upload_notes_cache.set(upload_cache_key(content_hash), {
+        'notes': notes,
+        'recommended_videos': recommended_videos,
+        'topic': upload_topic(text)
+    })
+
+def suggest_videos(text: str) -> List[Dict[str, Any]]:
+    """Suggest videos by topic using the first 10 words of the text as the search query"""
+    topic = upload_topic(text)
+    if not topic:
+        return []
     try:
-        prs = Presentation(stream)
-        texts = []
-        for slide in prs.slides:
-            for shape in slide.shapes:
-                if hasattr(shape, 'text'):
-                    texts.append(shape.text)
-        return "\n".join(texts)
+        # Use YouTube Data API search; skipped once the search quota budget is spent
+        return course_builder.youtube_service.search_videos(topic, max_results=5)
     except Exception:
-        return ''
+        return []
 
-ALLOWED_EXT = {'.pdf', '.docx', '.pptx'}
+FALLBACK_NOTES = "Summary: Lecture overview unavailable. Key points could not be fully extracted."
 
 @app.route('/api/summarize-upload', methods=['POST'])
 @handle_errors
 def summarize_upload():
     """Accept a file (PDF/DOCX/PPTX) or raw transcript text and return study notes + suggested videos."""
-    text = None
-    if 'file' in request.files:
-        f = request.files['file']
-        filename = secure_filename(f.filename or '')
-        ext = ('.' + filename.rsplit('.', 1)[-1].lower()) if '.' in filename else ''
-        data = BytesIO(f.read())
-        if ext == '.pdf':
-            text = extract_text_from_pdf(data)
-        elif ext == '.docx':
-            text = extract_text_from_docx(data)
-        elif ext == '.pptx':
-            text = extract_text_from_pptx(data)
-        else:
-            return jsonify({"error": "Invalid file type", "message": "Use PDF, PPTX, or DOCX"}), 400
-    else:
-        payload = request.get_json(silent=True) or {}
-        text = payload.get('transcript')
+    if not course_builder:
+        return jsonify({"error": "Service unavailable", "message": "AI service not available"}), 503
+
+    with uploaded_content() as (content_hash, load_text, error_response):
+        if error_response:
+            return error_response
+
+        # 'refresh' regenerates notes for content that was summarized before
+        cached = None if wants_refresh() else cached_upload_notes(content_hash)
+        if cached is not None:
+            return jsonify({
+                'notes': cached['notes'],
+                'recommended_videos': cached['recommended_videos'],
+                'degraded': False,
+                'cached': True,
+                'api_version': '1.0.0',
+                'generated_at': int(time.time())
+            })
+
+        text, error_response = load_text()
+    if error_response:
+        return error_response
 
     if not text or len(text.strip()) < 30:
         return jsonify({"error": "Invalid input", "message": "Provide a valid file or transcript text"}), 400
 
     # Ask AI to produce structured study notes
-    ai = course_builder.ai_service
-    prompt = (
-        "You are a helpful educator. Given lecture text/transcript, produce concise study notes with: "
-        "summary (4-6 sentences), 5 key bullet points, 3 terminology definitions, and 2 practice questions.\n\n"
-        f"TEXT:\n{text[:12000]}"
-    )
-    try:
-        resp = ai.model.generate_content(prompt, generation_config=ai.genai.types.GenerationConfig if hasattr(ai, 'genai') else None)
-        notes = resp.text.strip() if hasattr(resp, 'text') else ''
-    except Exception:
-        notes = ""
+    notes = course_builder.ai_service.generate_study_notes(text)
+    recommended_videos = suggest_videos(text)
 
     # fallback minimal notes
-    if not notes:
-        notes = "Summary: Lecture overview unavailable. Key points could not be fully extracted."
-
-    # Suggest videos by topic using first 10 words as query
-    topic = " ".join(text.strip().split()[:10])
-    yt = course_builder.youtube_service
-    # We will return placeholder suggestions from our processed titles if API quota limits; frontend can still preview
-    suggestions = []
-    try:
-        # Use YouTube Data API search
-        search = yt.youtube.search().list(part='snippet', q=topic, type='video', maxResults=5)
-        res = search.execute()
-        for item in res.get('items', []):
-            vid = item['id']['videoId']
-            snippet = item['snippet']
-            suggestions.append({
-                'id': vid,
-                'title': snippet.get('title',''),
-                'channel': snippet.get('channelTitle',''),
-                'thumbnail': snippet.get('thumbnails',{}).get('high',{}).get('url',''),
-                'url': f'https://www.youtube.com/watch?v={vid}'
-            })
-    except Exception:
-        suggestions = []
+    degraded = not notes
+    if notes:
+        store_upload_notes(content_hash, text, notes, recommended_videos)
+    else:
+        notes = FALLBACK_NOTES
 
     return jsonify({
         'notes': notes,
-        'recommended_videos': suggestions,
+        'recommended_videos': recommended_videos,
+        'degraded': degraded,
+        'cached': False,
         'api_version': '1.0.0',
         'generated_at': int(time.time())
     })
 
+@app.route('/api/summarize-upload/stream', methods=['POST'])
+@handle_errors
+def summarize_upload_stream():
+    """Streaming variant of /api/summarize-upload: 'chunk' events with note text, then 'done'.
+    'done' carries truncated: true when the notes were cut off by an upstream error."""
+    if not course_builder:
+        return jsonify({"error": "Service unavailable", "message": "AI service not available"}), 503
+
+    with uploaded_content() as (content_hash, load_text, error_response):
+        if error_response:
+            return error_response
+
+        cached = None if wants_refresh() else cached_upload_notes(content_hash)
+        if cached is not None:
+            def replay():
+                yield format_sse('chunk', {'text': cached['notes']})
+                yield format_sse('done', {
+                    'recommended_videos': cached['recommended_videos'],
+                    'cached': True,
+                    'api_version': '1.0.0',
+                    'generated_at': int(time.time())
+                })
+            return sse_response(replay())
+
+        text, error_response = load_text()
+    if error_response:
+        return error_response
+
+    if not text or len(text.strip()) < 30:
+        return jsonify({"error": "Invalid input", "message": "Provide a valid file or transcript text"}), 400
+
+    # Long documents are condensed chunk by chunk before the first token streams, so
+    # the work runs in the background and the connection gets keep-alives meanwhile
+    def run_notes(emit):
+        completed_notes = []
+        produced = False
+        truncated = False
+        try:
+            for chunk in course_builder.ai_service.stream_study_notes(text, on_complete=completed_notes.append):
+                produced = True
+                emit('chunk', {'text': chunk})
+        except StreamInterrupted:
+            truncated = True
+        if not produced:
+            emit('chunk', {'text': FALLBACK_NOTES})
+        recommended_videos = suggest_videos(text)
+        if completed_notes:
+            store_upload_notes(content_hash, text, completed_notes[0], recommended_videos)
+        emit('done', {
+            'recommended_videos': recommended_videos,
+            'truncated': truncated,
+            'cached': False,
+            'api_version': '1.0.0',
+            'generated_at': int(time.time())
+        })
+
+    return sse_response(background_sse(run_notes, 'notes'))
+
 # Global error handlers
 @app.errorhandler(404)
 def not_found(error):
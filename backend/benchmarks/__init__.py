@@ -0,0 +1 @@
+# Offline benchmarks for StudyWeave AI backend hot paths
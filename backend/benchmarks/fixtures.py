@@ -0,0 +1,171 @@
+import json
+import os
+import random
+from typing import Any, Dict, List
+
+from docx import Document as DocxDocument
+from pptx import Presentation
+from pptx.util import Inches, Pt
+
+# Fixed seed so every run benchmarks identical inputs
+SEED = 1234
+
+_VOCABULARY = """
+gradient descent loss function learning rate neural network layer weight bias activation
+matrix vector derivative chain rule backpropagation optimizer momentum batch epoch training
+validation overfitting regularization dropout convolution kernel feature map pooling attention
+transformer embedding token sequence probability distribution entropy sample estimate model
+""".split()
+_FILLERS = ['so', 'um', 'right', 'okay', 'now', 'basically', 'you know']
+_NOISE = ['[Music]', '[Applause]', '(laughter)', '>>']
+
+
+def _sentence(rng: random.Random, words: int) -> str:
+    tokens = [rng.choice(_VOCABULARY) for _ in range(words)]
+    if rng.random() < 0.3:
+        tokens.insert(0, rng.choice(_FILLERS))
+    return ' '.join(tokens)
+
+
+def make_transcript(duration_seconds: int, seed: int = SEED) -> List[Dict[str, Any]]:
+    """Auto-caption style transcript: ~3s fragments with noise markers, stutters and
+    fragments that repeat the tail of the previous one"""
+    rng = random.Random(seed)
+    transcript = []
+    start = 0.0
+    previous: List[str] = []
+    while start < duration_seconds:
+        duration = rng.uniform(2.0, 4.5)
+        words = _sentence(rng, rng.randint(5, 11)).split()
+        if previous and rng.random() < 0.25:
+            words = previous[-rng.randint(1, 3):] + words
+        if rng.random() < 0.05:
+            words.insert(rng.randint(0, len(words)), rng.choice(_NOISE))
+        if rng.random() < 0.05:
+            index = rng.randrange(len(words))
+            words.insert(index, words[index])
+        text = ' '.join(words)
+        if rng.random() < 0.3:
+            text += '.'
+        transcript.append({'text': text, 'start': round(start, 2), 'duration': round(duration, 2)})
+        previous = words
+        start += duration
+    return transcript
+
+
+def _format_mmss(seconds: int) -> str:
+    minutes, secs = divmod(seconds, 60)
+    return f"{minutes:02d}:{secs:02d}"
+
+
+def make_concepts(count: int, span_seconds: int = 3600, seed: int = SEED) -> List[Dict[str, Any]]:
+    """Valid extracted concepts with quizzes, in timeline order"""
+    rng = random.Random(seed)
+    concepts = []
+    for index in range(count):
+        seconds = int(span_seconds * index / max(count, 1)) + rng.randint(0, 30)
+        concepts.append({
+            'name': f"Concept {index + 1}: {_sentence(rng, 3).title()}",
+            'timestamp': _format_mmss(seconds),
+            'timestamp_seconds': seconds,
+            'summary': f"{_sentence(rng, 14).capitalize()}. {_sentence(rng, 12).capitalize()}.",
+            'quiz': [{
+                'question': f"What does {_sentence(rng, 2)} describe?",
+                'options': [_sentence(rng, 3) for _ in range(4)],
+                'correct': rng.randint(0, 3),
+                'explanation': f"{_sentence(rng, 10).capitalize()}."
+            } for _ in range(2)]
+        })
+    return concepts
+
+
+def make_malformed_concepts_response(count: int, seed: int = SEED) -> str:
+    """Model output that fails json.loads (prose around it, truncated), so the regex
+    fallback parser has to recover the concepts"""
+    concepts = make_concepts(count, seed=seed)
+    body = json.dumps({'concepts': concepts}, indent=2)
+    return f"Here are the key concepts from the video:\n```json\n{body[:-40]}"
+
+
+def make_pdf(path: str, pages: int, lines_per_page: int = 40, seed: int = SEED) -> str:
+    """Write a text PDF with Helvetica content streams; PyPDF2 can read but not author text"""
+    rng = random.Random(seed)
+    objects: List[bytes] = []
+
+    def add(body: bytes) -> int:
+        objects.append(body)
+        return len(objects)
+
+    font = add(b"<< /Type /Font /Subtype /Type1 /BaseFont /Helvetica >>")
+    pages_id = len(objects) + 2 * pages + 1  # after every content stream and page object
+    page_ids = []
+    for _ in range(pages):
+        lines = [_sentence(rng, 10) for _ in range(lines_per_page)]
+        commands = ["BT", "/F1 10 Tf", "12 TL", "50 780 Td"]
+        commands += [f"({line}) Tj T*" for line in lines]
+        commands.append("ET")
+        stream = "\n".join(commands).encode('latin-1')
+        content = add(b"<< /Length %d >>\nstream\n" % len(stream) + stream + b"\nendstream")
+        page_ids.append(add(
+            b"<< /Type /Page /Parent %d 0 R /MediaBox [0 0 612 792] "
+            b"/Resources << /Font << /F1 %d 0 R >> >> /Contents %d 0 R >>" % (pages_id, font, content)
+        ))
+    kids = b" ".join(b"%d 0 R" % page_id for page_id in page_ids)
+    assert add(b"<< /Type /Pages /Kids [%s] /Count %d >>" % (kids, pages)) == pages_id
+    catalog = add(b"<< /Type /Catalog /Pages %d 0 R >>" % pages_id)
+
+    output = bytearray(b"%PDF-1.4\n")
+    offsets = []
+    for number, body in enumerate(objects, start=1):
+        offsets.append(len(output))
+        output += b"%d 0 obj\n" % number + body + b"\nendobj\n"
+    xref = len(output)
+    output += b"xref\n0 %d\n0000000000 65535 f \n" % (len(objects) + 1)
+    output += b"".join(b"%010d 00000 n \n" % offset for offset in offsets)
+    output += b"trailer\n<< /Size %d /Root %d 0 R >>\nstartxref\n%d\n%%%%EOF\n" % (len(objects) + 1, catalog, xref)
+
+    with open(path, 'wb') as f:
+        f.write(output)
+    return path
+
+
+def make_docx(path: str, paragraphs: int, seed: int = SEED) -> str:
+    rng = random.Random(seed)
+    doc = DocxDocument()
+    for index in range(paragraphs):
+        if index % 20 == 0:
+            doc.add_heading(_sentence(rng, 4).title(), level=2)
+        doc.add_paragraph(f"{_sentence(rng, 25).capitalize()}.")
+    doc.save(path)
+    return path
+
+
+def make_pptx(path: str, slides: int, bullets_per_slide: int = 6, seed: int = SEED) -> str:
+    rng = random.Random(seed)
+    prs = Presentation()
+    layout = prs.slide_layouts[1]  # Title and content
+    for _ in range(slides):
+        slide = prs.slides.add_slide(layout)
+        slide.shapes.title.text = _sentence(rng, 4).title()
+        body = slide.placeholders[1].text_frame
+        body.text = _sentence(rng, 8)
+        for _ in range(bullets_per_slide - 1):
+            body.add_paragraph().text = _sentence(rng, 8)
+        note = slide.shapes.add_textbox(Inches(1), Inches(6.5), Inches(8), Inches(0.5))
+        note.text_frame.text = _sentence(rng, 6)
+        note.text_frame.paragraphs[0].runs[0].font.size = Pt(10)
+    prs.save(path)
+    return path
+
+
+def make_documents(directory: str) -> Dict[str, str]:
+    """Small and large PDF, DOCX and PPTX fixtures written under directory"""
+    os.makedirs(directory, exist_ok=True)
+    return {
+        'pdf_small': make_pdf(os.path.join(directory, 'small.pdf'), pages=5),
+        'pdf_large': make_pdf(os.path.join(directory, 'large.pdf'), pages=300),
+        'docx_small': make_docx(os.path.join(directory, 'small.docx'), paragraphs=40),
+        'docx_large': make_docx(os.path.join(directory, 'large.docx'), paragraphs=4000),
+        'pptx_small': make_pptx(os.path.join(directory, 'small.pptx'), slides=5),
+        'pptx_large': make_pptx(os.path.join(directory, 'large.pptx'), slides=200),
+    }
@@ -0,0 +1,328 @@
+"""Load-test harness: drives the main API endpoints concurrently and reports latency
+percentiles, throughput, and error and degraded rates per endpoint.
+
+A response counts as an error when it has a non-2xx status or an 'error' field, and as
+degraded when it is a 2xx the app marked with 'degraded': true because it fell back to
+a stock answer, stock notes or heuristic concepts after an upstream failure.
+
+By default the app is started in-process on a local threaded server with every
+upstream replayed (UPSTREAM_MODE=replay, synthetic responses for unrecorded requests),
+so upstream latency and error rates are tunable and no network access is needed:
+
+    python -m benchmarks.loadtest --concurrency 16 --duration 60 \\
+        --mix generate-course=1,preview-videos=3,ask-question=5,summarize-upload=1 \\
+        --gemini-latency lognormal:1500:0.5 --gemini-error-rate 0.02
+
+The app's upstream rate limiters (GEMINI_RATE_PER_SECOND and friends) stay in force,
+so queueing behind them shows up in the latencies just as it would in production;
+raise them in the environment to measure the pipeline alone. Point --url at a running
+deployment to load-test it as configured instead.
+"""
+
+import argparse
+import json
+import logging
+import math
+import os
+import random
+import sys
+import tempfile
+import threading
+import time
+import urllib.error
+import urllib.request
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+ENDPOINTS = {
+    'generate-course': '/api/generate-course',
+    'preview-videos': '/api/preview-videos',
+    'ask-question': '/api/ask-question',
+    'summarize-upload': '/api/summarize-upload',
+}
+
+DEFAULT_MIX = 'generate-course=1,preview-videos=3,ask-question=5,summarize-upload=1'
+
+_QUESTIONS = (
+    "What is the main idea here?", "Can you explain this step again?", "Why does this work?",
+    "How is this used in practice?", "What is a common mistake with this?", "Give me a simple example",
+    "How does this relate to the previous part?", "What should I remember for the exam?",
+)
+_WORDS = """
+gradient descent loss function learning rate neural network layer weight bias activation
+matrix vector derivative chain rule optimizer momentum batch epoch training validation
+overfitting regularization dropout convolution attention transformer embedding probability
+""".split()
+
+
+def parse_mix(spec: str) -> Dict[str, float]:
+    """Parse 'endpoint=weight,...' into normalized weights"""
+    weights: Dict[str, float] = {}
+    for part in spec.split(','):
+        if not part.strip():
+            continue
+        name, _, weight = part.partition('=')
+        name = name.strip()
+        if name not in ENDPOINTS:
+            raise ValueError(f"Unknown endpoint {name!r}; expected one of {sorted(ENDPOINTS)}")
+        weights[name] = float(weight or 1)
+    total = sum(weights.values())
+    if total <= 0:
+        raise ValueError("Request mix needs at least one positive weight")
+    return {name: weight / total for name, weight in weights.items() if weight > 0}
+
+
+def percentile(sorted_values: List[float], pct: float) -> float:
+    """Nearest-rank percentile of an ascending list"""
+    if not sorted_values:
+        return 0.0
+    rank = max(math.ceil(pct / 100.0 * len(sorted_values)), 1)
+    return sorted_values[rank - 1]
+
+
+class Workload:
+    """Builds request payloads; pool_size bounds the distinct videos, questions and
+    documents used, which sets how often requests hit the backend caches"""
+
+    def __init__(self, pool_size: int, videos_per_course: int, seed: int):
+        rng = random.Random(seed)
+        alphabet = 'abcdefghijklmnopqrstuvwxyzABCDEFGHIJKLMNOPQRSTUVWXYZ0123456789_-'
+        self.video_ids = [''.join(rng.choice(alphabet) for _ in range(11)) for _ in range(max(pool_size, 1))]
+        self.documents = [
+            ' '.join(rng.choice(_WORDS) for _ in range(400)) for _ in range(max(pool_size, 1))
+        ]
+        self.videos_per_course = max(videos_per_course, 1)
+        # Video payloads for ask-question, filled from generate-course responses
+        self.course_videos: List[Dict[str, Any]] = []
+        self._lock = threading.Lock()
+
+    def _urls(self, rng: random.Random) -> List[str]:
+        count = min(self.videos_per_course, len(self.video_ids))
+        return [f"https://www.youtube.com/watch?v={video_id}" for video_id in rng.sample(self.video_ids, count)]
+
+    def payload(self, endpoint: str, rng: random.Random) -> Optional[Dict[str, Any]]:
+        if endpoint in ('generate-course', 'preview-videos'):
+            return {'video_urls': self._urls(rng)}
+        if endpoint == 'summarize-upload':
+            return {'transcript': rng.choice(self.documents)}
+        with self._lock:
+            video = rng.choice(self.course_videos) if self.course_videos else None
+        if video is None:
+            return None
+        return {
+            'question': rng.choice(_QUESTIONS),
+            'video': video,
+            'position_seconds': rng.randint(0, 600)
+        }
+
+    def observe(self, endpoint: str, response: Dict[str, Any]) -> None:
+        if endpoint != 'generate-course':
+            return
+        videos = [video for video in response.get('videos', []) if video.get('transcript')]
+        if videos:
+            with self._lock:
+                self.course_videos.extend(videos[:2])
+                del self.course_videos[:-50]
+
+
+def classify_response(status: int, body: Any) -> str:
+    """'ok', 'degraded' or 'error' for one response"""
+    if not 200 <= status < 300 or (isinstance(body, dict) and body.get('error')):
+        return 'error'
+    return 'degraded' if isinstance(body, dict) and body.get('degraded') else 'ok'
+
+
+def post_json(url: str, payload: Dict[str, Any], timeout: float) -> Tuple[int, Optional[Dict[str, Any]]]:
+    request = urllib.request.Request(
+        url, data=json.dumps(payload).encode('utf-8'),
+        headers={'Content-Type': 'application/json'}, method='POST'
+    )
+    try:
+        with urllib.request.urlopen(request, timeout=timeout) as response:
+            return response.status, json.loads(response.read() or b'null')
+    except urllib.error.HTTPError as e:
+        return e.code, None
+
+
+def run_load(base_url: str, mix: Dict[str, float], workload: Workload, concurrency: int,
+             duration: float, max_requests: Optional[int], timeout: float, seed: int) -> Dict[str, Any]:
+    """Closed-loop load: each worker sends its next request when the previous completes"""
+    samples: Dict[str, List[Tuple[float, str]]] = {name: [] for name in mix}
+    lock = threading.Lock()
+    sent = [0]
+    names = list(mix)
+    weights = [mix[name] for name in names]
+    deadline = time.monotonic() + duration
+
+    # One course first so ask-question has videos with transcripts to ask about
+    if 'ask-question' in mix:
+        status, body = post_json(base_url + ENDPOINTS['generate-course'],
+                                 workload.payload('generate-course', random.Random(seed)), timeout)
+        if status == 200 and body:
+            workload.observe('generate-course', body)
+
+    def worker(index: int) -> None:
+        rng = random.Random(seed + index + 1)
+        while time.monotonic() < deadline:
+            with lock:
+                if max_requests is not None and sent[0] >= max_requests:
+                    return
+                sent[0] += 1
+            endpoint = rng.choices(names, weights)[0]
+            payload = workload.payload(endpoint, rng)
+            if payload is None:
+                endpoint = 'generate-course'
+                payload = workload.payload(endpoint, rng)
+
+            start = time.perf_counter()
+            try:
+                status, body = post_json(base_url + ENDPOINTS[endpoint], payload, timeout)
+                outcome = classify_response(status, body)
+            except Exception:
+                body, outcome = None, 'error'
+            latency = time.perf_counter() - start
+
+            with lock:
+                samples.setdefault(endpoint, []).append((latency, outcome))
+            if outcome != 'error' and isinstance(body, dict):
+                workload.observe(endpoint, body)
+
+    started = time.monotonic()
+    threads = [threading.Thread(target=worker, args=(index,), daemon=True) for index in range(concurrency)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return {'elapsed': time.monotonic() - started, 'samples': samples}
+
+
+def summarize(run: Dict[str, Any]) -> List[Dict[str, Any]]:
+    """Per-endpoint rows plus an 'all' row: throughput, error and degraded rates and
+    latency percentiles"""
+    elapsed = max(run['elapsed'], 1e-9)
+    rows = []
+    everything: List[Tuple[float, str]] = []
+    for endpoint, samples in run['samples'].items():
+        everything.extend(samples)
+        if samples:
+            rows.append(_summary_row(endpoint, samples, elapsed))
+    if everything:
+        rows.append(_summary_row('all', everything, elapsed))
+    return rows
+
+
+def _summary_row(name: str, samples: List[Tuple[float, str]], elapsed: float) -> Dict[str, Any]:
+    latencies = sorted(latency for latency, _ in samples)
+    errors = sum(1 for _, outcome in samples if outcome == 'error')
+    degraded = sum(1 for _, outcome in samples if outcome == 'degraded')
+    return {
+        'endpoint': name,
+        'requests': len(samples),
+        'throughput_rps': len(samples) / elapsed,
+        'error_rate': errors / len(samples),
+        'degraded_rate': degraded / len(samples),
+        'p50_ms': percentile(latencies, 50) * 1000,
+        'p95_ms': percentile(latencies, 95) * 1000,
+        'p99_ms': percentile(latencies, 99) * 1000,
+        'max_ms': latencies[-1] * 1000
+    }
+
+
+def print_summary(rows: List[Dict[str, Any]], elapsed: float, concurrency: int) -> None:
+    print(f"\n{concurrency} concurrent clients for {elapsed:.1f}s")
+    print(f"{'endpoint':<18} {'requests':>8} {'req/s':>8} {'errors':>7} {'degraded':>8} "
+          f"{'p50 ms':>9} {'p95 ms':>9} {'p99 ms':>9} {'max ms':>9}")
+    for row in rows:
+        print(f"{row['endpoint']:<18} {row['requests']:>8} {row['throughput_rps']:>8.2f} {row['error_rate']:>6.1%} "
+              f"{row['degraded_rate']:>8.1%} {row['p50_ms']:>9.0f} {row['p95_ms']:>9.0f} {row['p99_ms']:>9.0f} {row['max_ms']:>9.0f}")
+
+
+def start_local_server(args: argparse.Namespace) -> Tuple[str, Callable[[], None]]:
+    """Start the app in-process with replayed upstreams; returns (base URL, shutdown)"""
+    workdir = tempfile.mkdtemp(prefix='studyweave-load-')
+    overrides = {
+        'UPSTREAM_MODE': 'replay',
+        'REPLAY_ON_MISS': 'synthesize',
+        'REPLAY_LATENCY_YOUTUBE': args.youtube_latency,
+        'REPLAY_LATENCY_TRANSCRIPT': args.transcript_latency,
+        'REPLAY_LATENCY_GEMINI': args.gemini_latency,
+        'REPLAY_ERROR_RATE_YOUTUBE': str(args.youtube_error_rate),
+        'REPLAY_ERROR_RATE_TRANSCRIPT': str(args.transcript_error_rate),
+        'REPLAY_ERROR_RATE_GEMINI': str(args.gemini_error_rate),
+        # Start from cold caches that the run cannot leave behind
+        'CACHE_DB_PATH': os.path.join(workdir, 'cache.sqlite3'),
+    }
+    if args.fixtures:
+        overrides['UPSTREAM_FIXTURES_DIR'] = args.fixtures
+    else:
+        overrides['UPSTREAM_FIXTURES_DIR'] = os.path.join(workdir, 'fixtures')
+    # Config reads the environment at import time, so this must precede importing the app
+    os.environ.update(overrides)
+
+    from werkzeug.serving import make_server
+    import app as app_module
+    if not args.verbose:
+        # Per-request log lines (werkzeug access log included) would drown the report
+        logging.disable(logging.WARNING)
+
+    server = make_server('127.0.0.1', 0, app_module.app, threaded=True)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    return f"http://127.0.0.1:{server.server_port}", server.shutdown
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="Load-test the StudyWeave API endpoints")
+    parser.add_argument('--url', help="Base URL of a running backend; default starts one in-process")
+    parser.add_argument('-c', '--concurrency', type=int, default=8, help="Concurrent clients")
+    parser.add_argument('-d', '--duration', type=float, default=30.0, help="Seconds to run")
+    parser.add_argument('-n', '--requests', type=int, help="Stop after this many requests")
+    parser.add_argument('--mix', default=DEFAULT_MIX, help="Endpoint weights, e.g. " + DEFAULT_MIX)
+    parser.add_argument('--pool-size', type=int, default=20,
+                        help="Distinct videos and documents to draw from; smaller means more cache hits")
+    parser.add_argument('--videos-per-course', type=int, default=3)
+    parser.add_argument('--timeout', type=float, default=120.0, help="Per-request timeout in seconds")
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--youtube-latency', default='lognormal:150:0.3', help="Replay latency spec (ms)")
+    parser.add_argument('--transcript-latency', default='lognormal:500:0.4', help="Replay latency spec (ms)")
+    parser.add_argument('--gemini-latency', default='lognormal:1500:0.5', help="Replay latency spec (ms)")
+    parser.add_argument('--youtube-error-rate', type=float, default=0.0)
+    parser.add_argument('--transcript-error-rate', type=float, default=0.0)
+    parser.add_argument('--gemini-error-rate', type=float, default=0.0)
+    parser.add_argument('--fixtures', help="Replay recorded fixtures from this directory")
+    parser.add_argument('--json', metavar='PATH', help="Also write the summary to a JSON file")
+    parser.add_argument('-v', '--verbose', action='store_true', help="Keep the app's INFO logging")
+    args = parser.parse_args(argv)
+
+    try:
+        mix = parse_mix(args.mix)
+    except ValueError as e:
+        parser.error(str(e))
+
+    shutdown = None
+    base_url = args.url.rstrip('/') if args.url else None
+    if base_url is None:
+        base_url, shutdown = start_local_server(args)
+
+    try:
+        workload = Workload(args.pool_size, args.videos_per_course, args.seed)
+        run = run_load(base_url, mix, workload, max(args.concurrency, 1), args.duration,
+                       args.requests, args.timeout, args.seed)
+    finally:
+        if shutdown is not None:
+            shutdown()
+
+    rows = summarize(run)
+    print_summary(rows, run['elapsed'], args.concurrency)
+    injected = args.youtube_error_rate or args.transcript_error_rate or args.gemini_error_rate
+    total = rows[-1] if rows else None
+    if args.url is None and injected and total and not (total['error_rate'] or total['degraded_rate']):
+        print("\nWarning: upstream errors were injected but no request failed or degraded; "
+              "they were all absorbed by retries or caches", file=sys.stderr)
+    if args.json:
+        with open(args.json, 'w') as f:
+            json.dump({'concurrency': args.concurrency, 'elapsed': run['elapsed'], 'mix': mix, 'endpoints': rows}, f, indent=2)
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,255 @@
+"""Benchmark regression gate with a local run history.
+
+Runs the offline benchmarks, appends the results to a JSON-lines history file together
+with the git commit, machine and timestamp, and compares them against a baseline run
+from the same machine:
+
+    python -m benchmarks.regress                     # compare against the previous run
+    python -m benchmarks.regress --baseline main     # ...against the latest run of a commit
+    python -m benchmarks.regress -k build_course --threshold 0.10
+    python -m benchmarks.regress --show              # list stored runs
+
+A benchmark counts as regressed only when the median slowdown exceeds both --threshold
+and the noise seen in the two runs, and a one-sided Mann-Whitney U test over the
+per-sample throughputs is significant at --alpha. The exit status is 1 on any regression.
+"""
+
+import argparse
+import hashlib
+import json
+import math
+import os
+import platform
+import socket
+import statistics
+import subprocess
+import sys
+import time
+from functools import lru_cache
+from typing import Any, Dict, List, Optional
+
+from benchmarks.run import print_result, run_benchmarks
+
+_BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+DEFAULT_HISTORY = os.path.join(_BACKEND_DIR, '.benchmarks', 'history.jsonl')
+
+
+def git_commit() -> Dict[str, Any]:
+    """Current commit and whether the working tree has uncommitted changes"""
+    def git(*args: str) -> Optional[str]:
+        try:
+            return subprocess.run(['git', *args], cwd=_BACKEND_DIR, capture_output=True,
+                                  text=True, timeout=10, check=True).stdout.strip()
+        except (OSError, subprocess.SubprocessError):
+            return None
+
+    status = git('status', '--porcelain', '--untracked-files=no')
+    return {
+        'commit': git('rev-parse', 'HEAD'),
+        'branch': git('rev-parse', '--abbrev-ref', 'HEAD'),
+        'dirty': bool(status) if status is not None else None
+    }
+
+
+def machine_info() -> Dict[str, Any]:
+    """Host description; its hash identifies runs whose timings are comparable"""
+    info = {
+        'hostname': socket.gethostname(),
+        'platform': platform.platform(),
+        'processor': platform.processor() or platform.machine(),
+        'cpu_count': os.cpu_count(),
+        'python': platform.python_version()
+    }
+    info['id'] = hashlib.sha256(json.dumps(info, sort_keys=True).encode('utf-8')).hexdigest()[:12]
+    return info
+
+
+def load_history(path: str) -> List[Dict[str, Any]]:
+    if not os.path.exists(path):
+        return []
+    runs = []
+    with open(path) as f:
+        for line in f:
+            line = line.strip()
+            if line:
+                try:
+                    runs.append(json.loads(line))
+                except json.JSONDecodeError:
+                    continue  # A run interrupted mid-write
+    return runs
+
+
+def append_history(path: str, run: Dict[str, Any]) -> None:
+    os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+    with open(path, 'a') as f:
+        f.write(json.dumps(run, sort_keys=True) + '\n')
+
+
+def select_baseline(history: List[Dict[str, Any]], machine_id: str,
+                    ref: Optional[str] = None) -> Optional[Dict[str, Any]]:
+    """Latest run from this machine, optionally restricted to a commit (hash prefix or
+    branch name); timings from other machines are never compared"""
+    for run in reversed(history):
+        if run.get('machine', {}).get('id') != machine_id:
+            continue
+        if ref is None or (run.get('commit') or '').startswith(ref) or run.get('branch') == ref:
+            return run
+    return None
+
+
+@lru_cache(maxsize=None)
+def _u_counts(m: int, n: int) -> tuple:
+    """Number of orderings of m+n samples yielding each U statistic value 0..m*n"""
+    if m == 0 or n == 0:
+        return (1,)
+    # The largest value comes from the first sample (adds n) or the second (adds 0)
+    with_first = _u_counts(m - 1, n)
+    with_second = _u_counts(m, n - 1)
+    counts = [0] * (m * n + 1)
+    for u, count in enumerate(with_first):
+        counts[u + n] += count
+    for u, count in enumerate(with_second):
+        counts[u] += count
+    return tuple(counts)
+
+
+def mann_whitney_p_less(current: List[float], baseline: List[float]) -> float:
+    """One-sided p-value that current samples tend to be smaller than baseline samples.
+
+    Exact null distribution for small samples, normal approximation beyond 20 each;
+    ties count half.
+    """
+    m, n = len(current), len(baseline)
+    if not m or not n:
+        return 1.0
+    u = sum(1.0 if c > b else 0.5 if c == b else 0.0 for c in current for b in baseline)
+    if m <= 20 and n <= 20:
+        counts = _u_counts(m, n)
+        total = sum(counts)
+        return sum(counts[:math.floor(u) + 1]) / total
+    mean = m * n / 2.0
+    sd = math.sqrt(m * n * (m + n + 1) / 12.0)
+    return 0.5 * math.erfc(-((u + 0.5 - mean) / sd) / math.sqrt(2))
+
+
+def _noise(samples: List[float]) -> float:
+    """Relative spread of a run's samples (median absolute deviation over median)"""
+    if len(samples) < 2:
+        return 0.0
+    median = statistics.median(samples)
+    mad = statistics.median(abs(sample - median) for sample in samples)
+    return 1.4826 * mad / median if median else 0.0
+
+
+def compare(current: List[Dict[str, Any]], baseline: List[Dict[str, Any]],
+            threshold: float, alpha: float) -> List[Dict[str, Any]]:
+    """Per-benchmark comparison rows with a verdict of regressed, improved, unchanged,
+    new or missing"""
+    previous = {result['name']: result for result in baseline}
+    rows = []
+    for result in current:
+        base = previous.pop(result['name'], None)
+        if base is None:
+            rows.append({'name': result['name'], 'verdict': 'new', 'current_ops_per_sec': result['ops_per_sec']})
+            continue
+
+        delta = result['ops_per_sec'] / base['ops_per_sec'] - 1.0 if base['ops_per_sec'] else 0.0
+        # Relative change must clear the configured floor and the runs' combined noise
+        limit = max(threshold, math.hypot(_noise(result['samples']), _noise(base['samples'])))
+        if delta < -limit and mann_whitney_p_less(result['samples'], base['samples']) < alpha:
+            verdict = 'regressed'
+        elif delta > limit and mann_whitney_p_less(base['samples'], result['samples']) < alpha:
+            verdict = 'improved'
+        else:
+            verdict = 'unchanged'
+        rows.append({
+            'name': result['name'],
+            'verdict': verdict,
+            'baseline_ops_per_sec': base['ops_per_sec'],
+            'current_ops_per_sec': result['ops_per_sec'],
+            'delta': delta,
+            'limit': limit,
+            'p_slower': mann_whitney_p_less(result['samples'], base['samples'])
+        })
+    for name, base in previous.items():
+        rows.append({'name': name, 'verdict': 'missing', 'baseline_ops_per_sec': base['ops_per_sec']})
+    return rows
+
+
+def print_comparison(rows: List[Dict[str, Any]], baseline: Dict[str, Any]) -> None:
+    print(f"\nBaseline: {_describe_run(baseline)}")
+    print(f"{'benchmark':<40} {'baseline':>12} {'current':>12} {'delta':>8} {'limit':>7} {'p':>7}  verdict")
+    for row in rows:
+        if 'delta' in row:
+            print(f"{row['name']:<40} {row['baseline_ops_per_sec']:>12,.1f} {row['current_ops_per_sec']:>12,.1f} "
+                  f"{row['delta']:>+8.1%} {row['limit']:>6.1%} {row['p_slower']:>7.3f}  {row['verdict']}")
+        else:
+            ops = row.get('current_ops_per_sec', row.get('baseline_ops_per_sec'))
+            print(f"{row['name']:<40} {'':>12} {ops:>12,.1f} {'':>8} {'':>7} {'':>7}  {row['verdict']}")
+
+
+def _describe_run(run: Dict[str, Any]) -> str:
+    commit = (run.get('commit') or 'unknown')[:10]
+    dirty = '+dirty' if run.get('dirty') else ''
+    when = time.strftime('%Y-%m-%d %H:%M:%S', time.localtime(run.get('timestamp', 0)))
+    return f"{commit}{dirty} ({run.get('branch') or '?'}) on {run.get('machine', {}).get('hostname', '?')} at {when}"
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="Run benchmarks, record history and fail on regressions")
+    parser.add_argument('-k', '--filter', action='append', default=[],
+                        help="Only run benchmarks whose name contains this substring (repeatable)")
+    parser.add_argument('--min-time', type=float, default=0.2, help="Minimum seconds per sample")
+    parser.add_argument('--repeat', type=int, default=9, help="Samples per benchmark")
+    parser.add_argument('--history', default=DEFAULT_HISTORY, help="JSON-lines run history file")
+    parser.add_argument('--baseline', metavar='REF',
+                        help="Compare against the latest run of this commit or branch (default: previous run)")
+    parser.add_argument('--threshold', type=float, default=0.05,
+                        help="Smallest slowdown treated as a regression, as a fraction")
+    parser.add_argument('--alpha', type=float, default=0.05, help="Significance level of the U test")
+    parser.add_argument('--no-record', action='store_true', help="Don't append this run to the history")
+    parser.add_argument('--show', action='store_true', help="List stored runs and exit")
+    args = parser.parse_args(argv)
+
+    history = load_history(args.history)
+    machine = machine_info()
+
+    if args.show:
+        for run in history:
+            marker = '*' if run.get('machine', {}).get('id') == machine['id'] else ' '
+            print(f"{marker} {_describe_run(run)}  {len(run.get('results', []))} benchmarks")
+        return 0
+
+    baseline = select_baseline(history, machine['id'], args.baseline)
+    if args.baseline and baseline is None:
+        print(f"No stored run for {args.baseline!r} on this machine", file=sys.stderr)
+        return 2
+
+    results = run_benchmarks(args.filter, min_time=args.min_time, repeat=max(args.repeat, 2),
+                             on_result=print_result)
+    if not results:
+        print("No benchmarks matched", file=sys.stderr)
+        return 2
+
+    run = {'timestamp': time.time(), 'machine': machine, 'results': results, **git_commit()}
+    if not args.no_record:
+        append_history(args.history, run)
+
+    if baseline is None:
+        print("\nNo earlier run on this machine; recorded this one as the baseline")
+        return 0
+
+    # Benchmarks filtered out of this run are not reported as missing
+    previous = [result for result in baseline.get('results', [])
+                if not args.filter or any(f in result['name'] for f in args.filter)]
+    rows = compare(results, previous, args.threshold, args.alpha)
+    print_comparison(rows, baseline)
+    regressed = [row['name'] for row in rows if row['verdict'] == 'regressed']
+    if regressed:
+        print(f"\n{len(regressed)} benchmark(s) regressed: {', '.join(regressed)}", file=sys.stderr)
+        return 1
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,256 @@
+"""Offline micro-benchmarks for the CPU-bound parts of the pipeline.
+
+Run from the backend directory:
+
+    python -m benchmarks.run                      # everything
+    python -m benchmarks.run -k transcript -k pdf  # names containing either substring
+    python -m benchmarks.run --json results.json
+
+No network access or API keys are needed: services are instantiated without running
+their constructors, and every input is a synthetic fixture generated from a fixed seed.
+The end-to-end build_course_from_videos benchmark runs on replayed upstreams with
+synthesized responses and no added latency, rate limits or persistent caches.
+"""
+
+import argparse
+import gc
+import json
+import os
+import random
+import statistics
+import sys
+import tempfile
+import time
+import tracemalloc
+from typing import Any, Callable, Dict, List, Optional
+
+from config import Config
+from benchmarks import fixtures
+
+# A benchmark is a setup function returning the zero-argument callable to time;
+# setup cost (fixture generation, parsing) is never included in the measurement.
+BenchmarkSetup = Callable[[], Callable[[], Any]]
+
+
+def _ai_service():
+    # Only pure helpers are benchmarked, so skip __init__ and its Gemini client
+    from services.ai_service import AIService
+    return AIService.__new__(AIService)
+
+
+def _course_builder():
+    from services.course_builder import CourseBuilder
+    return CourseBuilder.__new__(CourseBuilder)
+
+
+def _offline_course_builder(workdir: str):
+    """A fully constructed CourseBuilder whose upstreams are replayed from synthesized
+    fixtures with no latency, with memory-only caches and limiters that never throttle.
+
+    Config is only patched while the services are constructed, which is when clients
+    and caches read it, and restored afterwards. The limiters are private instances
+    rather than the process-wide ones, whose rates are fixed by whoever creates them first.
+    """
+    from services.course_builder import CourseBuilder
+    from utils.rate_limit import RateLimiter
+
+    overrides = {
+        'UPSTREAM_MODE': 'replay',
+        'REPLAY_ON_MISS': 'synthesize',
+        'UPSTREAM_FIXTURES_DIR': os.path.join(workdir, 'upstream'),
+        'REPLAY_LATENCY_YOUTUBE': '0',
+        'REPLAY_LATENCY_TRANSCRIPT': '0',
+        'REPLAY_LATENCY_GEMINI': '0',
+        'REPLAY_ERROR_RATE_YOUTUBE': 0.0,
+        'REPLAY_ERROR_RATE_TRANSCRIPT': 0.0,
+        'REPLAY_ERROR_RATE_GEMINI': 0.0,
+        'CACHE_DB_PATH': '',
+    }
+    missing = object()
+    saved = {key: getattr(Config, key, missing) for key in overrides}
+    try:
+        for key, value in overrides.items():
+            setattr(Config, key, value)
+        builder = CourseBuilder()
+    finally:
+        for key, value in saved.items():
+            if value is missing:
+                delattr(Config, key)
+            else:
+                setattr(Config, key, value)
+
+    def unthrottled(name: str) -> RateLimiter:
+        return RateLimiter(name, rate=1e9, burst=1e9)
+
+    builder.ai_service.limiter = unthrottled('gemini')
+    builder.youtube_service.data_limiter = unthrottled('youtube_data')
+    builder.youtube_service.transcript_limiter = unthrottled('transcript')
+    return builder
+
+
+def collect_benchmarks(workdir: str) -> Dict[str, BenchmarkSetup]:
+    """All benchmarks by name; documents are written under workdir on first use"""
+    benchmarks: Dict[str, BenchmarkSetup] = {}
+    transcripts = {'short': 10 * 60, '1h': 3600, '5h': 5 * 3600}
+
+    for label, seconds in transcripts.items():
+        def setup(seconds=seconds):
+            service = _ai_service()
+            transcript = fixtures.make_transcript(seconds)
+            return lambda: service._format_transcript_for_ai(transcript)
+        benchmarks[f"format_transcript_for_ai[{label}]"] = setup
+
+    for label, count in (('5', 5), ('60', 60)):
+        def setup(count=count):
+            service = _ai_service()
+            text = fixtures.make_malformed_concepts_response(count)
+            return lambda: service._parse_concepts_fallback(text)
+        benchmarks[f"parse_concepts_fallback[{label}]"] = setup
+
+        def setup(count=count):
+            service = _ai_service()
+            concepts = fixtures.make_concepts(count)
+            return lambda: service._validate_concepts(concepts)
+        benchmarks[f"validate_concepts[{label}]"] = setup
+
+        def setup(count=count):
+            builder = _course_builder()
+            concepts = fixtures.make_concepts(count)
+            random.Random(fixtures.SEED).shuffle(concepts)
+            # A fresh list each call so the sort sees the original order
+            return lambda: builder._compute_end_timestamps_for_video(list(concepts), 'PT1H2M3S')
+        benchmarks[f"compute_end_timestamps[{label}]"] = setup
+
+    for count in (1, 3):
+        def setup(count=count):
+            builder = _offline_course_builder(workdir)
+            urls = [f"https://www.youtube.com/watch?v=benchVideo{index}" for index in range(count)]
+            # Metadata and transcripts stay cached after the warm-up call; concept
+            # extraction, validation and course assembly run on every call
+            return lambda: builder.build_course_from_videos(urls, use_cache=False)
+        benchmarks[f"build_course_from_videos[{count}]"] = setup
+
+    documents: Dict[str, str] = {}
+
+    def document(name: str) -> str:
+        if not documents:
+            documents.update(fixtures.make_documents(workdir))
+        return documents[name]
+
+    for kind in ('pdf', 'docx', 'pptx'):
+        for size in ('small', 'large'):
+            def setup(kind=kind, size=size):
+                from utils.documents import EXTRACTORS
+                path = document(f"{kind}_{size}")
+                extract = EXTRACTORS[f".{kind}"]
+                return lambda: extract(path, Config.DOCUMENT_MAX_CHARS)
+            benchmarks[f"extract_text_from_{kind}[{size}]"] = setup
+
+    return benchmarks
+
+
+def measure(fn: Callable[[], Any], min_time: float = 0.2, repeat: int = 5) -> Dict[str, Any]:
+    """Time fn like timeit: calibrate a loop count that runs for at least min_time, then
+    take repeat samples with the garbage collector disabled. Peak memory is measured in
+    a separate traced call because tracemalloc slows execution down."""
+    fn()  # Warm-up: imports, regex compilation, lazy caches
+
+    number = 1
+    while True:
+        elapsed = _time_loop(fn, number)
+        if elapsed >= min_time:
+            break
+        number = max(number * 2, int(number * min_time / max(elapsed, 1e-9) * 1.1))
+
+    samples = [number / _time_loop(fn, number) for _ in range(repeat)]
+
+    tracemalloc.start()
+    try:
+        fn()
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+
+    median = statistics.median(samples)
+    return {
+        'ops_per_sec': median,
+        'mean_ms': 1000.0 / median,
+        'stdev_ops_per_sec': statistics.stdev(samples) if len(samples) > 1 else 0.0,
+        'samples': samples,
+        'loops': number,
+        'peak_memory_bytes': peak
+    }
+
+
+def _time_loop(fn: Callable[[], Any], number: int) -> float:
+    gc_enabled = gc.isenabled()
+    gc.disable()
+    try:
+        start = time.perf_counter()
+        for _ in range(number):
+            fn()
+        return time.perf_counter() - start
+    finally:
+        if gc_enabled:
+            gc.enable()
+
+
+def run_benchmarks(filters: Optional[List[str]] = None, min_time: float = 0.2, repeat: int = 5,
+                   on_result: Optional[Callable[[Dict[str, Any]], None]] = None) -> List[Dict[str, Any]]:
+    """Run every benchmark whose name contains one of filters (all when empty)"""
+    results = []
+    with tempfile.TemporaryDirectory(prefix='studyweave-bench-') as workdir:
+        for name, setup in collect_benchmarks(workdir).items():
+            if filters and not any(f in name for f in filters):
+                continue
+            result = {'name': name, **measure(setup(), min_time=min_time, repeat=repeat)}
+            results.append(result)
+            if on_result is not None:
+                on_result(result)
+    return results
+
+
+def format_bytes(size: float) -> str:
+    for unit in ('B', 'KiB', 'MiB'):
+        if size < 1024:
+            return f"{size:.0f} {unit}" if unit == 'B' else f"{size:.1f} {unit}"
+        size /= 1024
+    return f"{size:.1f} GiB"
+
+
+def print_result(result: Dict[str, Any]) -> None:
+    spread = result['stdev_ops_per_sec'] / result['ops_per_sec'] * 100 if result['ops_per_sec'] else 0.0
+    print(f"{result['name']:<40} {result['ops_per_sec']:>12,.1f} ops/s  ±{spread:4.1f}%  "
+          f"{result['mean_ms']:>10.3f} ms/op  {format_bytes(result['peak_memory_bytes']):>10} peak", flush=True)
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="Offline micro-benchmarks for backend hot paths")
+    parser.add_argument('-k', '--filter', action='append', default=[],
+                        help="Only run benchmarks whose name contains this substring (repeatable)")
+    parser.add_argument('--min-time', type=float, default=0.2, help="Minimum seconds per sample")
+    parser.add_argument('--repeat', type=int, default=5, help="Samples per benchmark")
+    parser.add_argument('--json', metavar='PATH', help="Also write results to a JSON file")
+    parser.add_argument('--list', action='store_true', help="List benchmark names and exit")
+    args = parser.parse_args(argv)
+
+    if args.list:
+        with tempfile.TemporaryDirectory() as workdir:
+            for name in collect_benchmarks(workdir):
+                print(name)
+        return 0
+
+    results = run_benchmarks(args.filter, min_time=args.min_time, repeat=max(args.repeat, 1),
+                             on_result=print_result)
+    if not results:
+        print("No benchmarks matched", file=sys.stderr)
+        return 1
+
+    if args.json:
+        with open(args.json, 'w') as f:
+            json.dump(results, f, indent=2)
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -31,10 +31,94 @@ class Config:
     
     # API Settings
     MAX_CONTENT_LENGTH = 16 * 1024 * 1024  # 16MB max file upload
-    
+
+    # Cache Settings - the SQLite file is shared by every worker process on a node
+    CACHE_DB_PATH = os.getenv('CACHE_DB_PATH', str(_BACKEND_DIR / '.cache' / 'studyweave.sqlite3'))
+    VIDEO_INFO_CACHE_SIZE = int(os.getenv('VIDEO_INFO_CACHE_SIZE', '1024'))
+    VIDEO_INFO_CACHE_TTL = int(os.getenv('VIDEO_INFO_CACHE_TTL', str(6 * 3600)))
+    TRANSCRIPT_CACHE_SIZE = int(os.getenv('TRANSCRIPT_CACHE_SIZE', '64'))
+    TRANSCRIPT_CACHE_TTL = int(os.getenv('TRANSCRIPT_CACHE_TTL', str(7 * 24 * 3600)))
+    CONCEPT_CACHE_SIZE = int(os.getenv('CONCEPT_CACHE_SIZE', '256'))
+    CONCEPT_CACHE_TTL = int(os.getenv('CONCEPT_CACHE_TTL', str(7 * 24 * 3600)))
+
+    # Transcript compaction: prompt token budget and maximum merged segment length
+    TRANSCRIPT_TOKEN_BUDGET = int(os.getenv('TRANSCRIPT_TOKEN_BUDGET', '1000'))
+    TRANSCRIPT_SEGMENT_SECONDS = int(os.getenv('TRANSCRIPT_SEGMENT_SECONDS', '30'))
+
+    # Answer context retrieval over transcript segments
+    TRANSCRIPT_INDEX_CACHE_SIZE = int(os.getenv('TRANSCRIPT_INDEX_CACHE_SIZE', '128'))
+    ANSWER_CONTEXT_SEGMENTS = int(os.getenv('ANSWER_CONTEXT_SEGMENTS', '6'))
+    ANSWER_CONTEXT_TOKEN_BUDGET = int(os.getenv('ANSWER_CONTEXT_TOKEN_BUDGET', '800'))
+    POSITION_CONTEXT_BEFORE_SECONDS = int(os.getenv('POSITION_CONTEXT_BEFORE_SECONDS', '90'))
+    POSITION_CONTEXT_AFTER_SECONDS = int(os.getenv('POSITION_CONTEXT_AFTER_SECONDS', '30'))
+    ANSWER_CACHE_SIZE = int(os.getenv('ANSWER_CACHE_SIZE', '2048'))
+    ANSWER_CACHE_TTL = int(os.getenv('ANSWER_CACHE_TTL', str(24 * 3600)))
+
+    # Long-video concept extraction (map-reduce over transcript time windows)
+    LONG_VIDEO_THRESHOLD_SECONDS = int(os.getenv('LONG_VIDEO_THRESHOLD_SECONDS', str(20 * 60)))
+    CONCEPT_WINDOW_SECONDS = int(os.getenv('CONCEPT_WINDOW_SECONDS', str(5 * 60)))
+    CONCEPT_MAX_WINDOWS = int(os.getenv('CONCEPT_MAX_WINDOWS', '12'))
+    CONCEPT_MAP_WORKERS = int(os.getenv('CONCEPT_MAP_WORKERS', '4'))
+    LONG_VIDEO_MAX_CONCEPTS = int(os.getenv('LONG_VIDEO_MAX_CONCEPTS', '12'))
+
+    # Upstream rate limits (requests per second and burst size), shared by all threads
+    GEMINI_RATE_PER_SECOND = float(os.getenv('GEMINI_RATE_PER_SECOND', '2'))
+    GEMINI_BURST = float(os.getenv('GEMINI_BURST', '4'))
+    YOUTUBE_DATA_RATE_PER_SECOND = float(os.getenv('YOUTUBE_DATA_RATE_PER_SECOND', '5'))
+    YOUTUBE_DATA_BURST = float(os.getenv('YOUTUBE_DATA_BURST', '10'))
+    TRANSCRIPT_RATE_PER_SECOND = float(os.getenv('TRANSCRIPT_RATE_PER_SECOND', '2'))
+    TRANSCRIPT_BURST = float(os.getenv('TRANSCRIPT_BURST', '4'))
+    BACKOFF_BASE_SECONDS = float(os.getenv('BACKOFF_BASE_SECONDS', '0.5'))
+    BACKOFF_MAX_SECONDS = float(os.getenv('BACKOFF_MAX_SECONDS', '30'))
+
+    # YouTube Data API quota budget; search suggestions stop at the cutoff fraction so
+    # metadata lookups keep working until the budget is fully spent
+    YOUTUBE_QUOTA_DAILY_LIMIT = int(os.getenv('YOUTUBE_QUOTA_DAILY_LIMIT', '10000'))
+    YOUTUBE_SEARCH_QUOTA_CUTOFF = float(os.getenv('YOUTUBE_SEARCH_QUOTA_CUTOFF', '0.8'))
+
+    # Uploaded document extraction: characters extracted per document, process pool size
+    # and the hard per-document timeout
+    DOCUMENT_MAX_CHARS = int(os.getenv('DOCUMENT_MAX_CHARS', '200000'))
+    DOCUMENT_WORKERS = int(os.getenv('DOCUMENT_WORKERS', '2'))
+    DOCUMENT_EXTRACT_TIMEOUT = float(os.getenv('DOCUMENT_EXTRACT_TIMEOUT', '20'))
+
+    # Study notes: text longer than one prompt's budget is summarized in chunks (map)
+    # and the chunk notes combined in a final pass (reduce)
+    UPLOAD_TEXT_MAX_CHARS = int(os.getenv('UPLOAD_TEXT_MAX_CHARS', '12000'))
+    NOTES_CHUNK_CHARS = int(os.getenv('NOTES_CHUNK_CHARS', '12000'))
+    NOTES_MAX_CHUNKS = int(os.getenv('NOTES_MAX_CHUNKS', '8'))
+    NOTES_MAP_WORKERS = int(os.getenv('NOTES_MAP_WORKERS', '8'))
+    # Generated notes for uploads, keyed by content hash
+    UPLOAD_NOTES_CACHE_SIZE = int(os.getenv('UPLOAD_NOTES_CACHE_SIZE', '256'))
+    UPLOAD_NOTES_CACHE_TTL = int(os.getenv('UPLOAD_NOTES_CACHE_TTL', str(7 * 24 * 3600)))
+
+    # Upstream clients: 'live', 'record' (live, saving responses as fixtures) or 'replay'
+    # (serve fixtures offline). Replay latencies are distribution specs in milliseconds,
+    # e.g. 'fixed:50', 'uniform:20:80', 'normal:300:50' or 'lognormal:1200:0.5'; unrecorded
+    # requests fail unless REPLAY_ON_MISS is 'synthesize'. REPLAY_ERROR_RATE_* injects
+    # upstream failures into that fraction of replayed calls
+    UPSTREAM_MODE = os.getenv('UPSTREAM_MODE', 'live').strip().lower()
+    UPSTREAM_FIXTURES_DIR = os.getenv('UPSTREAM_FIXTURES_DIR', str(_BACKEND_DIR / 'fixtures' / 'upstream'))
+    REPLAY_ON_MISS = os.getenv('REPLAY_ON_MISS', 'error').strip().lower()
+    REPLAY_LATENCY_YOUTUBE = os.getenv('REPLAY_LATENCY_YOUTUBE', 'lognormal:150:0.3')
+    REPLAY_LATENCY_TRANSCRIPT = os.getenv('REPLAY_LATENCY_TRANSCRIPT', 'lognormal:500:0.4')
+    REPLAY_LATENCY_GEMINI = os.getenv('REPLAY_LATENCY_GEMINI', 'lognormal:1500:0.5')
+    REPLAY_ERROR_RATE_YOUTUBE = float(os.getenv('REPLAY_ERROR_RATE_YOUTUBE', '0'))
+    REPLAY_ERROR_RATE_TRANSCRIPT = float(os.getenv('REPLAY_ERROR_RATE_TRANSCRIPT', '0'))
+    REPLAY_ERROR_RATE_GEMINI = float(os.getenv('REPLAY_ERROR_RATE_GEMINI', '0'))
+    REPLAY_SEED = int(os.getenv('REPLAY_SEED', '0'))
+
+    # Background course generation jobs
+    JOB_WORKERS = int(os.getenv('JOB_WORKERS', '2'))
+    JOB_RESULT_TTL = int(os.getenv('JOB_RESULT_TTL', '3600'))
+
     @classmethod
     def validate_config(cls):
         """Validate that required configuration is present"""
+        if cls.UPSTREAM_MODE == 'replay':
+            # Replayed upstreams need no credentials
+            return True
+        
         required_keys = {
             'YOUTUBE_API_KEY': cls.YOUTUBE_API_KEY,
             'GEMINI_API_KEY': cls.GEMINI_API_KEY
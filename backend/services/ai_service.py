@@ -1,60 +1,163 @@
 import google.generativeai as genai
 from config import Config
+from utils.cache import LRUCache, build_tiered_cache
+from utils.retrieval import TranscriptIndex, normalize_concept_name, normalize_question
+from utils.transcript import compact_transcript, format_segments
+from utils.single_flight import get_single_flight
+from utils.rate_limit import UPSTREAM_RETRIES, upstream_limiter, is_rate_limit_error, retry_after_from_error
+from utils.metrics import counter, histogram
+from .clients import create_gemini_model
+import concurrent.futures
+import copy
+import hashlib
 import json
 import re
 import logging
-from typing import List, Dict, Any, Optional
 import time
+from typing import List, Dict, Any, Optional, Iterator, Callable
 
 logger = logging.getLogger(__name__)
 
+# Bump whenever the concept extraction prompt or its post-processing changes,
+# so cached results produced by the old template are no longer served.
+CONCEPT_PROMPT_VERSION = 'concepts-v4'
+
+# Concept names from different transcript windows are treated as the same concept when
+# their normalized word sets (Jaccard) overlap at least this much
+CONCEPT_DUPLICATE_OVERLAP = 0.6
+
+class StreamInterrupted(Exception):
+    """Raised by streaming generators when the upstream stream fails after text was yielded"""
+
+
+ANSWER_UNAVAILABLE_MESSAGE = "Sorry, I couldn't generate an answer right now. Please try again."
+
+GEMINI_REQUEST_SECONDS = histogram(
+    'studyweave_gemini_request_duration_seconds',
+    'Gemini generate_content latency by purpose (concepts, answer, notes); streams until the last chunk',
+    ['purpose', 'outcome']
+)
+CONCEPT_PARSES = counter(
+    'studyweave_concept_parse_total',
+    'Concept extraction responses by parser: json or regex_fallback',
+    ['method']
+)
+FALLBACK_CONCEPTS = counter(
+    'studyweave_fallback_concepts_total',
+    'Videos given heuristic fallback concepts instead of extracted ones',
+    ['reason']
+)
+
 class AIService:
     def __init__(self):
-        # Configure Gemini API with validation
-        if not Config.GEMINI_API_KEY:
-            raise ValueError("GEMINI_API_KEY is required but not provided")
-        
-        genai.configure(api_key=Config.GEMINI_API_KEY)
-        self.model = genai.GenerativeModel('gemini-1.5-flash')
-        self.rate_limit_delay = 1  # seconds between API calls
+        self.model_name = 'gemini-1.5-flash'
+        # Live, recording or replaying model depending on Config.UPSTREAM_MODE
+        self.model = create_gemini_model(self.model_name)
         self.max_retries = 3
+        # Process-wide limiter shared by every thread calling Gemini
+        self.limiter = upstream_limiter('gemini')
+        
+        self.concept_generation_config = {
+            'temperature': 0.7,
+            'max_output_tokens': 1500,
+            'top_p': 0.8,
+            'top_k': 40
+        }
+        self.answer_generation_config = {
+            'temperature': 0.6,
+            'max_output_tokens': 600,
+            'top_p': 0.8,
+            'top_k': 40
+        }
+        # Concurrent extractions of the same content share one Gemini computation
+        self.concept_flight = get_single_flight('concept_extraction')
+        # Answers keyed on video, concept and normalized question text
+        self.answer_cache = LRUCache(maxsize=Config.ANSWER_CACHE_SIZE, ttl=Config.ANSWER_CACHE_TTL)
+        # Per-video BM25 indexes over transcript segments, used to pick answer context
+        self.transcript_index_cache = LRUCache(maxsize=Config.TRANSCRIPT_INDEX_CACHE_SIZE)
+        # Concept extraction results keyed by content hash, see _concept_cache_key
+        self.concept_cache = build_tiered_cache(
+            namespace='concepts',
+            maxsize=Config.CONCEPT_CACHE_SIZE,
+            ttl=Config.CONCEPT_CACHE_TTL,
+            path=Config.CACHE_DB_PATH
+        )
+    
+    def _concept_cache_key(self, video_data: Dict[str, Any], transcript_text: str, mode: str = 'single') -> str:
+        """Hash every input that determines the extraction result"""
+        key_material = json.dumps({
+            'video_id': video_data.get('id', ''),
+            'transcript_sha256': hashlib.sha256(transcript_text.encode('utf-8')).hexdigest(),
+            'prompt_version': CONCEPT_PROMPT_VERSION,
+            'mode': mode,
+            'model': self.model_name,
+            'generation_config': self.concept_generation_config
+        }, sort_keys=True)
+        return hashlib.sha256(key_material.encode('utf-8')).hexdigest()
     
-    def extract_concepts_and_timestamps(self, video_data: Dict[str, Any]) -> List[Dict[str, Any]]:
-        """Extract key concepts with timestamps from video transcript"""
+    def extract_concepts_and_timestamps(self, video_data: Dict[str, Any], use_cache: bool = True) -> List[Dict[str, Any]]:
+        """Extract key concepts with timestamps from video transcript.
+        
+        Results are memoized by content hash; pass use_cache=False to force a fresh
+        extraction (the new result still replaces the cached one). Transcripts longer than
+        Config.LONG_VIDEO_THRESHOLD_SECONDS go through the map-reduce long-video mode.
+        """
         if not video_data or not isinstance(video_data, dict):
             logger.error("Invalid video_data provided to extract_concepts_and_timestamps")
             return []
         
         if not video_data.get('transcript'):
             logger.warning(f"No transcript available for video: {video_data.get('title', 'Unknown')}")
+            FALLBACK_CONCEPTS.inc(reason='no_transcript')
             return self._create_fallback_concepts(video_data)
         
+        if self._transcript_span_seconds(video_data['transcript']) > Config.LONG_VIDEO_THRESHOLD_SECONDS:
+            return self._extract_concepts_long_video(video_data, use_cache)
+        
         # Prepare transcript text with timestamps
         transcript_text = self._format_transcript_for_ai(video_data['transcript'])
         
-        # Truncate if too long to fit in context window
-        if len(transcript_text) > 4000:
-            transcript_text = transcript_text[:4000] + "..."
-            logger.info("Truncated transcript to fit context window")
+        cache_key = self._concept_cache_key(video_data, transcript_text)
+        if use_cache:
+            cached = self.concept_cache.get(cache_key)
+            if cached is not None:
+                logger.info(f"Concept cache hit for video: {video_data.get('title', 'Unknown')}")
+                return copy.deepcopy(cached)
         
+        def extract() -> Optional[List[Dict[str, Any]]]:
+            concepts = self._run_concept_extraction(video_data, transcript_text)
+            if concepts:
+                self.concept_cache.set(cache_key, concepts)
+            return concepts
+        
+        concepts = self.concept_flight.do(cache_key, extract)
+        if concepts is None:
+            logger.error(f"All attempts failed for video: {video_data.get('title', 'Unknown')}")
+            FALLBACK_CONCEPTS.inc(reason='extraction_failed')
+            return self._create_fallback_concepts(video_data)
+        
+        return copy.deepcopy(concepts)
+    
+    def _run_concept_extraction(self, video_data: Dict[str, Any], transcript_text: str) -> Optional[List[Dict[str, Any]]]:
+        """Call Gemini with retries and parse the concepts; returns None if every attempt failed"""
         prompt = self._build_concept_extraction_prompt(video_data, transcript_text)
         
         # Retry logic for API calls
+        rate_limited = False
         for attempt in range(self.max_retries):
             try:
-                # Rate limiting
+                # Back off before retries; a throttled upstream is already paused by the limiter
                 if attempt > 0:
-                    time.sleep(self.rate_limit_delay * attempt)
+                    UPSTREAM_RETRIES.inc(upstream='gemini')
+                    if not rate_limited:
+                        self.limiter.backoff(attempt - 1)
+                rate_limited = False
                 
                 # Use Gemini API with improved error handling
-                response = self.model.generate_content(
+                response = self._generate_content(
                     f"You are an expert educational content analyzer. Extract key learning concepts from video transcripts with precise timestamps.\n\n{prompt}",
-                    generation_config=genai.types.GenerationConfig(
-                        temperature=0.7,
-                        max_output_tokens=1500,
-                        top_p=0.8,
-                        top_k=40
-                    )
+                    purpose='concepts',
+                    generation_config=genai.types.GenerationConfig(**self.concept_generation_config)
                 )
                 
                 if not response or not hasattr(response, 'text'):
@@ -74,23 +177,137 @@ class AIService:
                     
                     # Validate concepts structure
                     if self._validate_concepts(concepts):
+                        CONCEPT_PARSES.inc(method='json')
                         return concepts
                     else:
                         logger.warning("Invalid concepts structure, using fallback")
+                        CONCEPT_PARSES.inc(method='regex_fallback')
                         return self._parse_concepts_fallback(result)
                         
                 except json.JSONDecodeError as json_error:
                     logger.warning(f"Failed to parse JSON response: {json_error}, trying fallback extraction")
+                    CONCEPT_PARSES.inc(method='regex_fallback')
                     return self._parse_concepts_fallback(result)
                     
             except Exception as e:
                 logger.error(f"Attempt {attempt + 1} failed: {e}")
-                if attempt == self.max_retries - 1:
-                    logger.error(f"All attempts failed for video: {video_data.get('title', 'Unknown')}")
-                    return self._create_fallback_concepts(video_data)
+                rate_limited = is_rate_limit_error(e)
                 continue
         
-        return self._create_fallback_concepts(video_data)
+        return None
+    
+    def _transcript_span_seconds(self, transcript: List[Dict[str, Any]]) -> float:
+        """Time covered by a transcript, from zero to the end of its last entry"""
+        last = transcript[-1]
+        return float(last.get('start', 0)) + float(last.get('duration', 0))
+    
+    def _split_transcript_windows(self, transcript: List[Dict[str, Any]], window_seconds: float) -> List[List[Dict[str, Any]]]:
+        """Split transcript entries into consecutive, non-empty time windows"""
+        windows: List[List[Dict[str, Any]]] = []
+        current: List[Dict[str, Any]] = []
+        window_end = window_seconds
+        
+        for entry in transcript:
+            start = float(entry.get('start', 0))
+            if start >= window_end and current:
+                windows.append(current)
+                current = []
+            while start >= window_end:
+                window_end += window_seconds
+            current.append(entry)
+        
+        if current:
+            windows.append(current)
+        return windows
+    
+    def _extract_concepts_long_video(self, video_data: Dict[str, Any], use_cache: bool = True) -> List[Dict[str, Any]]:
+        """Map-reduce concept extraction covering the whole transcript.
+        
+        The transcript is split into time windows, concepts are extracted from each window
+        in parallel on a bounded pool, and the results are merged.
+        """
+        transcript = video_data['transcript']
+        span = self._transcript_span_seconds(transcript)
+        # Widen windows for very long videos so the number of LLM calls stays bounded
+        window_seconds = max(Config.CONCEPT_WINDOW_SECONDS, span / Config.CONCEPT_MAX_WINDOWS)
+        windows = self._split_transcript_windows(transcript, window_seconds)
+        window_texts = [self._format_transcript_for_ai(window) for window in windows]
+        
+        cache_key = self._concept_cache_key(video_data, "\n".join(window_texts), mode='map-reduce')
+        if use_cache:
+            cached = self.concept_cache.get(cache_key)
+            if cached is not None:
+                logger.info(f"Concept cache hit for video: {video_data.get('title', 'Unknown')}")
+                return copy.deepcopy(cached)
+        
+        logger.info(f"Long-video mode: extracting concepts from {len(windows)} windows of "
+                    f"{int(window_seconds)}s for video: {video_data.get('title', 'Unknown')}")
+        
+        def extract() -> Optional[List[Dict[str, Any]]]:
+            with concurrent.futures.ThreadPoolExecutor(max_workers=Config.CONCEPT_MAP_WORKERS) as executor:
+                window_results = list(executor.map(
+                    lambda text: self._run_concept_extraction(video_data, text),
+                    window_texts
+                ))
+            
+            successful = [concepts for concepts in window_results if concepts is not None]
+            if not successful:
+                return None
+            
+            merged = self._merge_window_concepts(successful)
+            if len(successful) < len(window_results):
+                # Don't cache partial coverage; a later request may get every window
+                logger.warning(f"{len(window_results) - len(successful)} of {len(window_results)} windows failed")
+            elif merged:
+                self.concept_cache.set(cache_key, merged)
+            return merged
+        
+        merged = self.concept_flight.do(cache_key, extract)
+        if merged is None:
+            logger.error(f"All windows failed for video: {video_data.get('title', 'Unknown')}")
+            FALLBACK_CONCEPTS.inc(reason='extraction_failed')
+            return self._create_fallback_concepts(video_data)
+        return copy.deepcopy(merged)
+    
+    def _merge_window_concepts(self, window_results: List[List[Dict[str, Any]]]) -> List[Dict[str, Any]]:
+        """Merge per-window concepts into at most Config.LONG_VIDEO_MAX_CONCEPTS.
+        
+        Names are compared in normalize_concept_name form; near-duplicates (word sets
+        overlapping by CONCEPT_DUPLICATE_OVERLAP) are grouped and keep their earliest
+        occurrence. Groups are ranked by how many windows produced them, then by their
+        position in a window's list, so the cap keeps recurring concepts and each
+        window's leading ones.
+        """
+        groups: List[Dict[str, Any]] = []
+        
+        for window_index, concepts in enumerate(window_results):
+            for rank, concept in enumerate(concepts):
+                key = normalize_concept_name(concept.get('name', ''))
+                if not key:
+                    continue
+                
+                concept = dict(concept)
+                if self._is_valid_timestamp(concept.get('timestamp', '')):
+                    concept['timestamp_seconds'] = self._convert_timestamp(concept['timestamp'])
+                concept['timestamp_seconds'] = int(concept.get('timestamp_seconds') or 0)
+                
+                group = next((g for g in groups if self._is_duplicate_concept(g['key'], key)), None)
+                if group is None:
+                    groups.append({'key': key, 'concept': concept, 'windows': {window_index}, 'rank': rank})
+                    continue
+                group['windows'].add(window_index)
+                group['rank'] = min(group['rank'], rank)
+                if concept['timestamp_seconds'] < group['concept']['timestamp_seconds']:
+                    group['concept'] = concept
+        
+        groups.sort(key=lambda g: (-len(g['windows']), g['rank'], g['concept']['timestamp_seconds']))
+        kept = [group['concept'] for group in groups[:Config.LONG_VIDEO_MAX_CONCEPTS]]
+        return sorted(kept, key=lambda c: c['timestamp_seconds'])
+    
+    def _is_duplicate_concept(self, key: str, other: str) -> bool:
+        """Whether two normalized concept names (see normalize_concept_name) name the same concept"""
+        words, other_words = set(key.split()), set(other.split())
+        return len(words & other_words) / len(words | other_words) >= CONCEPT_DUPLICATE_OVERLAP
     
     def _validate_concepts(self, concepts: List[Dict[str, Any]]) -> bool:
         """Validate the structure and content of extracted concepts"""
@@ -145,17 +362,14 @@ class AIService:
         
         return True
 
-    def _format_transcript_for_ai(self, transcript):
-        """Format transcript with timestamps for AI analysis"""
-        formatted_lines = []
-        
-        for entry in transcript[:50]:  # Limit to first 50 entries to avoid token limits
-            timestamp = int(entry['start'])
-            minutes = timestamp // 60
-            seconds = timestamp % 60
-            formatted_lines.append(f"[{minutes:02d}:{seconds:02d}] {entry['text']}")
+    def _format_transcript_for_ai(self, transcript, token_budget: Optional[int] = None):
+        """Format transcript with timestamps for AI analysis.
         
-        return "\n".join(formatted_lines)
+        Caption fragments are compacted into de-noised segments with one timestamp each,
+        then sampled across the timeline to fill the token budget.
+        """
+        segments = compact_transcript(transcript, max_segment_seconds=Config.TRANSCRIPT_SEGMENT_SECONDS)
+        return format_segments(segments, token_budget or Config.TRANSCRIPT_TOKEN_BUDGET)
     
     def _build_concept_extraction_prompt(self, video_data, transcript_text):
         """Build the prompt for concept extraction"""
@@ -253,9 +467,11 @@ Return response as valid JSON in this exact format:
                 f"Practical example to apply {title}",
             ]
 
+        # 'fallback' marks heuristic concepts so responses built on them can report degradation
         concepts = []
         for i, bullet in enumerate(bullets[:5]):
             concepts.append({
+                'fallback': True,
                 'name': bullet.split(':')[0][:60] if ':' in bullet else (bullet[:60] or f"Concept {i+1}"),
                 'timestamp': '00:00' if i == 0 else f"0{i}:00" if i < 6 else '00:00',
                 'timestamp_seconds': 0 if i == 0 else i * 60,
@@ -280,6 +496,7 @@ Return response as valid JSON in this exact format:
             })
 
         return concepts[:5] if concepts else [{
+            'fallback': True,
             'name': f"Introduction to {title}",
             'timestamp': '00:00',
             'timestamp_seconds': 0,
@@ -325,13 +542,88 @@ Return response as valid JSON in this exact format:
             "estimated_duration": f"{len(all_concepts) * 10}-{len(all_concepts) * 15} minutes"
         }
 
-    def answer_question(self, question: str, video_data: Optional[Dict[str, Any]], concept: Optional[Dict[str, Any]] = None) -> str:
-        """Answer a learner question grounded in transcript/notes when available."""
+    def answer_question(self, question: str, video_data: Optional[Dict[str, Any]], concept: Optional[Dict[str, Any]] = None,
+                        position_seconds: Optional[float] = None) -> str:
+        """Answer a learner question grounded in transcript/notes when available.
+        
+        position_seconds is the learner's playback position; when given, the transcript
+        around that point is used as context.
+        """
+        context = self._build_answer_context(question, video_data, concept, position_seconds)
+        cache_key = self._answer_cache_key(question, video_data, concept, context)
+        if cache_key:
+            cached = self.answer_cache.get(cache_key)
+            if cached is not None:
+                return cached
+
+        prompt = self._build_answer_prompt(question, context)
+
+        try:
+            response = self._generate_content(
+                prompt,
+                purpose='answer',
+                generation_config=genai.types.GenerationConfig(**self.answer_generation_config)
+            )
+            answer = (response.text or '').strip() if hasattr(response, 'text') else ""
+        except Exception as e:
+            logger.error(f"Answer question failed: {e}")
+            return ANSWER_UNAVAILABLE_MESSAGE
+
+        if cache_key and answer:
+            self.answer_cache.set(cache_key, answer)
+        return answer
+
+    def stream_answer(self, question: str, video_data: Optional[Dict[str, Any]], concept: Optional[Dict[str, Any]] = None,
+                      position_seconds: Optional[float] = None) -> Iterator[str]:
+        """Yield answer text chunks as Gemini produces them.
+        
+        Falls back to the blocking answer_question path if streaming fails before any output;
+        raises StreamInterrupted if it fails after some.
+        """
+        context = self._build_answer_context(question, video_data, concept, position_seconds)
+        cache_key = self._answer_cache_key(question, video_data, concept, context)
+        if cache_key:
+            cached = self.answer_cache.get(cache_key)
+            if cached is not None:
+                yield cached
+                return
+
+        def store(answer: str) -> None:
+            if cache_key and answer.strip():
+                self.answer_cache.set(cache_key, answer.strip())
+
+        prompt = self._build_answer_prompt(question, context)
+        yield from self._stream_generate(
+            prompt,
+            purpose='answer',
+            generation_config=genai.types.GenerationConfig(**self.answer_generation_config),
+            fallback=lambda: self.answer_question(question, video_data, concept, position_seconds),
+            on_complete=store
+        )
+
+    def _answer_cache_key(self, question: str, video_data: Optional[Dict[str, Any]], concept: Optional[Dict[str, Any]],
+                          context: str) -> Optional[str]:
+        """Cache key for an answer, or None if the question has no content words"""
+        normalized = normalize_question(question)
+        if not normalized:
+            return None
+        video_id = (video_data or {}).get('id', '')
+        concept_name = ((concept or {}).get('name') or '').strip().lower()
+        # The answer depends on exactly which transcript text and notes the model saw
+        context_hash = hashlib.sha256(context.encode('utf-8')).hexdigest()
+        return '\x1f'.join((video_id, concept_name, context_hash, normalized))
+
+    def _build_answer_context(self, question: str, video_data: Optional[Dict[str, Any]], concept: Optional[Dict[str, Any]] = None,
+                              position_seconds: Optional[float] = None) -> str:
+        """Context section of the answer prompt: retrieved transcript text and concept notes"""
         context_parts = []
         if video_data:
             context_parts.append(f"Video Title: {video_data.get('title','')}")
             if video_data.get('transcript'):
-                context_parts.append(self._format_transcript_for_ai(video_data['transcript']))
+                # Retrieve with the normalized question so equivalent phrasings see the same
+                # segments, and so share an answer cache key
+                query = normalize_question(question) or question
+                context_parts.append(self._retrieve_transcript_context(query, video_data, concept, position_seconds))
             else:
                 context_parts.append((video_data.get('description') or '')[:800])
         if concept:
@@ -340,29 +632,259 @@ Return response as valid JSON in this exact format:
                 context_parts.append(f"Summary: {concept['summary']}")
             if concept.get('notes'):
                 context_parts.append("Notes:\n- " + "\n- ".join(concept['notes'][:6]))
+        return "\n\n".join(context_parts)
 
-        prompt = (
+    def _build_answer_prompt(self, question: str, context: str) -> str:
+        """Build the grounded tutoring prompt for answer_question"""
+        return (
             "You are a patient teacher. Answer the learner's question clearly and concisely. "
             "Use the provided context first; if something is unknown, say so and explain how to think about it. "
             "Structure the answer with: brief explanation, simple example, and a takeaway.\n\n"
-            f"QUESTION:\n{question}\n\nCONTEXT:\n" + "\n\n".join(context_parts)
+            f"QUESTION:\n{question}\n\nCONTEXT:\n{context}"
         )
 
-        try:
-            response = self.model.generate_content(
-                prompt,
-                generation_config=genai.types.GenerationConfig(
-                    temperature=0.6,
-                    max_output_tokens=600,
-                    top_p=0.8,
-                    top_k=40
-                )
+    def _get_transcript_index(self, video_data: Dict[str, Any]) -> TranscriptIndex:
+        """Build the BM25 index for a video's transcript once and reuse it"""
+        transcript = video_data['transcript']
+        # Transcripts arrive from the client, so key on their content rather than the video ID
+        cache_key = self._transcript_index_key(transcript)
+        index = self.transcript_index_cache.get(cache_key)
+        if index is None:
+            segments = compact_transcript(transcript, max_segment_seconds=Config.TRANSCRIPT_SEGMENT_SECONDS)
+            index = TranscriptIndex(segments)
+            self.transcript_index_cache.set(cache_key, index)
+        return index
+
+    def _transcript_index_key(self, transcript: List[Dict[str, Any]]) -> str:
+        """sha256 over every segment's start and text"""
+        digest = hashlib.sha256()
+        for entry in transcript:
+            digest.update(f"{entry.get('start', '')}\x1f{entry.get('text', '')}\x1e".encode('utf-8'))
+        digest.update(str(Config.TRANSCRIPT_SEGMENT_SECONDS).encode('utf-8'))
+        return digest.hexdigest()
+
+    def _retrieve_transcript_context(self, question: str, video_data: Dict[str, Any], concept: Optional[Dict[str, Any]] = None,
+                                     position_seconds: Optional[float] = None) -> str:
+        """Pick the transcript segments most relevant to the question, within a fixed budget.
+        
+        A playback position selects the window around it; otherwise the concept's time range
+        is used; otherwise segments are ranked lexically against the question.
+        """
+        index = self._get_transcript_index(video_data)
+
+        segments = []
+        if position_seconds is not None:
+            segments = index.between(
+                position_seconds - Config.POSITION_CONTEXT_BEFORE_SECONDS,
+                position_seconds + Config.POSITION_CONTEXT_AFTER_SECONDS
             )
-            return (response.text or '').strip() if hasattr(response, 'text') else ""
+        elif concept and concept.get('timestamp_seconds') is not None:
+            try:
+                start = float(concept['timestamp_seconds'])
+                end = float(concept.get('timestamp_end_seconds') or start + Config.POSITION_CONTEXT_BEFORE_SECONDS)
+                segments = index.between(start, max(start, end))
+            except (TypeError, ValueError):
+                segments = []
+        if segments:
+            return format_segments(segments, Config.ANSWER_CONTEXT_TOKEN_BUDGET)
+
+        query = question
+        if concept and concept.get('name'):
+            query = f"{question} {concept['name']}"
+
+        segments = index.search(query, Config.ANSWER_CONTEXT_SEGMENTS)
+        if not segments:
+            # Nothing matched lexically; fall back to an overview of the whole video
+            return self._format_transcript_for_ai(video_data['transcript'], token_budget=Config.ANSWER_CONTEXT_TOKEN_BUDGET)
+        return format_segments(segments, Config.ANSWER_CONTEXT_TOKEN_BUDGET)
+
+    def generate_study_notes(self, text: str) -> str:
+        """Produce study notes for lecture text; returns an empty string on failure"""
+        return self._generate_notes(self._notes_prompt_for(text))
+
+    def _generate_notes(self, prompt: str) -> str:
+        try:
+            response = self._generate_content(prompt, purpose='notes')
+            return response.text.strip() if hasattr(response, 'text') else ''
         except Exception as e:
-            logger.error(f"Answer question failed: {e}")
-            return "Sorry, I couldn't generate an answer right now. Please try again."
-    
+            logger.error(f"Study notes generation failed: {e}")
+            return ''
+
+    def stream_study_notes(self, text: str,
+                           on_complete: Optional[Callable[[str], None]] = None) -> Iterator[str]:
+        """Yield study note chunks as Gemini produces them, falling back to generate_study_notes.
+        
+        on_complete receives the full notes when they were produced completely, by the
+        stream or by the fallback. Raises StreamInterrupted if the stream fails midway.
+        """
+        # Large documents finish their map phase here; only the reduce pass is streamed
+        prompt = self._notes_prompt_for(text)
+        
+        def fallback() -> str:
+            notes = self._generate_notes(prompt)
+            if notes and on_complete is not None:
+                on_complete(notes)
+            return notes
+        
+        yield from self._stream_generate(
+            prompt,
+            purpose='notes',
+            fallback=fallback,
+            on_complete=on_complete
+        )
+
+    def _notes_prompt_for(self, text: str) -> str:
+        """Final notes prompt: the text itself, or for large documents a reduce prompt over
+        per-chunk notes so the whole document is covered"""
+        if len(text) <= Config.UPLOAD_TEXT_MAX_CHARS:
+            return self._build_notes_prompt(text)
+        
+        # Pasted transcripts skip extraction, so apply the document budget here too
+        part_notes = self._summarize_document_chunks(text[:Config.DOCUMENT_MAX_CHARS])
+        if not part_notes:
+            logger.warning("Every document chunk failed; falling back to notes on the leading text")
+            return self._build_notes_prompt(text)
+        return self._build_notes_reduce_prompt(part_notes)
+
+    def _split_document_chunks(self, text: str, chunk_chars: int) -> List[str]:
+        """Split text into chunks of at most chunk_chars, breaking between lines where possible"""
+        chunks: List[str] = []
+        current: List[str] = []
+        size = 0
+        
+        for line in text.splitlines():
+            # Lines longer than a whole chunk are cut into chunk-sized pieces
+            pieces = [line[i:i + chunk_chars] for i in range(0, len(line), chunk_chars)] or ['']
+            for piece in pieces:
+                if size + len(piece) > chunk_chars and current:
+                    chunks.append("\n".join(current))
+                    current = []
+                    size = 0
+                current.append(piece)
+                size += len(piece) + 1
+        
+        if current:
+            chunks.append("\n".join(current))
+        return [chunk for chunk in chunks if chunk.strip()]
+
+    def _summarize_document_chunks(self, text: str) -> List[str]:
+        """Map phase of large-document notes: condensed notes for each chunk, in document order.
+        
+        Chunks are summarized in parallel on a bounded pool; chunks that fail are dropped.
+        """
+        # Widen chunks for very large documents so the number of LLM calls stays bounded
+        chunk_chars = max(Config.NOTES_CHUNK_CHARS, -(-len(text) // Config.NOTES_MAX_CHUNKS))
+        chunks = self._split_document_chunks(text, chunk_chars)
+        logger.info(f"Large-document mode: summarizing {len(chunks)} chunks of up to {chunk_chars} characters")
+        
+        prompts = [
+            self._build_chunk_notes_prompt(chunk, index + 1, len(chunks))
+            for index, chunk in enumerate(chunks)
+        ]
+        with concurrent.futures.ThreadPoolExecutor(max_workers=Config.NOTES_MAP_WORKERS) as executor:
+            results = list(executor.map(self._generate_notes, prompts))
+        
+        successful = [notes for notes in results if notes]
+        if len(successful) < len(results):
+            logger.warning(f"{len(results) - len(successful)} of {len(results)} document chunks failed")
+        return successful
+
+    def _build_notes_prompt(self, text: str) -> str:
+        """Build the study notes prompt for uploaded lecture text"""
+        return (
+            "You are a helpful educator. Given lecture text/transcript, produce concise study notes with: "
+            "summary (4-6 sentences), 5 key bullet points, 3 terminology definitions, and 2 practice questions.\n\n"
+            f"TEXT:\n{text[:Config.UPLOAD_TEXT_MAX_CHARS]}"
+        )
+
+    def _build_chunk_notes_prompt(self, chunk: str, part: int, total: int) -> str:
+        """Build the map-phase prompt for one chunk of a large document"""
+        return (
+            f"You are a helpful educator. The text below is part {part} of {total} of a longer lecture document. "
+            "Write condensed notes for this part only: a 2-3 sentence summary, its key points as bullets, "
+            "and important terms with one-line definitions. Use only information from the text.\n\n"
+            f"TEXT:\n{chunk}"
+        )
+
+    def _build_notes_reduce_prompt(self, part_notes: List[str]) -> str:
+        """Build the reduce-phase prompt combining per-chunk notes into the usual notes format"""
+        sections = "\n\n".join(f"PART {index + 1}:\n{notes}" for index, notes in enumerate(part_notes))
+        return (
+            "You are a helpful educator. Below are notes on consecutive parts of one lecture document. "
+            "Combine them into concise study notes for the whole document with: "
+            "summary (4-6 sentences), 5 key bullet points, 3 terminology definitions, and 2 practice questions.\n\n"
+            f"PART NOTES:\n{sections}"
+        )
+
+    def _generate_content(self, prompt: str, purpose: str, **kwargs) -> Any:
+        """Call Gemini through the shared rate limiter, pausing all callers when throttled.
+        
+        purpose labels the latency metric; a streamed call is timed until its last chunk.
+        """
+        self.limiter.acquire()
+        start = time.perf_counter()
+        try:
+            response = self.model.generate_content(prompt, **kwargs)
+        except Exception as e:
+            GEMINI_REQUEST_SECONDS.observe(time.perf_counter() - start, purpose=purpose, outcome='error')
+            if is_rate_limit_error(e):
+                self.limiter.penalize(retry_after_from_error(e))
+            raise
+        if kwargs.get('stream'):
+            return self._timed_stream(response, purpose, start)
+        GEMINI_REQUEST_SECONDS.observe(time.perf_counter() - start, purpose=purpose, outcome='success')
+        return response
+
+    def _timed_stream(self, response: Any, purpose: str, start: float) -> Iterator[Any]:
+        """Yield streamed chunks, observing the call latency once the stream ends"""
+        outcome = 'cancelled'
+        try:
+            for chunk in response:
+                yield chunk
+            outcome = 'success'
+        except Exception:
+            outcome = 'error'
+            raise
+        finally:
+            GEMINI_REQUEST_SECONDS.observe(time.perf_counter() - start, purpose=purpose, outcome=outcome)
+
+    def _stream_generate(self, prompt: str, purpose: str, generation_config: Any = None,
+                         fallback: Optional[Callable[[], str]] = None,
+                         on_complete: Optional[Callable[[str], None]] = None) -> Iterator[str]:
+        """Forward streamed response chunks from Gemini.
+        
+        If the stream fails before producing any text, the non-streaming fallback is
+        called once and its result yielded as a single chunk. If it fails after, the text
+        so far is incomplete and StreamInterrupted is raised. on_complete receives the
+        full text only when the stream finished cleanly, so partial text is never cached.
+        """
+        produced = False
+        chunks: List[str] = []
+        try:
+            response = self._generate_content(prompt, purpose=purpose, generation_config=generation_config, stream=True)
+            for chunk in response:
+                try:
+                    text = chunk.text
+                except (ValueError, AttributeError):
+                    # Chunks without text parts (e.g. safety metadata) are skipped
+                    continue
+                if text:
+                    produced = True
+                    chunks.append(text)
+                    yield text
+        except Exception as e:
+            logger.warning(f"Streaming generation failed{' mid-stream' if produced else ''}: {e}")
+            if produced:
+                raise StreamInterrupted(str(e)) from e
+        
+        if produced:
+            if on_complete is not None:
+                on_complete(''.join(chunks))
+        elif fallback is not None:
+            text = fallback()
+            if text:
+                yield text
+
     def _generate_course_title(self, video_data_list):
         """Generate a course title based on video titles"""
         if not video_data_list:
@@ -0,0 +1,605 @@
+"""Upstream client layer: live, recording and replaying clients for YouTube and Gemini.
+
+Config.UPSTREAM_MODE selects the implementation:
+
+- 'live': the real googleapiclient, youtube_transcript_api and Gemini clients.
+- 'record': the real clients, with every response (or error) also written to a fixture
+  file under Config.UPSTREAM_FIXTURES_DIR.
+- 'replay': responses are served from the fixture files after a sampled latency; no
+  network access or API keys are needed. Requests without a fixture raise
+  FixtureNotFound, or get a deterministic synthetic response when
+  Config.REPLAY_ON_MISS is 'synthesize'. A configurable fraction of replayed calls
+  fail with an injected upstream error (Config.REPLAY_ERROR_RATE_*).
+
+Fixtures are JSON files named by a hash of the request, one directory per upstream.
+"""
+
+import copy
+import hashlib
+import json
+import logging
+import math
+import os
+import random
+import re
+import tempfile
+import threading
+import time
+from typing import Any, Callable, Dict, Iterator, List, Optional
+
+import google.generativeai as genai
+import httplib2
+from googleapiclient.discovery import build
+from googleapiclient.errors import HttpError
+from youtube_transcript_api import YouTubeTranscriptApi
+from youtube_transcript_api import _errors as transcript_errors
+
+from config import Config
+
+logger = logging.getLogger(__name__)
+
+UPSTREAM_MODES = ('live', 'record', 'replay')
+
+
+class FixtureNotFound(Exception):
+    """Raised in replay mode for a request that was never recorded"""
+
+
+class LatencyModel:
+    """Samples upstream latency from a distribution spec, in milliseconds:
+
+    'fixed:MS', 'uniform:LOW:HIGH', 'normal:MEAN:STDDEV' or 'lognormal:MEDIAN:SIGMA'.
+    An empty spec or '0' means no added latency.
+    """
+
+    def __init__(self, spec: str, seed: int = 0):
+        self.spec = (spec or '0').strip()
+        self.seed = seed
+        self._rng = random.Random(seed)
+        self._lock = threading.Lock()
+
+        kind, _, params = self.spec.partition(':')
+        try:
+            values = [float(value) for value in params.split(':')] if params else []
+            if kind in ('0', 'none'):
+                self._sample = lambda rng: 0.0
+            elif kind == 'fixed' and len(values) == 1:
+                self._sample = lambda rng: values[0]
+            elif kind == 'uniform' and len(values) == 2:
+                self._sample = lambda rng: rng.uniform(values[0], values[1])
+            elif kind == 'normal' and len(values) == 2:
+                self._sample = lambda rng: rng.gauss(values[0], values[1])
+            elif kind == 'lognormal' and len(values) == 2:
+                self._sample = lambda rng: rng.lognormvariate(math.log(values[0]), values[1])
+            else:
+                raise ValueError
+        except ValueError:
+            raise ValueError(f"Invalid latency spec: {self.spec!r}")
+
+    def sample(self) -> float:
+        """Latency in seconds, never negative"""
+        with self._lock:
+            return max(self._sample(self._rng), 0.0) / 1000.0
+
+    def sleep(self) -> None:
+        delay = self.sample()
+        if delay:
+            time.sleep(delay)
+
+
+class FixtureStore:
+    """Recorded upstream responses as JSON files keyed by a hash of the request"""
+
+    def __init__(self, root: str):
+        self.root = root
+
+    def key(self, request: Dict[str, Any]) -> str:
+        material = json.dumps(request, sort_keys=True, separators=(',', ':'), default=str)
+        return hashlib.sha256(material.encode('utf-8')).hexdigest()[:32]
+
+    def _path(self, upstream: str, request: Dict[str, Any]) -> str:
+        return os.path.join(self.root, upstream, f"{self.key(request)}.json")
+
+    def load(self, upstream: str, request: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+        try:
+            with open(self._path(upstream, request), encoding='utf-8') as f:
+                return json.load(f)
+        except FileNotFoundError:
+            return None
+
+    def save(self, upstream: str, request: Dict[str, Any], entry: Dict[str, Any]) -> None:
+        path = self._path(upstream, request)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        # Write then rename so concurrent readers never see a partial fixture
+        fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(path), suffix='.tmp')
+        try:
+            with os.fdopen(fd, 'w', encoding='utf-8') as f:
+                json.dump({'request': request, **entry}, f, indent=1, default=str)
+            os.replace(tmp_path, path)
+        except OSError as e:
+            logger.warning(f"Could not record {upstream} fixture: {e}")
+            try:
+                os.unlink(tmp_path)
+            except OSError:
+                pass
+
+
+class _ReplayedError(Exception):
+    """Base for replayed upstream errors: keeps the recorded message without needing the
+    original exception's constructor arguments"""
+
+    def __init__(self, message: str):
+        # Skip the original class's constructor, which may require other arguments
+        Exception.__init__(self, message)
+        self.message = message
+
+    def __str__(self) -> str:
+        return self.message
+
+
+_replayed_error_types: Dict[str, type] = {}
+
+
+def _replayed_error(error: Dict[str, Any], module: Any = None) -> Exception:
+    """Rebuild a recorded error as an instance of the original class when it is known,
+    so the services' except clauses behave as they did when recording"""
+    name = error.get('type', 'Exception')
+    error_type = _replayed_error_types.get(name)
+    if error_type is None:
+        original = getattr(module, name, None) if module is not None else None
+        bases = (_ReplayedError, original) if isinstance(original, type) and issubclass(original, Exception) else (_ReplayedError,)
+        error_type = type(name, bases, {})
+        _replayed_error_types[name] = error_type
+    return error_type(error.get('message', ''))
+
+
+def _recorded_error(e: Exception) -> Dict[str, Any]:
+    return {'error': {'type': type(e).__name__, 'message': str(e)}}
+
+
+class _Replayer:
+    """Shared replay plumbing: fixture lookup, miss policy, latency and injected errors"""
+
+    def __init__(self, upstream: str, store: FixtureStore, latency: LatencyModel,
+                 synthesize: Optional[Callable[[Dict[str, Any]], Dict[str, Any]]] = None,
+                 error_rate: float = 0.0, injected_error: Optional[Dict[str, Any]] = None):
+        self.upstream = upstream
+        self.store = store
+        self.latency = latency
+        self.synthesize = synthesize if Config.REPLAY_ON_MISS == 'synthesize' else None
+        self.error_rate = error_rate
+        self.injected_error = injected_error
+        self._rng = random.Random(latency.seed)
+        self._rng_lock = threading.Lock()
+
+    def entry(self, request: Dict[str, Any]) -> Dict[str, Any]:
+        if self.error_rate and self.injected_error is not None:
+            with self._rng_lock:
+                fail = self._rng.random() < self.error_rate
+            if fail:
+                self.latency.sleep()
+                # Callers may mutate what they get back, so never hand out the shared dict
+                return copy.deepcopy(self.injected_error)
+
+        entry = self.store.load(self.upstream, request)
+        if entry is None:
+            if self.synthesize is None:
+                raise FixtureNotFound(f"No recorded {self.upstream} response for {json.dumps(request, default=str)[:200]}")
+            entry = self.synthesize(request)
+        self.latency.sleep()
+        return entry
+
+
+# YouTube Data API
+
+class _YouTubeResource:
+    def __init__(self, execute: Callable[[str, Dict[str, Any]], Dict[str, Any]], resource: str):
+        self._execute = execute
+        self._resource = resource
+
+    def list(self, **params) -> '_YouTubeRequest':
+        return _YouTubeRequest(self._execute, self._resource, params)
+
+
+class _YouTubeRequest:
+    def __init__(self, execute: Callable[[str, Dict[str, Any]], Dict[str, Any]], resource: str, params: Dict[str, Any]):
+        self._execute = execute
+        self._resource = resource
+        self._params = params
+
+    def execute(self) -> Dict[str, Any]:
+        return self._execute(self._resource, self._params)
+
+
+def _youtube_request(resource: str, params: Dict[str, Any]) -> Dict[str, Any]:
+    return {'resource': resource, 'method': 'list', 'params': params}
+
+
+def _http_error_entry(e: HttpError) -> Dict[str, Any]:
+    content = e.content.decode('utf-8', 'replace') if isinstance(e.content, bytes) else str(e.content)
+    headers = {'retry-after': e.resp.get('retry-after')} if e.resp.get('retry-after') else {}
+    return {'http_error': {'status': e.resp.status, 'headers': headers, 'content': content}}
+
+
+class RecordingYouTubeClient:
+    """Real YouTube Data API client that also records every videos/search list call"""
+
+    def __init__(self, client: Any, store: FixtureStore):
+        self._client = client
+        self._store = store
+
+    def videos(self) -> _YouTubeResource:
+        return _YouTubeResource(self._execute, 'videos')
+
+    def search(self) -> _YouTubeResource:
+        return _YouTubeResource(self._execute, 'search')
+
+    def _execute(self, resource: str, params: Dict[str, Any]) -> Dict[str, Any]:
+        request = _youtube_request(resource, params)
+        try:
+            response = getattr(self._client, resource)().list(**params).execute()
+        except HttpError as e:
+            self._store.save('youtube', request, _http_error_entry(e))
+            raise
+        self._store.save('youtube', request, {'response': response})
+        return response
+
+
+class ReplayYouTubeClient:
+    """Serves recorded YouTube Data API responses, re-raising recorded HTTP errors"""
+
+    def __init__(self, store: FixtureStore, latency: LatencyModel, error_rate: float = 0.0):
+        self._replayer = _Replayer(
+            'youtube', store, latency, synthesize=_synthesize_youtube, error_rate=error_rate,
+            injected_error={'http_error': {'status': 503, 'headers': {}, 'content': 'Injected replay error: backendError'}}
+        )
+
+    def videos(self) -> _YouTubeResource:
+        return _YouTubeResource(self._execute, 'videos')
+
+    def search(self) -> _YouTubeResource:
+        return _YouTubeResource(self._execute, 'search')
+
+    def _execute(self, resource: str, params: Dict[str, Any]) -> Dict[str, Any]:
+        entry = self._replayer.entry(_youtube_request(resource, params))
+        if 'http_error' in entry:
+            error = entry['http_error']
+            resp = httplib2.Response({'status': error['status'], **error.get('headers', {})})
+            raise HttpError(resp, error.get('content', '').encode('utf-8'))
+        return copy.deepcopy(entry['response'])
+
+
+def _synthesize_youtube(request: Dict[str, Any]) -> Dict[str, Any]:
+    params = request['params']
+    if request['resource'] == 'search':
+        rng = random.Random(params.get('q', ''))
+        return {'response': {'items': [{
+            'id': {'videoId': _synthetic_video_id(rng)},
+            'snippet': {
+                'title': f"{params.get('q', 'Lecture')[:60]} (part {index + 1})",
+                'channelTitle': 'Synthetic Channel',
+                'thumbnails': {'high': {'url': ''}}
+            }
+        } for index in range(int(params.get('maxResults', 5)))]}}
+
+    items = []
+    for video_id in str(params.get('id', '')).split(','):
+        if not video_id:
+            continue
+        minutes = _synthetic_minutes(video_id)
+        items.append({
+            'id': video_id,
+            'snippet': {
+                'title': f"Synthetic lecture {video_id}",
+                'description': f"Replay stand-in for video {video_id}",
+                'channelTitle': 'Synthetic Channel',
+                'publishedAt': '2024-01-01T00:00:00Z',
+                'thumbnails': {'high': {'url': f"https://i.ytimg.com/vi/{video_id}/hqdefault.jpg"}}
+            },
+            'contentDetails': {'duration': f"PT{minutes}M"},
+            'statistics': {'viewCount': '1000', 'likeCount': '100', 'commentCount': '10'}
+        })
+    return {'response': {'items': items}}
+
+
+def _synthetic_video_id(rng: random.Random) -> str:
+    alphabet = 'abcdefghijklmnopqrstuvwxyzABCDEFGHIJKLMNOPQRSTUVWXYZ0123456789_-'
+    return ''.join(rng.choice(alphabet) for _ in range(11))
+
+
+def _synthetic_minutes(video_id: str) -> int:
+    return 5 + random.Random(video_id).randint(0, 25)
+
+
+# YouTube transcripts
+
+class _TranscriptTrack:
+    def __init__(self, fetch: Callable[[], List[Dict[str, Any]]], language_code: str, is_generated: bool):
+        self._fetch = fetch
+        self.language_code = language_code
+        self.is_generated = is_generated
+
+    def fetch(self) -> List[Dict[str, Any]]:
+        return self._fetch()
+
+
+def _transcript_request(call: str, video_id: str, **params) -> Dict[str, Any]:
+    return {'call': call, 'video_id': video_id, **params}
+
+
+class RecordingTranscriptClient:
+    """youtube_transcript_api stand-in that records transcripts, track lists and errors"""
+
+    def __init__(self, store: FixtureStore):
+        self._store = store
+
+    def _record(self, request: Dict[str, Any], call: Callable[[], Any]) -> Any:
+        try:
+            result = call()
+        except Exception as e:
+            self._store.save('transcript', request, _recorded_error(e))
+            raise
+        return result
+
+    def get_transcript(self, video_id: str, languages=('en',)) -> List[Dict[str, Any]]:
+        request = _transcript_request('get_transcript', video_id, languages=list(languages))
+        transcript = self._record(request, lambda: YouTubeTranscriptApi.get_transcript(video_id, languages=languages))
+        self._store.save('transcript', request, {'response': [dict(entry) for entry in transcript]})
+        return transcript
+
+    def list_transcripts(self, video_id: str) -> List[_TranscriptTrack]:
+        request = _transcript_request('list_transcripts', video_id)
+        tracks = list(self._record(request, lambda: YouTubeTranscriptApi.list_transcripts(video_id)))
+        self._store.save('transcript', request, {'response': [
+            {'language_code': track.language_code, 'is_generated': track.is_generated} for track in tracks
+        ]})
+        return [
+            _TranscriptTrack(lambda track=track: self._fetch_track(video_id, track), track.language_code, track.is_generated)
+            for track in tracks
+        ]
+
+    def _fetch_track(self, video_id: str, track: Any) -> List[Dict[str, Any]]:
+        request = _transcript_request('fetch', video_id, language_code=track.language_code)
+        transcript = self._record(request, track.fetch)
+        self._store.save('transcript', request, {'response': [dict(entry) for entry in transcript]})
+        return transcript
+
+
+class ReplayTranscriptClient:
+    """Serves recorded transcripts and track lists, re-raising recorded transcript errors"""
+
+    def __init__(self, store: FixtureStore, latency: LatencyModel, error_rate: float = 0.0):
+        self._replayer = _Replayer(
+            'transcript', store, latency, synthesize=_synthesize_transcript, error_rate=error_rate,
+            injected_error={'error': {'type': 'CouldNotRetrieveTranscript', 'message': 'Injected replay error'}}
+        )
+
+    def _response(self, request: Dict[str, Any]) -> Any:
+        entry = self._replayer.entry(request)
+        if 'error' in entry:
+            raise _replayed_error(entry['error'], transcript_errors)
+        return copy.deepcopy(entry['response'])
+
+    def get_transcript(self, video_id: str, languages=('en',)) -> List[Dict[str, Any]]:
+        return self._response(_transcript_request('get_transcript', video_id, languages=list(languages)))
+
+    def list_transcripts(self, video_id: str) -> List[_TranscriptTrack]:
+        tracks = self._response(_transcript_request('list_transcripts', video_id))
+        return [
+            _TranscriptTrack(
+                lambda code=track['language_code']: self._response(_transcript_request('fetch', video_id, language_code=code)),
+                track['language_code'],
+                track.get('is_generated', False)
+            )
+            for track in tracks
+        ]
+
+
+_SYNTHETIC_TOPICS = (
+    'definitions and notation', 'a worked example', 'the core algorithm', 'common mistakes',
+    'a real-world application', 'complexity and trade-offs', 'a summary of key ideas'
+)
+
+
+def _synthesize_transcript(request: Dict[str, Any]) -> Dict[str, Any]:
+    video_id = request['video_id']
+    if request['call'] == 'list_transcripts':
+        return {'response': [{'language_code': 'en', 'is_generated': True}]}
+
+    rng = random.Random(video_id)
+    duration = _synthetic_minutes(video_id) * 60
+    entries = []
+    start = 0.0
+    index = 0
+    while start < duration:
+        topic = _SYNTHETIC_TOPICS[int(start // 90) % len(_SYNTHETIC_TOPICS)]
+        length = rng.uniform(2.5, 4.5)
+        entries.append({
+            'text': f"In this part we cover {topic}, step {index + 1} of the lecture.",
+            'start': round(start, 2),
+            'duration': round(length, 2)
+        })
+        start += length
+        index += 1
+    return {'response': entries}
+
+
+# Gemini
+
+class _GeneratedText:
+    """Minimal GenerateContentResponse stand-in: replayed responses and chunks expose .text"""
+
+    def __init__(self, text: str):
+        self.text = text
+
+
+def _generation_config(config: Any) -> Any:
+    if config is None or isinstance(config, dict):
+        return config
+    try:
+        return {key: value for key, value in vars(config).items() if value is not None}
+    except TypeError:
+        return str(config)
+
+
+def _gemini_request(model_name: str, prompt: Any, generation_config: Any) -> Dict[str, Any]:
+    return {'model': model_name, 'prompt': prompt, 'generation_config': _generation_config(generation_config)}
+
+
+class RecordingGenerativeModel:
+    """Gemini model wrapper that records response text; streamed responses are recorded
+    chunk by chunk once the stream completes"""
+
+    def __init__(self, model: Any, model_name: str, store: FixtureStore):
+        self._model = model
+        self._model_name = model_name
+        self._store = store
+
+    def generate_content(self, prompt: Any, generation_config: Any = None, stream: bool = False, **kwargs) -> Any:
+        request = _gemini_request(self._model_name, prompt, generation_config)
+        try:
+            response = self._model.generate_content(prompt, generation_config=generation_config, stream=stream, **kwargs)
+        except Exception as e:
+            self._store.save('gemini', request, _recorded_error(e))
+            raise
+
+        if stream:
+            return self._record_stream(request, response)
+        try:
+            self._store.save('gemini', request, {'text': response.text})
+        except (ValueError, AttributeError) as e:
+            # Responses without text (e.g. blocked by safety filters) raise on .text
+            self._store.save('gemini', request, _recorded_error(e))
+        return response
+
+    def _record_stream(self, request: Dict[str, Any], response: Any) -> Iterator[Any]:
+        chunks = []
+        for chunk in response:
+            try:
+                chunks.append(chunk.text)
+            except (ValueError, AttributeError):
+                pass
+            yield chunk
+        self._store.save('gemini', request, {'text': ''.join(chunks), 'chunks': chunks})
+
+
+class ReplayGenerativeModel:
+    """Serves recorded Gemini responses; streaming replays the recorded chunks"""
+
+    def __init__(self, model_name: str, store: FixtureStore, latency: LatencyModel, error_rate: float = 0.0):
+        self._model_name = model_name
+        self._replayer = _Replayer(
+            'gemini', store, latency, synthesize=_synthesize_gemini, error_rate=error_rate,
+            injected_error={'error': {'type': 'ServiceUnavailable', 'message': '503 Injected replay error'}}
+        )
+
+    def generate_content(self, prompt: Any, generation_config: Any = None, stream: bool = False, **kwargs) -> Any:
+        entry = self._replayer.entry(_gemini_request(self._model_name, prompt, generation_config))
+        if 'error' in entry:
+            raise _replayed_error(entry['error'])
+        if not stream:
+            return _GeneratedText(entry['text'])
+        chunks = entry.get('chunks') or _split_chunks(entry['text'])
+        return iter([_GeneratedText(chunk) for chunk in chunks])
+
+
+def _split_chunks(text: str, size: int = 120) -> List[str]:
+    return [text[i:i + size] for i in range(0, len(text), size)] or ['']
+
+
+_PROMPT_TIMESTAMP = re.compile(r'^\[(\d+):(\d{2})(?::(\d{2}))?\]', re.MULTILINE)
+
+
+def _synthesize_gemini(request: Dict[str, Any]) -> Dict[str, Any]:
+    prompt = str(request['prompt'])
+    if '"concepts"' in prompt:
+        seconds = []
+        for match in _PROMPT_TIMESTAMP.finditer(prompt):
+            parts = [int(part) for part in match.groups() if part is not None]
+            seconds.append(parts[0] * 3600 + parts[1] * 60 + parts[2] if len(parts) == 3 else parts[0] * 60 + parts[1])
+        # Up to four concepts spread evenly over the transcript lines in the prompt
+        picks = sorted({seconds[round(i * (len(seconds) - 1) / 3)] for i in range(4)}) if seconds else [0]
+        concepts = [{
+            'name': f"Key idea at {value // 60:02d}:{value % 60:02d}",
+            'timestamp': f"{value // 60:02d}:{value % 60:02d}",
+            'timestamp_seconds': value,
+            'summary': f"A synthetic summary of the idea introduced at {value // 60:02d}:{value % 60:02d}. "
+                       "It stands in for a Gemini response in replay mode.",
+            'quiz': [{
+                'question': f"What is the key idea at {value // 60:02d}:{value % 60:02d} about?",
+                'options': ['The first option', 'The second option', 'The third option', 'The fourth option'],
+                'correct': 0,
+                'explanation': 'Synthetic replay answer.'
+            }]
+        } for value in picks]
+        return {'text': json.dumps({'concepts': concepts})}
+
+    digest = hashlib.sha256(prompt.encode('utf-8')).hexdigest()[:8]
+    return {'text': (
+        f"Summary: synthetic response {digest} generated in replay mode.\n"
+        "- Key point one\n- Key point two\n- Key point three"
+    )}
+
+
+# Factories
+
+_store: Optional[FixtureStore] = None
+_store_lock = threading.Lock()
+
+
+def upstream_mode() -> str:
+    mode = Config.UPSTREAM_MODE
+    if mode not in UPSTREAM_MODES:
+        raise ValueError(f"UPSTREAM_MODE must be one of {UPSTREAM_MODES}, got {mode!r}")
+    return mode
+
+
+def _fixture_store() -> FixtureStore:
+    global _store
+    with _store_lock:
+        if _store is None:
+            _store = FixtureStore(Config.UPSTREAM_FIXTURES_DIR)
+        return _store
+
+
+def _latency(spec: str, upstream: str) -> LatencyModel:
+    # Seed per upstream so each replays the same latency sequence run after run
+    return LatencyModel(spec, seed=Config.REPLAY_SEED + sum(upstream.encode('utf-8')))
+
+
+def create_youtube_client() -> Any:
+    """YouTube Data API client for the configured upstream mode"""
+    mode = upstream_mode()
+    if mode == 'replay':
+        return ReplayYouTubeClient(_fixture_store(), _latency(Config.REPLAY_LATENCY_YOUTUBE, 'youtube'),
+                                   error_rate=Config.REPLAY_ERROR_RATE_YOUTUBE)
+
+    if not Config.YOUTUBE_API_KEY:
+        raise ValueError("YOUTUBE_API_KEY is required but not provided")
+    client = build('youtube', 'v3', developerKey=Config.YOUTUBE_API_KEY)
+    return RecordingYouTubeClient(client, _fixture_store()) if mode == 'record' else client
+
+
+def create_transcript_client() -> Any:
+    """Transcript client exposing get_transcript and list_transcripts"""
+    mode = upstream_mode()
+    if mode == 'replay':
+        return ReplayTranscriptClient(_fixture_store(), _latency(Config.REPLAY_LATENCY_TRANSCRIPT, 'transcript'),
+                                      error_rate=Config.REPLAY_ERROR_RATE_TRANSCRIPT)
+    if mode == 'record':
+        return RecordingTranscriptClient(_fixture_store())
+    return YouTubeTranscriptApi
+
+
+def create_gemini_model(model_name: str) -> Any:
+    """Gemini model exposing generate_content for the configured upstream mode"""
+    mode = upstream_mode()
+    if mode == 'replay':
+        return ReplayGenerativeModel(model_name, _fixture_store(), _latency(Config.REPLAY_LATENCY_GEMINI, 'gemini'),
+                                     error_rate=Config.REPLAY_ERROR_RATE_GEMINI)
+
+    if not Config.GEMINI_API_KEY:
+        raise ValueError("GEMINI_API_KEY is required but not provided")
+    genai.configure(api_key=Config.GEMINI_API_KEY)
+    model = genai.GenerativeModel(model_name)
+    return RecordingGenerativeModel(model, model_name, _fixture_store()) if mode == 'record' else model
@@ -1,7 +1,9 @@
 from .youtube_service import YouTubeService
 from .ai_service import AIService
+from utils.single_flight import get_single_flight
+import copy
 import logging
-from typing import List, Dict, Any, Optional
+from typing import List, Dict, Any, Optional, Tuple, Callable
 import concurrent.futures
 import threading
 from functools import partial
@@ -9,18 +11,74 @@ import re
 
 logger = logging.getLogger(__name__)
 
+# Progress callback: receives an event name and a JSON-serializable payload.
+# May be invoked from worker threads, so implementations must be thread-safe.
+ProgressCallback = Callable[[str, Dict[str, Any]], None]
+
+
+class _ProgressFanout:
+    """Broadcasts one build's progress events to every caller waiting on it.
+
+    Events are recorded so a subscriber that joins mid-build first replays what it missed.
+    """
+    
+    def __init__(self):
+        self._history: List[Tuple[str, Dict[str, Any]]] = []
+        self._subscribers: List[ProgressCallback] = []
+        self._lock = threading.Lock()
+    
+    def subscribe(self, callback: Optional[ProgressCallback]) -> None:
+        if callback is None:
+            return
+        # Replay under the lock so no live event is delivered before the history
+        with self._lock:
+            for event, payload in self._history:
+                _safe_call(callback, event, payload)
+            self._subscribers.append(callback)
+    
+    def unsubscribe(self, callback: Optional[ProgressCallback]) -> None:
+        with self._lock:
+            if callback in self._subscribers:
+                self._subscribers.remove(callback)
+    
+    def emit(self, event: str, payload: Dict[str, Any]) -> None:
+        with self._lock:
+            self._history.append((event, payload))
+            for callback in list(self._subscribers):
+                _safe_call(callback, event, payload)
+
+
+def _safe_call(callback: ProgressCallback, event: str, payload: Dict[str, Any]) -> None:
+    try:
+        callback(event, payload)
+    except Exception as e:
+        logger.warning(f"Progress callback failed for {event}: {e}")
+
+
 class CourseBuilder:
     def __init__(self):
         try:
             self.youtube_service = YouTubeService()
             self.ai_service = AIService()
             self.max_workers = 3  # Limit concurrent operations
+            self.max_ai_workers = 3  # Limit concurrent Gemini calls
+            # Concurrent builds of the same videos share one run and its progress events
+            self.course_flight = get_single_flight('course_build')
         except Exception as e:
             logger.error(f"Failed to initialize CourseBuilder: {e}")
             raise
     
-    def build_course_from_videos(self, video_urls: List[str]) -> Dict[str, Any]:
-        """Main method to build a complete course from YouTube video URLs with parallel processing"""
+    def build_course_from_videos(self, video_urls: List[str], use_cache: bool = True,
+                                 on_progress: Optional[ProgressCallback] = None) -> Dict[str, Any]:
+        """Main method to build a complete course from YouTube video URLs with parallel processing.
+        
+        on_progress, if given, is called as each stage completes: 'videos_resolved',
+        'metadata_fetched', 'transcript_fetched' and 'concepts_extracted' per video, then
+        'structure_built'.
+        
+        Concurrent builds of the same video list share one pipeline run; callers that join
+        late receive the progress events already emitted before the live ones.
+        """
         if not video_urls:
             return {
                 "error": "No video URLs provided",
@@ -28,9 +86,42 @@ class CourseBuilder:
                 "concepts_extracted": 0
             }
         
+        key = self._course_flight_key(video_urls, use_cache)
+        joined: List[_ProgressFanout] = []
+        
+        def join(context: Dict[str, Any]) -> None:
+            # The fanout belongs to the in-flight call, so every caller that joins the
+            # call subscribes to the events of the build it will receive
+            fanout = context.get('fanout')
+            if fanout is None:
+                fanout = context['fanout'] = _ProgressFanout()
+            fanout.subscribe(on_progress)
+            joined.append(fanout)
+        
+        def build() -> Dict[str, Any]:
+            return self._build_course(video_urls, use_cache, joined[0].emit)
+        
         try:
-            # Step 1: Process video URLs in parallel for better performance
-            video_data_list = self._process_videos_parallel(video_urls)
+            course_data = self.course_flight.do(key, build, join=join)
+        finally:
+            if joined:
+                joined[0].unsubscribe(on_progress)
+        # Callers annotate and serialize the result, so none may share nested objects
+        return copy.deepcopy(course_data)
+    
+    def _course_flight_key(self, video_urls: List[str], use_cache: bool) -> Tuple:
+        """Identical video lists coalesce regardless of URL form (watch, youtu.be, embed)"""
+        ids = tuple(self.youtube_service.extract_video_id(url) or url for url in video_urls)
+        return ids, use_cache
+    
+    def _build_course(self, video_urls: List[str], use_cache: bool,
+                      on_progress: Optional[ProgressCallback]) -> Dict[str, Any]:
+        try:
+            # Steps 1-2: Fetch videos and extract concepts as a pipeline; each video's
+            # extraction starts as soon as its transcript arrives
+            video_data_list, all_concepts = self._process_and_extract_pipelined(
+                video_urls, use_cache=use_cache, on_progress=on_progress
+            )
             
             if not video_data_list:
                 return {
@@ -39,9 +130,6 @@ class CourseBuilder:
                     "invalid_urls": len(video_urls)
                 }
             
-            # Step 2: Extract concepts from videos with transcripts
-            all_concepts = self._extract_concepts_from_videos(video_data_list)
-            
             if not all_concepts:
                 return {
                     "error": "No concepts could be extracted from the provided videos",
@@ -52,6 +140,10 @@ class CourseBuilder:
             
             # Step 3: Generate course structure
             course_structure = self.ai_service.generate_course_structure(all_concepts, video_data_list)
+            self._emit_progress(on_progress, 'structure_built', {
+                'course_title': course_structure.get('course_title', ''),
+                'total_concepts': len(all_concepts)
+            })
             
             # Step 4: Compile final course data with enhanced metadata
             course_data = {
@@ -60,6 +152,8 @@ class CourseBuilder:
                 "total_videos": len(video_data_list),
                 "videos_with_transcripts": len([v for v in video_data_list if v.get('has_transcript')]),
                 "concepts_per_video": len(all_concepts) / len(video_data_list) if video_data_list else 0,
+                # Some videos got heuristic concepts (no transcript, or extraction failed)
+                "degraded": any(concept.get('fallback') for concept in all_concepts),
                 "processing_stats": {
                     "total_urls_provided": len(video_urls),
                     "valid_videos_processed": len(video_data_list),
@@ -79,80 +173,201 @@ class CourseBuilder:
                 "concepts_extracted": 0
             }
     
+    def _resolve_video_urls(self, video_urls: List[str]) -> List[Tuple[str, str]]:
+        """Validate URLs and pair each usable one with its video ID, preserving input order"""
+        return [(url, video_id) for _, url, video_id in self._resolve_indexed_video_urls(video_urls)]
+    
+    def _resolve_indexed_video_urls(self, video_urls: List[str]) -> List[Tuple[int, str, str]]:
+        """(input index, url, video ID) for each usable URL, preserving input order"""
+        valid_videos = []
+        for index, url in enumerate(video_urls):
+            if not self.youtube_service.validate_youtube_url(url):
+                logger.warning(f"Invalid YouTube URL: {url}")
+                continue
+            video_id = self.youtube_service.extract_video_id(url)
+            if not video_id:
+                logger.warning(f"Could not extract video ID from URL: {url}")
+                continue
+            valid_videos.append((index, url, video_id))
+        return valid_videos
+    
+    def _process_single_video(self, url: str, video_info: Optional[Dict[str, Any]], error: Optional[str] = None) -> Optional[Dict[str, Any]]:
+        """Fetch the transcript for one video whose metadata was already retrieved"""
+        try:
+            if not video_info:
+                logger.warning(f"Could not process video {url}: {error or 'metadata unavailable'}")
+                return None
+            
+            # Get transcript for the prefetched metadata
+            video_data = self.youtube_service.get_video_data(url, video_info=video_info)
+            if video_data:
+                logger.info(f"Successfully processed video: {video_data.get('title', 'Unknown')}")
+                return video_data
+            else:
+                logger.warning(f"Could not process video: {url}")
+                return None
+                
+        except Exception as e:
+            logger.error(f"Error processing video {url}: {e}")
+            return None
+    
+    def _fetch_video_infos_for(self, valid_videos: List[Tuple[str, str]]) -> Tuple[Dict[str, Optional[Dict[str, Any]]], Dict[str, str]]:
+        """Fetch metadata for all resolved videos in one batch"""
+        metadata_errors: Dict[str, str] = {}
+        video_infos = self.youtube_service.get_video_infos(
+            [video_id for _, video_id in valid_videos],
+            errors=metadata_errors
+        )
+        return video_infos, metadata_errors
+    
     def _process_videos_parallel(self, video_urls: List[str]) -> List[Dict[str, Any]]:
-        """Process multiple video URLs in parallel for better performance"""
-        video_data_list = []
+        """Process multiple video URLs in parallel for better performance, keeping input order"""
+        # Validate URLs up front so metadata for the whole list can be fetched in one batch
+        valid_videos = self._resolve_video_urls(video_urls)
+        if not valid_videos:
+            return []
         
-        def process_single_video(url: str) -> Optional[Dict[str, Any]]:
-            try:
-                # Validate URL
-                if not self.youtube_service.validate_youtube_url(url):
-                    logger.warning(f"Invalid YouTube URL: {url}")
-                    return None
-                
-                # Get video data and transcript
-                video_data = self.youtube_service.get_video_data(url)
-                if video_data:
-                    logger.info(f"Successfully processed video: {video_data.get('title', 'Unknown')}")
-                    return video_data
-                else:
-                    logger.warning(f"Could not process video: {url}")
-                    return None
-                    
-            except Exception as e:
-                logger.error(f"Error processing video {url}: {e}")
-                return None
+        video_infos, metadata_errors = self._fetch_video_infos_for(valid_videos)
         
         # Use ThreadPoolExecutor for parallel processing
         with concurrent.futures.ThreadPoolExecutor(max_workers=self.max_workers) as executor:
-            # Submit all video processing tasks
-            future_to_url = {executor.submit(process_single_video, url): url for url in video_urls}
+            results = executor.map(
+                lambda video: self._process_single_video(
+                    video[0], video_infos.get(video[1]), metadata_errors.get(video[1])
+                ),
+                valid_videos
+            )
+            return [video_data for video_data in results if video_data]
+    
+    def _emit_progress(self, on_progress: Optional[ProgressCallback], event: str, payload: Dict[str, Any]) -> None:
+        """Invoke a progress callback, never letting it break the pipeline"""
+        if on_progress is None:
+            return
+        try:
+            on_progress(event, payload)
+        except Exception as e:
+            logger.warning(f"Progress callback failed for {event}: {e}")
+    
+    def _process_and_extract_pipelined(self, video_urls: List[str], use_cache: bool = True,
+                                       on_progress: Optional[ProgressCallback] = None) -> Tuple[List[Dict[str, Any]], List[Dict[str, Any]]]:
+        """Fetch videos and extract concepts as a streaming pipeline.
+        
+        Each video's concept extraction is scheduled on the bounded AI pool as soon as its
+        transcript arrives, so transcript fetches and LLM calls overlap. Videos and concepts
+        are returned in input URL order regardless of completion order. Per-video events
+        carry the URL's position in video_urls as 'index', which stays distinct when the
+        same video is requested twice.
+        """
+        indexed_videos = self._resolve_indexed_video_urls(video_urls)
+        input_indices = [input_index for input_index, _, _ in indexed_videos]
+        valid_videos = [(url, video_id) for _, url, video_id in indexed_videos]
+        self._emit_progress(on_progress, 'videos_resolved', {
+            'videos': [
+                {'index': input_index, 'url': url, 'video_id': video_id}
+                for input_index, url, video_id in indexed_videos
+            ],
+            'invalid_urls': len(video_urls) - len(valid_videos)
+        })
+        if not valid_videos:
+            return [], []
+        
+        video_infos, metadata_errors = self._fetch_video_infos_for(valid_videos)
+        for input_index, url, video_id in indexed_videos:
+            video_info = video_infos.get(video_id)
+            self._emit_progress(on_progress, 'metadata_fetched', {
+                'index': input_index,
+                'video_id': video_id,
+                'url': url,
+                'ok': bool(video_info),
+                'title': video_info.get('title', '') if video_info else '',
+                'error': None if video_info else metadata_errors.get(video_id, 'metadata unavailable')
+            })
+        
+        def extract_and_report(input_index: int, video_data: Dict[str, Any]) -> List[Dict[str, Any]]:
+            concepts = self._extract_concepts_for_video(video_data, use_cache)
+            self._emit_progress(on_progress, 'concepts_extracted', {
+                'index': input_index,
+                'video_id': video_data['id'],
+                'concepts': concepts
+            })
+            return concepts
+        
+        video_data_by_index: Dict[int, Dict[str, Any]] = {}
+        extract_futures: Dict[int, concurrent.futures.Future] = {}
+        
+        with concurrent.futures.ThreadPoolExecutor(max_workers=self.max_workers) as fetch_executor, \
+                concurrent.futures.ThreadPoolExecutor(max_workers=self.max_ai_workers) as ai_executor:
+            future_to_index = {
+                fetch_executor.submit(
+                    self._process_single_video, url, video_infos.get(video_id), metadata_errors.get(video_id)
+                ): index
+                for index, (url, video_id) in enumerate(valid_videos)
+            }
+            
+            # Hand each video to the AI pool the moment its data is ready
+            for future in concurrent.futures.as_completed(future_to_index):
+                index = future_to_index[future]
+                video_data = future.result()
+                url, video_id = valid_videos[index]
+                self._emit_progress(on_progress, 'transcript_fetched', {
+                    'index': input_indices[index],
+                    'video_id': video_id,
+                    'url': url,
+                    'ok': bool(video_data),
+                    'has_transcript': bool(video_data and video_data.get('has_transcript'))
+                })
+                if not video_data:
+                    continue
+                video_data_by_index[index] = video_data
+                extract_futures[index] = ai_executor.submit(extract_and_report, input_indices[index], video_data)
             
-            # Collect results as they complete
-            for future in concurrent.futures.as_completed(future_to_url):
-                result = future.result()
-                if result:
-                    video_data_list.append(result)
+            all_concepts = []
+            for index in sorted(extract_futures):
+                all_concepts.extend(extract_futures[index].result())
         
-        return video_data_list
+        video_data_list = [video_data_by_index[index] for index in sorted(video_data_by_index)]
+        return video_data_list, all_concepts
     
-    def _extract_concepts_from_videos(self, video_data_list: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    def _extract_concepts_from_videos(self, video_data_list: List[Dict[str, Any]], use_cache: bool = True) -> List[Dict[str, Any]]:
         """Extract concepts from videos.
         Always attempt extraction; the AI service will gracefully fall back when transcripts are missing.
         """
         all_concepts = []
         
         for video_data in video_data_list:
-            try:
-                # Attempt extraction regardless of transcript availability; AI service handles fallback
-                concepts = self.ai_service.extract_concepts_and_timestamps(video_data)
-
-                # Add video reference to each concept
-                for concept in concepts:
-                    concept.update({
-                        'video_id': video_data['id'],
-                        'video_title': video_data['title'],
-                        'video_url': video_data['url'],
-                        'video_thumbnail': video_data.get('thumbnail', ''),
-                        'video_channel': video_data.get('channel', ''),
-                        'video_duration': video_data.get('duration', '')
-                    })
-
-                # Compute end timestamps per video to enable range playback
-                if concepts:
-                    self._compute_end_timestamps_for_video(concepts, video_data.get('duration', ''))
-
-                if concepts:
-                    all_concepts.extend(concepts)
-                    logger.info(f"Extracted {len(concepts)} concepts from {video_data.get('title', 'Unknown')}")
-                else:
-                    logger.warning(f"No concepts extracted for {video_data.get('title', 'Unknown')}")
-                    
-            except Exception as e:
-                logger.error(f"Error extracting concepts from video {video_data.get('title', 'Unknown')}: {e}")
-                continue
+            all_concepts.extend(self._extract_concepts_for_video(video_data, use_cache))
         
         return all_concepts
+    
+    def _extract_concepts_for_video(self, video_data: Dict[str, Any], use_cache: bool = True) -> List[Dict[str, Any]]:
+        """Extract and annotate concepts for a single video; never raises"""
+        try:
+            # Attempt extraction regardless of transcript availability; AI service handles fallback
+            concepts = self.ai_service.extract_concepts_and_timestamps(video_data, use_cache=use_cache)
+
+            # Add video reference to each concept
+            for concept in concepts:
+                concept.update({
+                    'video_id': video_data['id'],
+                    'video_title': video_data['title'],
+                    'video_url': video_data['url'],
+                    'video_thumbnail': video_data.get('thumbnail', ''),
+                    'video_channel': video_data.get('channel', ''),
+                    'video_duration': video_data.get('duration', '')
+                })
+
+            # Compute end timestamps per video to enable range playback
+            if concepts:
+                self._compute_end_timestamps_for_video(concepts, video_data.get('duration', ''))
+                logger.info(f"Extracted {len(concepts)} concepts from {video_data.get('title', 'Unknown')}")
+            else:
+                logger.warning(f"No concepts extracted for {video_data.get('title', 'Unknown')}")
+            
+            return concepts
+                
+        except Exception as e:
+            logger.error(f"Error extracting concepts from video {video_data.get('title', 'Unknown')}: {e}")
+            return []
 
     def _compute_end_timestamps_for_video(self, concepts: List[Dict[str, Any]], iso_duration: str) -> None:
         """Fill timestamp_end_seconds and timestamp_end for concepts within the same video."""
@@ -190,8 +405,43 @@ class CourseBuilder:
             concept['timestamp_end_seconds'] = max(end, start)
             concept['timestamp_end'] = format_mmss(concept['timestamp_end_seconds'])
     
-    def get_video_info_only(self, video_urls: List[str]) -> Dict[str, Any]:
-        """Get just video metadata without AI processing (for quick preview)"""
+    def _fetch_video_metadata(self, video_urls: List[str], check_transcripts: bool = True) -> List[Dict[str, Any]]:
+        """Metadata-only pipeline: one batched metadata request, no transcript downloads"""
+        valid_videos = self._resolve_video_urls(video_urls)
+        if not valid_videos:
+            return []
+        
+        metadata_errors: Dict[str, str] = {}
+        video_infos = self.youtube_service.get_video_infos(
+            [video_id for _, video_id in valid_videos],
+            errors=metadata_errors
+        )
+        
+        video_data_list = []
+        for url, video_id in valid_videos:
+            video_info = video_infos.get(video_id)
+            if not video_info:
+                logger.warning(f"Could not preview video {url}: {metadata_errors.get(video_id, 'metadata unavailable')}")
+                continue
+            video_data_list.append({**video_info, 'url': url, 'has_transcript': False})
+        
+        if check_transcripts and video_data_list:
+            with concurrent.futures.ThreadPoolExecutor(max_workers=self.max_workers) as executor:
+                flags = executor.map(
+                    lambda video: self.youtube_service.has_transcript(video['id']),
+                    video_data_list
+                )
+                for video_data, has_transcript in zip(video_data_list, flags):
+                    video_data['has_transcript'] = has_transcript
+        
+        return video_data_list
+    
+    def get_video_info_only(self, video_urls: List[str], check_transcripts: bool = True) -> Dict[str, Any]:
+        """Get just video metadata without AI processing (for quick preview).
+        
+        Never downloads transcripts; with check_transcripts the has_transcript flag is
+        filled by listing the available caption tracks.
+        """
         if not video_urls:
             return {
                 "error": "No video URLs provided",
@@ -201,12 +451,7 @@ class CourseBuilder:
             }
         
         try:
-            # Process videos in parallel for faster preview
-            video_data_list = self._process_videos_parallel(video_urls)
-            
-            # Remove transcript data to save bandwidth
-            for video_data in video_data_list:
-                video_data.pop('transcript', None)
+            video_data_list = self._fetch_video_metadata(video_urls, check_transcripts)
             
             return {
                 "videos": video_data_list,
@@ -0,0 +1,200 @@
+import concurrent.futures
+import logging
+import sqlite3
+import threading
+import time
+import uuid
+from typing import Any, Dict, List, Optional
+
+from utils.cache import SQLiteCache
+
+logger = logging.getLogger(__name__)
+
+
+class CourseJobManager:
+    """Runs course generation in a managed background executor and tracks per-video progress.
+
+    Finished jobs are kept for result_ttl seconds after completion and then purged.
+    Jobs run in the process that accepted them; with a SQLite path, every state change
+    is also published to a store shared by all worker processes on the node, so a job
+    can be polled through any of them. The published copy expires result_ttl seconds
+    after its last update, which also retires jobs orphaned by a worker restart.
+    """
+
+    def __init__(self, course_builder, max_workers: int = 2, result_ttl: int = 3600, max_jobs: int = 1000,
+                 path: Optional[str] = None):
+        self.course_builder = course_builder
+        self.result_ttl = result_ttl
+        self.max_jobs = max_jobs
+        self.executor = concurrent.futures.ThreadPoolExecutor(
+            max_workers=max_workers,
+            thread_name_prefix='course-job'
+        )
+        self._jobs: Dict[str, Dict[str, Any]] = {}
+        self._lock = threading.Lock()
+
+        self.store: Optional[SQLiteCache] = None
+        if path:
+            try:
+                self.store = SQLiteCache(path, namespace='course_jobs', ttl=result_ttl, compress=True)
+            except (sqlite3.Error, OSError) as e:
+                logger.warning(f"Shared job store unavailable, jobs are only visible to this process: {e}")
+
+    def submit(self, video_urls: List[str], use_cache: bool = True) -> Optional[str]:
+        """Queue a course build and return its job ID, or None if the job table is full"""
+        self._purge_expired()
+
+        now = time.time()
+        job_id = uuid.uuid4().hex
+        job = {
+            'job_id': job_id,
+            'status': 'queued',
+            'created_at': now,
+            'updated_at': now,
+            'finished_at': None,
+            'total_urls': len(video_urls),
+            'videos': {},
+            'result': None,
+            'error': None
+        }
+
+        with self._lock:
+            if len(self._jobs) >= self.max_jobs:
+                return None
+            self._jobs[job_id] = job
+            self._publish(job)
+
+        self.executor.submit(self._run, job_id, video_urls, use_cache)
+        logger.info(f"Queued course job {job_id} for {len(video_urls)} video URLs")
+        return job_id
+
+    def get(self, job_id: str) -> Optional[Dict[str, Any]]:
+        """Return a JSON-ready snapshot of a job, or None if unknown or expired"""
+        self._purge_expired()
+
+        with self._lock:
+            job = self._jobs.get(job_id)
+            if job is not None:
+                return self._snapshot(job)
+
+        # Accepted by another worker process
+        if self.store is not None:
+            return self.store.get(job_id)
+        return None
+
+    def _snapshot(self, job: Dict[str, Any]) -> Dict[str, Any]:
+        videos = [dict(video) for video in job['videos'].values()]
+        snapshot = {
+            'job_id': job['job_id'],
+            'status': job['status'],
+            'created_at': int(job['created_at']),
+            'updated_at': int(job['updated_at']),
+            'finished_at': int(job['finished_at']) if job['finished_at'] else None,
+            'progress': {
+                'total_urls': job['total_urls'],
+                'total_videos': len(videos),
+                'completed_videos': len([v for v in videos if v['stage'] in ('done', 'failed')]),
+                'videos': videos
+            }
+        }
+        if job['status'] in ('completed', 'failed'):
+            snapshot['result'] = job['result']
+            snapshot['error'] = job['error']
+        return snapshot
+
+    def _publish(self, job: Dict[str, Any]) -> None:
+        """Write the job's snapshot to the shared store; called with the lock held so
+        writes for one job land in order"""
+        if self.store is not None:
+            self.store.set(job['job_id'], self._snapshot(job))
+
+    def _run(self, job_id: str, video_urls: List[str], use_cache: bool) -> None:
+        self._update(job_id, status='running')
+        try:
+            result = self.course_builder.build_course_from_videos(
+                video_urls,
+                use_cache=use_cache,
+                on_progress=lambda event, payload: self._on_progress(job_id, event, payload)
+            )
+        except Exception as e:
+            logger.error(f"Course job {job_id} failed: {e}")
+            self._update(job_id, status='failed', error=f"Failed to build course: {str(e)}", finished=True)
+            return
+
+        if isinstance(result, dict) and 'error' in result:
+            self._update(job_id, status='failed', result=result, error=result['error'], finished=True)
+        else:
+            result['generated_at'] = int(time.time())
+            result['api_version'] = '1.0.0'
+            self._update(job_id, status='completed', result=result, finished=True)
+        logger.info(f"Course job {job_id} finished")
+
+    def _on_progress(self, job_id: str, event: str, payload: Dict[str, Any]) -> None:
+        """Translate CourseBuilder stage events into per-video progress, keyed by the
+        URL's index in the request so a video requested twice counts twice"""
+        with self._lock:
+            job = self._jobs.get(job_id)
+            if job is None:
+                return
+            job['updated_at'] = time.time()
+            videos = job['videos']
+
+            if event == 'videos_resolved':
+                for video in payload.get('videos', []):
+                    videos[video['index']] = {
+                        'index': video['index'],
+                        'video_id': video['video_id'],
+                        'url': video['url'],
+                        'title': '',
+                        'stage': 'queued'
+                    }
+                self._publish(job)
+                return
+
+            video = videos.get(payload.get('index'))
+            if video is None:
+                return
+
+            if event == 'metadata_fetched':
+                video['title'] = payload.get('title', '')
+                video['stage'] = 'metadata_fetched' if payload.get('ok') else 'failed'
+                if not payload.get('ok'):
+                    video['error'] = payload.get('error')
+            elif event == 'transcript_fetched' and video['stage'] != 'failed':
+                video['stage'] = 'extracting_concepts' if payload.get('ok') else 'failed'
+                video['has_transcript'] = payload.get('has_transcript', False)
+            elif event == 'concepts_extracted':
+                video['stage'] = 'done'
+                video['concepts_extracted'] = len(payload.get('concepts', []))
+            else:
+                return
+            self._publish(job)
+
+    def _update(self, job_id: str, status: str, result: Any = None, error: Optional[str] = None,
+                finished: bool = False) -> None:
+        with self._lock:
+            job = self._jobs.get(job_id)
+            if job is None:
+                return
+            now = time.time()
+            job['status'] = status
+            job['updated_at'] = now
+            if result is not None:
+                job['result'] = result
+            if error is not None:
+                job['error'] = error
+            if finished:
+                job['finished_at'] = now
+            self._publish(job)
+
+    def _purge_expired(self) -> None:
+        cutoff = time.time() - self.result_ttl
+        with self._lock:
+            expired = [
+                job_id for job_id, job in self._jobs.items()
+                if job['finished_at'] is not None and job['finished_at'] < cutoff
+            ]
+            for job_id in expired:
+                del self._jobs[job_id]
+        if expired:
+            logger.info(f"Purged {len(expired)} expired course jobs")
@@ -1,6 +1,4 @@
-from googleapiclient.discovery import build
 from googleapiclient.errors import HttpError
-from youtube_transcript_api import YouTubeTranscriptApi
 from youtube_transcript_api._errors import (
     TranscriptsDisabled, 
     NoTranscriptFound, 
@@ -11,23 +9,73 @@ import re
 import logging
 from typing import Optional, Dict, Any, List
 from config import Config
-import time
+from utils.cache import LRUCache, build_tiered_cache
+from utils.quota import QuotaLedger
+from utils.single_flight import get_single_flight
+from utils.rate_limit import UPSTREAM_RETRIES, upstream_limiter, is_rate_limit_error, retry_after_from_error
+from utils.metrics import histogram
+from .clients import create_youtube_client, create_transcript_client
 
 logger = logging.getLogger(__name__)
 
+YOUTUBE_REQUEST_SECONDS = histogram(
+    'studyweave_youtube_request_duration_seconds',
+    'YouTube Data API call latency',
+    ['operation', 'outcome']
+)
+TRANSCRIPT_REQUEST_SECONDS = histogram(
+    'studyweave_transcript_request_duration_seconds',
+    'Transcript API call latency; tracks that do not exist count as errors',
+    ['operation', 'outcome']
+)
+
 class YouTubeService:
     def __init__(self):
-        if not Config.YOUTUBE_API_KEY:
-            raise ValueError("YOUTUBE_API_KEY is required but not provided")
-        
         try:
-            self.youtube = build('youtube', 'v3', developerKey=Config.YOUTUBE_API_KEY)
+            # Live, recording or replaying clients depending on Config.UPSTREAM_MODE
+            self.youtube = create_youtube_client()
+            self.transcripts = create_transcript_client()
         except Exception as e:
             logger.error(f"Failed to initialize YouTube API client: {e}")
             raise
         
-        self.rate_limit_delay = 0.5  # seconds between API calls
         self.max_retries = 3
+        # Process-wide limiters shared with every other thread calling these upstreams
+        self.data_limiter = upstream_limiter('youtube_data')
+        self.transcript_limiter = upstream_limiter('transcript')
+        # Data API quota units spent by every worker on this node over the last 24h
+        self.quota = QuotaLedger(
+            daily_limit=Config.YOUTUBE_QUOTA_DAILY_LIMIT,
+            cutoffs={'search.list': Config.YOUTUBE_SEARCH_QUOTA_CUTOFF},
+            path=Config.CACHE_DB_PATH
+        )
+        self.max_ids_per_request = 50  # videos().list accepts up to 50 comma-separated IDs
+        # Concurrent get_video_data calls for one video share a single fetch
+        self.video_data_flight = get_single_flight('video_data')
+        
+        # Video metadata cache: bounded in-process LRU backed by a shared SQLite store
+        self.video_info_cache = build_tiered_cache(
+            namespace='video_info',
+            maxsize=Config.VIDEO_INFO_CACHE_SIZE,
+            ttl=Config.VIDEO_INFO_CACHE_TTL,
+            path=Config.CACHE_DB_PATH
+        )
+        
+        # Transcript store: zlib-compressed JSON blobs keyed by video ID and the language
+        # preferences that select which track is fetched (see _transcript_key)
+        self.transcript_languages = ['en', 'en-US', 'en-GB', 'en-CA', 'en-AU']
+        self.transcript_cache = build_tiered_cache(
+            namespace='transcripts',
+            maxsize=Config.TRANSCRIPT_CACHE_SIZE,
+            ttl=Config.TRANSCRIPT_CACHE_TTL,
+            path=Config.CACHE_DB_PATH,
+            compress=True
+        )
+        # Cheap has-transcript flags for previews, filled by listing tracks without downloading them
+        self.transcript_availability_cache = LRUCache(
+            maxsize=Config.VIDEO_INFO_CACHE_SIZE,
+            ttl=Config.VIDEO_INFO_CACHE_TTL
+        )
     
     def extract_video_id(self, url: str) -> Optional[str]:
         """Extract video ID from various YouTube URL formats with improved validation"""
@@ -64,88 +112,174 @@ class YouTubeService:
             logger.error("No video ID provided to get_video_info")
             return None
         
+        return self.get_video_infos([video_id]).get(video_id)
+    
+    def get_video_infos(self, video_ids: List[str], errors: Optional[Dict[str, str]] = None) -> Dict[str, Optional[Dict[str, Any]]]:
+        """Get metadata for many videos, batching cache misses into videos().list calls.
+        
+        Every requested ID is present in the result; IDs that could not be fetched map
+        to None and, if an errors dict is given, the reason is recorded under that ID.
+        """
+        if errors is None:
+            errors = {}
+        
+        results: Dict[str, Optional[Dict[str, Any]]] = {}
+        missing = []
+        for video_id in dict.fromkeys(v for v in video_ids if v):
+            cached = self.video_info_cache.get(video_id)
+            if cached is not None:
+                logger.debug(f"Video info cache hit for {video_id}")
+                results[video_id] = dict(cached)
+            else:
+                missing.append(video_id)
+        
+        for i in range(0, len(missing), self.max_ids_per_request):
+            batch = missing[i:i + self.max_ids_per_request]
+            results.update(self._fetch_video_info_batch(batch, errors))
+        
+        return results
+    
+    def _fetch_video_info_batch(self, video_ids: List[str], errors: Dict[str, str]) -> Dict[str, Optional[Dict[str, Any]]]:
+        """Fetch metadata for up to 50 videos in a single videos().list call"""
+        results: Dict[str, Optional[Dict[str, Any]]] = {video_id: None for video_id in video_ids}
+        
+        rate_limited = False
         for attempt in range(self.max_retries):
             try:
-                # Rate limiting
+                # Rate limiting: back off before retries (a throttled upstream is already
+                # paused by the limiter), then wait for a token
                 if attempt > 0:
-                    time.sleep(self.rate_limit_delay * attempt)
+                    UPSTREAM_RETRIES.inc(upstream='youtube_data')
+                    if not rate_limited:
+                        self.data_limiter.backoff(attempt - 1)
+                rate_limited = False
+                if not self.quota.try_charge('videos.list'):
+                    errors.update({video_id: 'Daily API quota budget exhausted' for video_id in video_ids})
+                    return results
+                self.data_limiter.acquire()
                 
-                response = self.youtube.videos().list(
-                    part='snippet,contentDetails,statistics',
-                    id=video_id
-                ).execute()
+                with YOUTUBE_REQUEST_SECONDS.time(operation='videos.list'):
+                    response = self.youtube.videos().list(
+                        part='snippet,contentDetails,statistics',
+                        id=','.join(video_ids),
+                        maxResults=len(video_ids)
+                    ).execute()
                 
-                if response.get('items'):
-                    video = response['items'][0]
-                    snippet = video.get('snippet', {})
-                    content_details = video.get('contentDetails', {})
-                    statistics = video.get('statistics', {})
+                items = {item.get('id'): item for item in response.get('items', [])}
+                for video_id in video_ids:
+                    video = items.get(video_id)
+                    if video is None:
+                        logger.warning(f"No video found with ID: {video_id}")
+                        errors[video_id] = 'Video not found'
+                        continue
                     
-                    return {
-                        'id': video_id,
-                        'title': snippet.get('title', 'Unknown Title'),
-                        'description': snippet.get('description', ''),
-                        'duration': content_details.get('duration', ''),
-                        'thumbnail': snippet.get('thumbnails', {}).get('high', {}).get('url', ''),
-                        'channel': snippet.get('channelTitle', 'Unknown Channel'),
-                        'published_at': snippet.get('publishedAt', ''),
-                        'view_count': statistics.get('viewCount', '0'),
-                        'like_count': statistics.get('likeCount', '0'),
-                        'comment_count': statistics.get('commentCount', '0')
-                    }
-                else:
-                    logger.warning(f"No video found with ID: {video_id}")
-                    return None
+                    video_info = self._parse_video_item(video_id, video)
+                    self.video_info_cache.set(video_id, video_info)
+                    results[video_id] = dict(video_info)
+                return results
                     
             except HttpError as e:
-                if e.resp.status == 403:
+                if is_rate_limit_error(e):
+                    rate_limited = True
+                    self.data_limiter.penalize(retry_after_from_error(e), attempt)
+                    if attempt == self.max_retries - 1:
+                        errors.update({video_id: 'Rate limited by YouTube Data API' for video_id in video_ids})
+                        return results
+                elif e.resp.status == 403:
                     logger.error(f"API quota exceeded or forbidden access: {e}")
-                    return None
+                    if 'quota' in str(e).lower():
+                        self.quota.mark_exhausted()
+                    errors.update({video_id: 'API quota exceeded or forbidden access' for video_id in video_ids})
+                    return results
                 elif e.resp.status == 404:
-                    logger.warning(f"Video not found: {video_id}")
-                    return None
+                    logger.warning(f"Videos not found: {video_ids}")
+                    errors.update({video_id: 'Video not found' for video_id in video_ids})
+                    return results
                 else:
-                    logger.error(f"HTTP error fetching video info for {video_id}: {e}")
+                    logger.error(f"HTTP error fetching video info for {video_ids}: {e}")
                     if attempt == self.max_retries - 1:
-                        return None
+                        errors.update({video_id: f'HTTP error {e.resp.status}' for video_id in video_ids})
+                        return results
             except Exception as e:
-                logger.error(f"Unexpected error fetching video info for {video_id}: {e}")
+                logger.error(f"Unexpected error fetching video info for {video_ids}: {e}")
                 if attempt == self.max_retries - 1:
-                    return None
+                    errors.update({video_id: 'Unexpected error fetching metadata' for video_id in video_ids})
+                    return results
         
-        return None
+        return results
+    
+    def _parse_video_item(self, video_id: str, video: Dict[str, Any]) -> Dict[str, Any]:
+        """Map a videos().list item to our video info shape"""
+        snippet = video.get('snippet', {})
+        content_details = video.get('contentDetails', {})
+        statistics = video.get('statistics', {})
+        
+        return {
+            'id': video_id,
+            'title': snippet.get('title', 'Unknown Title'),
+            'description': snippet.get('description', ''),
+            'duration': content_details.get('duration', ''),
+            'thumbnail': snippet.get('thumbnails', {}).get('high', {}).get('url', ''),
+            'channel': snippet.get('channelTitle', 'Unknown Channel'),
+            'published_at': snippet.get('publishedAt', ''),
+            'view_count': statistics.get('viewCount', '0'),
+            'like_count': statistics.get('likeCount', '0'),
+            'comment_count': statistics.get('commentCount', '0')
+        }
     
     def get_transcript(self, video_id: str) -> Optional[List[Dict[str, Any]]]:
-        """Get video transcript with timestamps and improved error handling"""
+        """Get video transcript, serving from the persistent transcript store when possible"""
         if not video_id:
             logger.error("No video ID provided to get_transcript")
             return None
         
+        cache_key = self._transcript_key(video_id)
+        cached = self.transcript_cache.get(cache_key)
+        if cached is not None:
+            logger.debug(f"Transcript cache hit for {video_id}")
+            return list(cached)
+        
+        transcript = self._fetch_transcript(video_id)
+        if transcript:
+            self.transcript_cache.set(cache_key, transcript)
+        return transcript
+    
+    def _transcript_key(self, video_id: str) -> str:
+        """Cache key for a video's transcript under the current language preferences"""
+        return f"{video_id}:{','.join(self.transcript_languages)}"
+    
+    def _fetch_transcript(self, video_id: str) -> Optional[List[Dict[str, Any]]]:
+        """Fetch video transcript with timestamps and improved error handling"""
         try:
-            # Try multiple language preferences
-            language_preferences = ['en', 'en-US', 'en-GB', 'en-CA', 'en-AU']
-            
             # First try manually created transcripts
             try:
-                transcript_list = YouTubeTranscriptApi.get_transcript(
-                    video_id, 
-                    languages=language_preferences
-                )
+                self.transcript_limiter.acquire()
+                with TRANSCRIPT_REQUEST_SECONDS.time(operation='get_transcript'):
+                    transcript_list = self.transcripts.get_transcript(
+                        video_id, 
+                        languages=self.transcript_languages
+                    )
             except (NoTranscriptFound, TranscriptsDisabled):
                 # Fall back to auto-generated transcripts
                 try:
-                    transcript_list = YouTubeTranscriptApi.get_transcript(
-                        video_id,
-                        languages=['en-auto', 'auto']
-                    )
+                    self.transcript_limiter.acquire()
+                    with TRANSCRIPT_REQUEST_SECONDS.time(operation='get_transcript'):
+                        transcript_list = self.transcripts.get_transcript(
+                            video_id,
+                            languages=['en-auto', 'auto']
+                        )
                 except (NoTranscriptFound, TranscriptsDisabled):
                     # Try any available transcript
-                    available_transcripts = YouTubeTranscriptApi.list_transcripts(video_id)
+                    self.transcript_limiter.acquire()
+                    with TRANSCRIPT_REQUEST_SECONDS.time(operation='list_transcripts'):
+                        available_transcripts = self.transcripts.list_transcripts(video_id)
                     transcript_list = None
                     
                     for transcript in available_transcripts:
                         try:
-                            transcript_list = transcript.fetch()
+                            self.transcript_limiter.acquire()
+                            with TRANSCRIPT_REQUEST_SECONDS.time(operation='fetch'):
+                                transcript_list = transcript.fetch()
                             break
                         except Exception:
                             continue
@@ -186,32 +320,108 @@ class YouTubeService:
         except VideoUnavailable:
             logger.warning(f"Video {video_id} is unavailable")
             return None
-        except TooManyRequests:
+        except TooManyRequests as e:
             logger.error(f"Rate limit exceeded for transcript API")
+            # Pause every transcript fetch in this process, not just this one
+            self.transcript_limiter.penalize(retry_after_from_error(e), attempt=self.max_retries)
             return None
         except Exception as e:
             logger.error(f"Unexpected error getting transcript for {video_id}: {e}")
             return None
     
-    def get_video_data(self, url):
-        """Get complete video data including transcript"""
+    def has_transcript(self, video_id: str) -> bool:
+        """Check whether any transcript track exists without downloading it"""
+        if not video_id:
+            return False
+        
+        if self.transcript_cache.get(self._transcript_key(video_id)) is not None:
+            return True
+        
+        cached = self.transcript_availability_cache.get(video_id)
+        if cached is not None:
+            return cached
+        
+        try:
+            self.transcript_limiter.acquire()
+            with TRANSCRIPT_REQUEST_SECONDS.time(operation='list_transcripts'):
+                available = any(True for _ in self.transcripts.list_transcripts(video_id))
+        except (TranscriptsDisabled, NoTranscriptFound, VideoUnavailable):
+            available = False
+        except TooManyRequests as e:
+            logger.error(f"Rate limit exceeded for transcript API")
+            self.transcript_limiter.penalize(retry_after_from_error(e), attempt=self.max_retries)
+            return False
+        except Exception as e:
+            logger.warning(f"Could not list transcripts for {video_id}: {e}")
+            return False
+        
+        self.transcript_availability_cache.set(video_id, available)
+        return available
+    
+    def get_video_data(self, url, video_info: Optional[Dict[str, Any]] = None):
+        """Get complete video data including transcript.
+        
+        Pass video_info when metadata was already fetched, e.g. via get_video_infos.
+        """
         video_id = self.extract_video_id(url)
         if not video_id:
             return None
         
-        # Get video metadata
-        video_info = self.get_video_info(video_id)
-        if not video_info:
+        def fetch() -> Optional[Dict[str, Any]]:
+            # Get video metadata
+            info = video_info if video_info is not None else self.get_video_info(video_id)
+            if not info:
+                return None
+            
+            # Get transcript
+            transcript = self.get_transcript(video_id)
+            
+            return {
+                **info,
+                'transcript': transcript,
+                'has_transcript': transcript is not None
+            }
+        
+        # Concurrent requests for the same video share one metadata and transcript fetch
+        video_data = self.video_data_flight.do(self._transcript_key(video_id), fetch)
+        if video_data is None:
             return None
+        return {**video_data, 'url': url}
+    
+    def search_videos(self, query: str, max_results: int = 5) -> List[Dict[str, Any]]:
+        """Search for videos; returns no results once the search quota budget is used up"""
+        if not self.quota.try_charge('search.list'):
+            return []
         
-        # Get transcript
-        transcript = self.get_transcript(video_id)
+        self.data_limiter.acquire()
+        try:
+            with YOUTUBE_REQUEST_SECONDS.time(operation='search.list'):
+                res = self.youtube.search().list(part='snippet', q=query, type='video', maxResults=max_results).execute()
+        except HttpError as e:
+            if is_rate_limit_error(e):
+                self.data_limiter.penalize(retry_after_from_error(e))
+            elif e.resp.status == 403 and 'quota' in str(e).lower():
+                self.quota.mark_exhausted()
+            raise
         
+        suggestions = []
+        for item in res.get('items', []):
+            vid = item['id']['videoId']
+            snippet = item['snippet']
+            suggestions.append({
+                'id': vid,
+                'title': snippet.get('title',''),
+                'channel': snippet.get('channelTitle',''),
+                'thumbnail': snippet.get('thumbnails',{}).get('high',{}).get('url',''),
+                'url': f'https://www.youtube.com/watch?v={vid}'
+            })
+        return suggestions
+    
+    def cache_stats(self) -> Dict[str, Any]:
+        """Hit/miss counters for the YouTube caches"""
         return {
-            **video_info,
-            'url': url,
-            'transcript': transcript,
-            'has_transcript': transcript is not None
+            'video_info': self.video_info_cache.stats(),
+            'transcripts': self.transcript_cache.stats()
         }
     
     def validate_youtube_url(self, url):
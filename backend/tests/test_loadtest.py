@@ -0,0 +1,15 @@
+from benchmarks.loadtest import _summary_row, classify_response
+
+
+def test_fallback_responses_are_reported_as_degraded():
+    assert classify_response(200, {'answer': 'unavailable', 'degraded': True}) == 'degraded'
+    assert classify_response(200, {'notes': '...', 'degraded': True}) == 'degraded'
+    assert classify_response(200, {'videos': [], 'degraded': False}) == 'ok'
+    assert classify_response(200, {'error': 'boom'}) == 'error'
+    assert classify_response(500, None) == 'error'
+
+
+def test_summary_counts_degraded_apart_from_errors():
+    row = _summary_row('ask-question', [(0.1, 'ok'), (0.2, 'degraded'), (0.3, 'error'), (0.4, 'degraded')], 1.0)
+    assert row['error_rate'] == 0.25
+    assert row['degraded_rate'] == 0.5
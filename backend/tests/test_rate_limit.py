@@ -0,0 +1,44 @@
+import pytest
+
+from utils.rate_limit import RateLimiter, is_rate_limit_error
+
+
+class _Response(dict):
+    def __init__(self, status):
+        super().__init__()
+        self.status = status
+
+
+class _HttpError(Exception):
+    def __init__(self, status, content=b''):
+        super().__init__(f"<HttpError {status} {content!r}>")
+        self.resp = _Response(status)
+        self.content = content
+
+
+class ResourceExhausted(Exception):
+    pass
+
+
+def test_http_errors_are_judged_by_status():
+    assert is_rate_limit_error(_HttpError(429))
+    assert is_rate_limit_error(_HttpError(403, b'{"reason": "rateLimitExceeded"}'))
+    assert not is_rate_limit_error(_HttpError(403, b'{"reason": "quotaExceeded"}'))
+    # A 429 elsewhere in the message is not a throttling response
+    assert not is_rate_limit_error(_HttpError(500, b'request id 4291 failed'))
+
+
+def test_only_gemini_exhaustion_text_is_matched():
+    assert is_rate_limit_error(ResourceExhausted('quota'))
+    assert is_rate_limit_error(Exception('429 RESOURCE_EXHAUSTED: retry later'))
+    assert not is_rate_limit_error(ValueError('transcript has 429 segments'))
+    assert not is_rate_limit_error(Exception('rate limit field missing from response'))
+
+
+@pytest.mark.parametrize('attempt', [0, 3, 10])
+def test_backoff_uses_full_jitter(attempt):
+    limiter = RateLimiter('test', rate=1.0, backoff_base=0.5, backoff_max=4.0)
+    ceiling = min(4.0, 0.5 * 2 ** attempt)
+    delays = [limiter._backoff_delay(attempt) for _ in range(500)]
+    assert all(0.0 <= delay <= ceiling for delay in delays)
+    assert min(delays) < ceiling / 4
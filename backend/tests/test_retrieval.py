@@ -0,0 +1,44 @@
+from utils.retrieval import BM25Index, normalize_concept_name, normalize_question
+
+
+def test_phrasing_and_plurals_share_a_key():
+    assert normalize_question("What is a closure?") == normalize_question("what's a closure")
+    assert normalize_question("What are closures?") == normalize_question("What is a closure?")
+    assert normalize_question("Please explain recursion") == normalize_question("recursion")
+
+
+def test_neutral_phrasings_share_a_key():
+    key = normalize_question("what is gradient descent")
+    assert key == "descent gradient"
+    assert normalize_question("explain gradient descent") == key
+    assert normalize_question("Define gradient descent.") == key
+    assert normalize_question("Tell me about gradient descent") == key
+
+
+def test_negation_changes_the_key():
+    assert normalize_question("Is a tuple mutable?") != normalize_question("Is a tuple not mutable?")
+    assert normalize_question("Is a tuple mutable?") != normalize_question("Isn't a tuple mutable?")
+    assert normalize_question("Can a key be reused?") != normalize_question("Can a key never be reused?")
+
+
+def test_wh_words_change_the_key():
+    assert normalize_question("Why does recursion terminate?") != normalize_question("How does recursion terminate?")
+    assert normalize_question("When is the cache cleared?") != normalize_question("Where is the cache cleared?")
+
+
+def test_intent_words_change_the_key():
+    assert normalize_question("Give an example of a closure") != normalize_question("What is a closure?")
+    assert normalize_question("Compare lists and tuples") != normalize_question("Lists and tuples")
+
+
+def test_retrieval_matches_across_plurals():
+    index = BM25Index(["closures capture variables", "loops repeat work"])
+    assert index.top_k(normalize_question("What is a closure?"), 1) == [0]
+
+
+def test_concept_names_ignore_only_form():
+    assert normalize_concept_name("Neural Networks") == normalize_concept_name("neural network")
+    assert normalize_concept_name("The Krebs Cycle!") == normalize_concept_name("krebs cycle")
+    # Words that are phrasing in a question are content in a concept name
+    assert normalize_concept_name("Definition of Done") == "definition done"
+    assert normalize_concept_name("What Is Art") == "art"
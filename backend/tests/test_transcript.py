@@ -0,0 +1,47 @@
+from utils.transcript import clean_caption_text, compact_transcript
+
+
+def _entries(*texts, step=2.0):
+    return [{'start': i * step, 'duration': step, 'text': text} for i, text in enumerate(texts)]
+
+
+def test_stutters_collapse_but_grammatical_doubles_stay():
+    assert clean_caption_text("the the cell divides") == "the cell divides"
+    assert clean_caption_text("so so so many") == "so many"
+    assert clean_caption_text("it was was was stored") == "it was stored"
+    assert clean_caption_text("he had had enough") == "he had had enough"
+    assert clean_caption_text("I know that that works") == "I know that that works"
+    assert clean_caption_text("one one three") == "one one three"
+
+
+def test_rolling_caption_repeats_are_dropped():
+    segments = compact_transcript(_entries(
+        "today we cover",
+        "today we cover the krebs cycle",
+        "the krebs cycle in detail."
+    ))
+    assert [s['text'] for s in segments] == ["today we cover the krebs cycle in detail."]
+
+
+def test_repeats_across_segment_boundaries_are_dropped():
+    segments = compact_transcript(_entries(
+        "glycolysis happens in the cytoplasm.",
+        "in the cytoplasm. next is the krebs cycle."
+    ), min_segment_seconds=1.0)
+    assert [s['text'] for s in segments] == [
+        "glycolysis happens in the cytoplasm.",
+        "next is the krebs cycle."
+    ]
+
+
+def test_repeat_of_an_extended_line_is_dropped():
+    segments = compact_transcript(_entries(
+        "energy is stored as ATP um",
+        "stored as ATP molecules inside cells"
+    ))
+    assert segments[0]['text'] == "energy is stored as ATP um molecules inside cells"
+
+
+def test_single_word_boundary_is_kept_unless_a_stutter():
+    assert compact_transcript(_entries("we know that", "that is true"))[0]['text'] == "we know that that is true"
+    assert compact_transcript(_entries("and then the", "the answer"))[0]['text'] == "and then the answer"
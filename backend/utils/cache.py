@@ -0,0 +1,282 @@
+import json
+import logging
+import os
+import sqlite3
+import threading
+import time
+import zlib
+from collections import OrderedDict
+from typing import Any, Dict, Optional
+
+logger = logging.getLogger(__name__)
+
+_MISSING = object()
+
+# How often a SQLite namespace drops its expired rows while entries are being written
+PURGE_INTERVAL_SECONDS = 3600
+
+
+class LRUCache:
+    """Thread-safe in-process LRU cache with a size bound and per-entry TTLs"""
+
+    def __init__(self, maxsize: int = 1024, ttl: Optional[float] = None):
+        self.maxsize = max(1, int(maxsize))
+        self.ttl = ttl
+        self._data: "OrderedDict[str, tuple]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def get(self, key: str, default: Any = None) -> Any:
+        with self._lock:
+            entry = self._data.get(key, _MISSING)
+            if entry is _MISSING:
+                self.misses += 1
+                return default
+            value, expires_at = entry
+            if expires_at is not None and expires_at <= time.time():
+                del self._data[key]
+                self.misses += 1
+                return default
+            self._data.move_to_end(key)
+            self.hits += 1
+            return value
+
+    def set(self, key: str, value: Any, ttl: Optional[float] = None,
+            expires_at: Optional[float] = None) -> None:
+        """Store value for ttl seconds (default: the cache TTL), or until an absolute
+        expires_at timestamp when one is given"""
+        if expires_at is None:
+            ttl = self.ttl if ttl is None else ttl
+            expires_at = time.time() + ttl if ttl else None
+        with self._lock:
+            self._data[key] = (value, expires_at)
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+                self.evictions += 1
+
+    def delete(self, key: str) -> None:
+        with self._lock:
+            self._data.pop(key, None)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._data.clear()
+
+    def __len__(self) -> int:
+        return len(self._data)
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            size, hits, misses, evictions = len(self._data), self.hits, self.misses, self.evictions
+        total = hits + misses
+        return {
+            'size': size,
+            'maxsize': self.maxsize,
+            'hits': hits,
+            'misses': misses,
+            'evictions': evictions,
+            'hit_rate': hits / total if total else 0.0
+        }
+
+
+class SQLiteCache:
+    """Persistent key/value store backed by SQLite, shared by every process on a node.
+
+    Values are stored as JSON, optionally zlib-compressed, with an absolute expiry time.
+    """
+
+    def __init__(self, path: str, namespace: str = 'default', ttl: Optional[float] = None,
+                 compress: bool = False):
+        self.path = path
+        self.namespace = namespace
+        self.ttl = ttl
+        self.compress = compress
+        self._local = threading.local()
+        self._stats_lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.errors = 0
+        self._last_purge = 0.0
+
+        directory = os.path.dirname(os.path.abspath(path))
+        os.makedirs(directory, exist_ok=True)
+        with self._connect() as conn:
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS cache ("
+                " namespace TEXT NOT NULL,"
+                " key TEXT NOT NULL,"
+                " value BLOB NOT NULL,"
+                " expires_at REAL,"
+                " PRIMARY KEY (namespace, key))"
+            )
+        # Expired rows are otherwise only removed when read again
+        self.purge_expired()
+
+    def _connect(self) -> sqlite3.Connection:
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=5.0, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+        return conn
+
+    def _encode(self, value: Any) -> bytes:
+        raw = json.dumps(value, separators=(',', ':')).encode('utf-8')
+        return zlib.compress(raw, 6) if self.compress else raw
+
+    def _decode(self, blob: bytes) -> Any:
+        raw = zlib.decompress(blob) if self.compress else blob
+        return json.loads(raw.decode('utf-8'))
+
+    def _count(self, counter: str) -> None:
+        with self._stats_lock:
+            setattr(self, counter, getattr(self, counter) + 1)
+
+    def get(self, key: str, default: Any = None) -> Any:
+        return self.get_entry(key, (default, None))[0]
+
+    def get_entry(self, key: str, default: Any = None) -> Any:
+        """(value, expires_at) for a live entry, or default"""
+        try:
+            row = self._connect().execute(
+                "SELECT value, expires_at FROM cache WHERE namespace = ? AND key = ?",
+                (self.namespace, key)
+            ).fetchone()
+        except sqlite3.Error as e:
+            logger.warning(f"Cache read failed for {self.namespace}:{key}: {e}")
+            self._count('errors')
+            return default
+
+        if row is None:
+            self._count('misses')
+            return default
+
+        blob, expires_at = row
+        if expires_at is not None and expires_at <= time.time():
+            self.delete(key)
+            self._count('misses')
+            return default
+
+        try:
+            value = self._decode(blob)
+        except (ValueError, zlib.error) as e:
+            logger.warning(f"Discarding corrupt cache entry {self.namespace}:{key}: {e}")
+            self.delete(key)
+            self._count('errors')
+            return default
+
+        self._count('hits')
+        return value, expires_at
+
+    def set(self, key: str, value: Any, ttl: Optional[float] = None) -> None:
+        ttl = self.ttl if ttl is None else ttl
+        expires_at = time.time() + ttl if ttl else None
+        try:
+            self._connect().execute(
+                "INSERT OR REPLACE INTO cache (namespace, key, value, expires_at) VALUES (?, ?, ?, ?)",
+                (self.namespace, key, sqlite3.Binary(self._encode(value)), expires_at)
+            )
+        except (sqlite3.Error, TypeError, ValueError) as e:
+            logger.warning(f"Cache write failed for {self.namespace}:{key}: {e}")
+            self._count('errors')
+            return
+
+        if time.time() - self._last_purge >= PURGE_INTERVAL_SECONDS:
+            self.purge_expired()
+
+    def delete(self, key: str) -> None:
+        try:
+            self._connect().execute(
+                "DELETE FROM cache WHERE namespace = ? AND key = ?",
+                (self.namespace, key)
+            )
+        except sqlite3.Error as e:
+            logger.warning(f"Cache delete failed for {self.namespace}:{key}: {e}")
+            self._count('errors')
+
+    def purge_expired(self) -> int:
+        """Remove expired entries for this namespace and return how many were dropped"""
+        self._last_purge = time.time()
+        try:
+            cursor = self._connect().execute(
+                "DELETE FROM cache WHERE namespace = ? AND expires_at IS NOT NULL AND expires_at <= ?",
+                (self.namespace, time.time())
+            )
+            return cursor.rowcount
+        except sqlite3.Error as e:
+            logger.warning(f"Cache purge failed for {self.namespace}: {e}")
+            self._count('errors')
+            return 0
+
+    def stats(self) -> Dict[str, Any]:
+        with self._stats_lock:
+            hits, misses, errors = self.hits, self.misses, self.errors
+        total = hits + misses
+        return {
+            'path': self.path,
+            'namespace': self.namespace,
+            'hits': hits,
+            'misses': misses,
+            'errors': errors,
+            'hit_rate': hits / total if total else 0.0
+        }
+
+
+class TieredCache:
+    """Two-tier cache: a bounded in-process LRU in front of a persistent SQLite store"""
+
+    def __init__(self, memory: LRUCache, disk: Optional[SQLiteCache] = None):
+        self.memory = memory
+        self.disk = disk
+        self.misses = 0
+        self._stats_lock = threading.Lock()
+
+    def get(self, key: str, default: Any = None) -> Any:
+        value = self.memory.get(key, _MISSING)
+        if value is not _MISSING:
+            return value
+
+        if self.disk is not None:
+            entry = self.disk.get_entry(key)
+            if entry is not None:
+                value, expires_at = entry
+                # Promote to the memory tier, keeping the disk entry's remaining lifetime
+                self.memory.set(key, value, expires_at=expires_at)
+                return value
+
+        with self._stats_lock:
+            self.misses += 1
+        return default
+
+    def set(self, key: str, value: Any, ttl: Optional[float] = None) -> None:
+        self.memory.set(key, value, ttl=ttl)
+        if self.disk is not None:
+            self.disk.set(key, value, ttl=ttl)
+
+    def delete(self, key: str) -> None:
+        self.memory.delete(key)
+        if self.disk is not None:
+            self.disk.delete(key)
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            'memory': self.memory.stats(),
+            'disk': self.disk.stats() if self.disk is not None else None,
+            'misses': self.misses
+        }
+
+
+def build_tiered_cache(namespace: str, maxsize: int, ttl: Optional[float],
+                       path: Optional[str] = None, compress: bool = False) -> TieredCache:
+    """Create a TieredCache, degrading to memory-only if the disk store can't be opened"""
+    disk = None
+    if path:
+        try:
+            disk = SQLiteCache(path, namespace=namespace, ttl=ttl, compress=compress)
+        except (sqlite3.Error, OSError) as e:
+            logger.warning(f"Persistent cache unavailable for {namespace}, using memory only: {e}")
+    return TieredCache(LRUCache(maxsize=maxsize, ttl=ttl), disk)
@@ -0,0 +1,217 @@
+import atexit
+import hashlib
+import logging
+import multiprocessing
+import os
+import tempfile
+import threading
+import time
+from typing import Any, BinaryIO, Callable, Dict, Iterator, Optional
+
+from PyPDF2 import PdfReader
+from docx import Document as DocxDocument
+from pptx import Presentation
+
+logger = logging.getLogger(__name__)
+
+
+class DocumentExtractionTimeout(Exception):
+    """Raised when a document takes longer than the extraction timeout"""
+
+
+def _iter_pdf_pages(path: str) -> Iterator[str]:
+    reader = PdfReader(path)
+    for page in reader.pages:
+        yield page.extract_text() or ''
+
+
+def _iter_docx_paragraphs(path: str) -> Iterator[str]:
+    doc = DocxDocument(path)
+    for paragraph in doc.paragraphs:
+        yield paragraph.text
+
+
+def _iter_pptx_shapes(path: str) -> Iterator[str]:
+    prs = Presentation(path)
+    for slide in prs.slides:
+        for shape in slide.shapes:
+            if hasattr(shape, 'text'):
+                yield shape.text
+
+
+def _collect(parts: Iterator[str], max_chars: Optional[int]) -> str:
+    """Join parts with newlines, stopping once max_chars characters are collected"""
+    texts = []
+    total = 0
+    for text in parts:
+        texts.append(text)
+        total += len(text) + 1
+        if max_chars is not None and total >= max_chars:
+            break
+    joined = "\n".join(texts)
+    return joined[:max_chars] if max_chars is not None else joined
+
+
+def extract_text_from_pdf(path: Any, max_chars: Optional[int] = None) -> str:
+    """Text of a PDF page by page, parsing no further than max_chars needs"""
+    try:
+        return _collect(_iter_pdf_pages(path), max_chars)
+    except Exception:
+        return ''
+
+
+def extract_text_from_docx(path: Any, max_chars: Optional[int] = None) -> str:
+    """Paragraph text of a DOCX document, up to max_chars"""
+    try:
+        return _collect(_iter_docx_paragraphs(path), max_chars)
+    except Exception:
+        return ''
+
+
+def extract_text_from_pptx(path: Any, max_chars: Optional[int] = None) -> str:
+    """Shape text of a PPTX deck slide by slide, up to max_chars"""
+    try:
+        return _collect(_iter_pptx_shapes(path), max_chars)
+    except Exception:
+        return ''
+
+
+EXTRACTORS: Dict[str, Callable[..., str]] = {
+    '.pdf': extract_text_from_pdf,
+    '.docx': extract_text_from_docx,
+    '.pptx': extract_text_from_pptx,
+}
+
+
+def _extract_in_worker(path: str, ext: str, max_chars: Optional[int]) -> str:
+    return EXTRACTORS[ext](path, max_chars)
+
+
+class SpooledUpload:
+    """An uploaded file copied to a temp file, hashed as it is copied.
+
+    The temp file is what the extraction pool reads; use as a context manager so it is
+    removed once the request no longer needs it.
+    """
+
+    def __init__(self, stream: BinaryIO, ext: str, chunk_size: int = 64 * 1024):
+        self.ext = ext
+        digest = hashlib.sha256(ext.encode('utf-8'))
+        fd, self.path = tempfile.mkstemp(suffix=ext)
+        try:
+            with os.fdopen(fd, 'wb') as spool:
+                for chunk in iter(lambda: stream.read(chunk_size), b''):
+                    digest.update(chunk)
+                    spool.write(chunk)
+        except Exception:
+            self.close()
+            raise
+        self.content_hash = digest.hexdigest()
+
+    def close(self) -> None:
+        try:
+            os.unlink(self.path)
+        except OSError:
+            pass
+
+    def __enter__(self) -> 'SpooledUpload':
+        return self
+
+    def __exit__(self, *exc_info) -> None:
+        self.close()
+
+
+def _pool_context():
+    """Multiprocessing context for extraction workers.
+
+    The web process is threaded (request threads, rate limiters, SQLite, logging), so
+    forking it could leave a child blocked on a lock some other thread held. Workers are
+    instead forked from a single-threaded fork server, which imports the main module and
+    the parsers once; spawn is the fallback where forkserver is unavailable.
+    """
+    if 'forkserver' in multiprocessing.get_all_start_methods():
+        context = multiprocessing.get_context('forkserver')
+        context.set_forkserver_preload(['__main__', __name__])
+        return context
+    return multiprocessing.get_context('spawn')
+
+
+class DocumentExtractor:
+    """Runs document text extraction in a process pool with a hard timeout.
+
+    Parsing happens outside the web worker, so a pathological file can only stall a pool
+    process. When a call times out the pool is terminated and replaced, which is the only
+    way to stop a parser stuck inside a C extension or a runaway loop.
+    """
+
+    def __init__(self, workers: int = 2, timeout: float = 20.0, max_chars: Optional[int] = None,
+                 max_tasks_per_child: int = 50):
+        self.workers = max(workers, 1)
+        self.timeout = timeout
+        self.max_chars = max_chars
+        self.max_tasks_per_child = max_tasks_per_child
+        self._pool = None
+        self._generation = 0
+        self._lock = threading.Lock()
+
+        self.completed = 0
+        self.timeouts = 0
+        self.restarts = 0
+        atexit.register(self.close)
+
+    def _get_pool(self):
+        with self._lock:
+            if self._pool is None:
+                self._pool = _pool_context().Pool(self.workers, maxtasksperchild=self.max_tasks_per_child)
+            return self._pool, self._generation
+
+    def _restart_pool(self, generation: int) -> None:
+        with self._lock:
+            # Another caller may already have replaced the pool after the same stall
+            if self._generation != generation or self._pool is None:
+                return
+            self._pool.terminate()
+            self._pool = None
+            self._generation += 1
+            self.restarts += 1
+
+    def extract(self, path: str, ext: str) -> str:
+        """Extract up to max_chars characters of text from the file at path"""
+        if ext not in EXTRACTORS:
+            raise ValueError(f"Unsupported document type: {ext}")
+
+        # Extractions that were running alongside a stalled one lose their worker when the
+        # pool is replaced; they are resubmitted once to the new pool
+        for _ in range(2):
+            pool, generation = self._get_pool()
+            result = pool.apply_async(_extract_in_worker, (path, ext, self.max_chars))
+            deadline = time.monotonic() + self.timeout
+            while not result.ready():
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    self.timeouts += 1
+                    logger.warning(f"Document extraction timed out after {self.timeout}s; restarting pool")
+                    self._restart_pool(generation)
+                    raise DocumentExtractionTimeout(f"Extraction exceeded {self.timeout}s")
+                result.wait(min(remaining, 0.5))
+                if self._generation != generation:
+                    break
+            else:
+                self.completed += 1
+                return result.get()
+        raise DocumentExtractionTimeout("Extraction interrupted by a stalled document")
+
+    def close(self) -> None:
+        with self._lock:
+            if self._pool is not None:
+                self._pool.terminate()
+                self._pool = None
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            'workers': self.workers,
+            'timeout_seconds': self.timeout,
+            'completed': self.completed,
+            'timeouts': self.timeouts,
+            'restarts': self.restarts
+        }
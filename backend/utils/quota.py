@@ -0,0 +1,161 @@
+import logging
+import os
+import sqlite3
+import threading
+import time
+from typing import Any, Dict, Optional
+
+logger = logging.getLogger(__name__)
+
+# YouTube Data API v3 quota cost per call type
+QUOTA_COSTS = {
+    'videos.list': 1,
+    'search.list': 100,
+}
+
+_WINDOW_SECONDS = 24 * 3600
+_BUCKET_SECONDS = 60
+
+
+class QuotaLedger:
+    """Rolling 24-hour ledger of YouTube Data API quota units.
+
+    Usage is recorded in per-minute buckets in SQLite so every worker process on the
+    node charges the same budget. Each call type may only spend up to its cutoff
+    fraction of the daily limit, which lets optional calls such as search be shed
+    before metadata lookups are refused.
+    """
+
+    def __init__(self, daily_limit: int, cutoffs: Optional[Dict[str, float]] = None,
+                 path: Optional[str] = None):
+        self.daily_limit = daily_limit
+        self.cutoffs = cutoffs or {}
+        self.path = path
+        self._lock = threading.Lock()
+        self._local = threading.local()
+        # In-memory buckets used when no SQLite path is configured or it can't be opened
+        self._memory: Dict[tuple, int] = {}
+        self.refused: Dict[str, int] = {}
+
+        if path:
+            try:
+                os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+                self._connect().execute(
+                    "CREATE TABLE IF NOT EXISTS quota_usage ("
+                    " bucket INTEGER NOT NULL,"
+                    " call_type TEXT NOT NULL,"
+                    " units INTEGER NOT NULL,"
+                    " PRIMARY KEY (bucket, call_type))"
+                )
+            except (sqlite3.Error, OSError) as e:
+                logger.warning(f"Persistent quota ledger unavailable, tracking in memory only: {e}")
+                self.path = None
+
+    def _connect(self) -> sqlite3.Connection:
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=5.0, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            self._local.conn = conn
+        return conn
+
+    def _bucket(self, now: float) -> int:
+        return int(now // _BUCKET_SECONDS)
+
+    def _usage(self, conn: Optional[sqlite3.Connection], now: float) -> Dict[str, int]:
+        oldest = self._bucket(now - _WINDOW_SECONDS)
+        if conn is None:
+            usage: Dict[str, int] = {}
+            for (bucket, call_type), units in list(self._memory.items()):
+                if bucket <= oldest:
+                    del self._memory[(bucket, call_type)]
+                else:
+                    usage[call_type] = usage.get(call_type, 0) + units
+            return usage
+
+        conn.execute("DELETE FROM quota_usage WHERE bucket <= ?", (oldest,))
+        rows = conn.execute(
+            "SELECT call_type, SUM(units) FROM quota_usage WHERE bucket > ? GROUP BY call_type",
+            (oldest,)
+        ).fetchall()
+        return {call_type: int(units) for call_type, units in rows}
+
+    def _record(self, conn: Optional[sqlite3.Connection], call_type: str, units: int, now: float) -> None:
+        bucket = self._bucket(now)
+        if conn is None:
+            self._memory[(bucket, call_type)] = self._memory.get((bucket, call_type), 0) + units
+            return
+        conn.execute(
+            "INSERT INTO quota_usage (bucket, call_type, units) VALUES (?, ?, ?) "
+            "ON CONFLICT(bucket, call_type) DO UPDATE SET units = units + excluded.units",
+            (bucket, call_type, units)
+        )
+
+    def try_charge(self, call_type: str) -> bool:
+        """Charge one call if the budget allows it; returns False when the call should be skipped"""
+        cost = QUOTA_COSTS.get(call_type, 1)
+        allowance = self.daily_limit * self.cutoffs.get(call_type, 1.0)
+        now = time.time()
+
+        with self._lock:
+            try:
+                conn = self._connect() if self.path else None
+                if conn is not None:
+                    # Serialize check-and-charge across processes
+                    conn.execute("BEGIN IMMEDIATE")
+                try:
+                    used = sum(self._usage(conn, now).values())
+                    allowed = used + cost <= allowance
+                    if allowed:
+                        self._record(conn, call_type, cost, now)
+                    if conn is not None:
+                        conn.execute("COMMIT")
+                except Exception:
+                    if conn is not None:
+                        conn.execute("ROLLBACK")
+                    raise
+            except sqlite3.Error as e:
+                # Never block upstream calls because bookkeeping failed
+                logger.warning(f"Quota ledger error, allowing {call_type}: {e}")
+                return True
+
+            if not allowed:
+                self.refused[call_type] = self.refused.get(call_type, 0) + 1
+                logger.warning(f"Skipping {call_type}: {used} of {self.daily_limit} quota units used in the last 24h")
+            return allowed
+
+    def mark_exhausted(self) -> None:
+        """Record the rest of the budget as spent after the API reports quota exhaustion"""
+        now = time.time()
+        with self._lock:
+            try:
+                conn = self._connect() if self.path else None
+                remaining = self.daily_limit - sum(self._usage(conn, now).values())
+                if remaining > 0:
+                    self._record(conn, 'exhausted', remaining, now)
+            except sqlite3.Error as e:
+                logger.warning(f"Quota ledger error while marking exhaustion: {e}")
+
+    def status(self) -> Dict[str, Any]:
+        """Rolling 24-hour usage by call type and which call types are still allowed"""
+        now = time.time()
+        with self._lock:
+            try:
+                usage = self._usage(self._connect() if self.path else None, now)
+            except sqlite3.Error as e:
+                logger.warning(f"Quota ledger error while reading status: {e}")
+                usage = {}
+
+        used = sum(usage.values())
+        return {
+            'daily_limit': self.daily_limit,
+            'used_units': used,
+            'remaining_units': max(self.daily_limit - used, 0),
+            'usage_by_call_type': usage,
+            'window_hours': _WINDOW_SECONDS // 3600,
+            'allowed': {
+                call_type: used + cost <= self.daily_limit * self.cutoffs.get(call_type, 1.0)
+                for call_type, cost in QUOTA_COSTS.items()
+            },
+            'refused': dict(self.refused)
+        }
@@ -0,0 +1,202 @@
+import logging
+import random
+import re
+import threading
+import time
+from typing import Any, Dict, Optional
+
+from config import Config
+from utils.metrics import counter, histogram
+
+logger = logging.getLogger(__name__)
+
+RATE_LIMIT_WAIT_SECONDS = histogram(
+    'studyweave_rate_limiter_wait_seconds',
+    'Time callers were held by an upstream rate limiter before sending a request',
+    ['upstream'],
+    buckets=(0.0, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+)
+# Incremented by the services' retry loops, one series per upstream
+UPSTREAM_RETRIES = counter(
+    'studyweave_upstream_retries_total',
+    'Upstream calls retried after a failed attempt',
+    ['upstream']
+)
+
+# Server retry hints as they appear in error messages, e.g. Gemini's
+# "retry_delay { seconds: 17 }" or "Please retry in 17.5s"
+_RETRY_HINT_PATTERNS = (
+    re.compile(r'retry_delay\s*\{\s*seconds:\s*(\d+(?:\.\d+)?)', re.IGNORECASE),
+    re.compile(r'retry (?:in|after)\s*(\d+(?:\.\d+)?)\s*s', re.IGNORECASE),
+)
+
+
+class RateLimiter:
+    """Thread-safe token bucket for one upstream, with backoff and wait-time metrics.
+
+    acquire() blocks until a request may be sent. Rate-limit responses should be reported
+    with penalize(), which pauses every caller of this upstream, honouring the server's
+    retry hint when one is available.
+    """
+
+    def __init__(self, name: str, rate: float, burst: float = 1.0,
+                 backoff_base: float = 0.5, backoff_max: float = 30.0):
+        self.name = name
+        self.rate = max(rate, 1e-6)
+        self.capacity = max(burst, 1.0)
+        self.backoff_base = backoff_base
+        self.backoff_max = backoff_max
+        self._tokens = self.capacity
+        self._updated = time.monotonic()
+        self._paused_until = 0.0
+        self._lock = threading.Lock()
+
+        self.acquisitions = 0
+        self.throttled = 0
+        self.penalties = 0
+        self.backoffs = 0
+        self.wait_seconds = 0.0
+        self.backoff_seconds = 0.0
+
+    def acquire(self, tokens: float = 1.0) -> float:
+        """Block until tokens are available; returns the seconds spent waiting"""
+        waited = 0.0
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+                self._updated = now
+
+                if now >= self._paused_until and self._tokens >= tokens:
+                    self._tokens -= tokens
+                    self.acquisitions += 1
+                    if waited:
+                        self.throttled += 1
+                        self.wait_seconds += waited
+                    RATE_LIMIT_WAIT_SECONDS.observe(waited, upstream=self.name)
+                    return waited
+
+                delay = max(self._paused_until - now, (tokens - self._tokens) / self.rate)
+
+            time.sleep(delay)
+            waited += delay
+
+    def penalize(self, retry_after: Optional[float] = None, attempt: int = 0) -> float:
+        """Pause this upstream for every caller after a rate-limit response"""
+        delay = retry_after if retry_after is not None else self._backoff_delay(attempt)
+        with self._lock:
+            self._paused_until = max(self._paused_until, time.monotonic() + delay)
+            self._tokens = 0.0
+            self.penalties += 1
+        logger.warning(f"Rate limited by {self.name}; pausing requests for {delay:.1f}s")
+        return delay
+
+    def backoff(self, attempt: int) -> float:
+        """Sleep before retrying a failed call: exponential backoff with full jitter.
+
+        Rate-limit responses go through penalize() instead, which honours retry hints.
+        """
+        delay = self._backoff_delay(attempt)
+        with self._lock:
+            self.backoffs += 1
+            self.backoff_seconds += delay
+        time.sleep(delay)
+        return delay
+
+    def _backoff_delay(self, attempt: int) -> float:
+        ceiling = min(self.backoff_max, self.backoff_base * (2 ** max(attempt, 0)))
+        return random.uniform(0.0, ceiling)
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                'rate_per_second': self.rate,
+                'burst': self.capacity,
+                'acquisitions': self.acquisitions,
+                'throttled': self.throttled,
+                'wait_seconds': round(self.wait_seconds, 3),
+                'penalties': self.penalties,
+                'backoffs': self.backoffs,
+                'backoff_seconds': round(self.backoff_seconds, 3)
+            }
+
+
+def retry_after_from_error(error: Exception) -> Optional[float]:
+    """Extract a server-provided retry delay from an upstream error, if any"""
+    resp = getattr(error, 'resp', None)
+    if resp is not None and hasattr(resp, 'get'):
+        header = resp.get('retry-after')
+        if header:
+            try:
+                return float(header)
+            except (TypeError, ValueError):
+                pass
+
+    message = str(error)
+    for pattern in _RETRY_HINT_PATTERNS:
+        match = pattern.search(message)
+        if match:
+            return float(match.group(1))
+    return None
+
+
+def is_rate_limit_error(error: Exception) -> bool:
+    """Whether an upstream error means we were throttled.
+
+    HTTP errors are judged by status: 429, or the YouTube Data API's 403 with a
+    rateLimitExceeded reason. Otherwise the exception type decides; message text is only
+    matched for Gemini's RESOURCE_EXHAUSTED, which some client versions wrap generically.
+    """
+    resp = getattr(error, 'resp', None)
+    status = getattr(resp, 'status', None)
+    if status is not None:
+        try:
+            status = int(status)
+        except (TypeError, ValueError):
+            return False
+        if status == 403:
+            content = getattr(error, 'content', b'') or b''
+            if isinstance(content, bytes):
+                content = content.decode('utf-8', 'replace')
+            return 'ratelimitexceeded' in content.lower()  # also userRateLimitExceeded
+        return status == 429
+
+    if getattr(error, 'code', None) == 429 or type(error).__name__ in ('ResourceExhausted', 'TooManyRequests'):
+        return True
+    message = str(error).lower()
+    return 'resource exhausted' in message or 'resource_exhausted' in message
+
+
+_limiters: Dict[str, RateLimiter] = {}
+_limiters_lock = threading.Lock()
+
+
+def get_rate_limiter(name: str, rate: float, burst: float = 1.0, **kwargs) -> RateLimiter:
+    """Process-wide limiter for an upstream; created on first use and shared afterwards"""
+    with _limiters_lock:
+        limiter = _limiters.get(name)
+        if limiter is None:
+            limiter = RateLimiter(name, rate, burst, **kwargs)
+            _limiters[name] = limiter
+        return limiter
+
+
+def upstream_limiter(upstream: str) -> RateLimiter:
+    """Configured process-wide limiter for 'gemini', 'youtube_data' or 'transcript'"""
+    limits = {
+        'gemini': (Config.GEMINI_RATE_PER_SECOND, Config.GEMINI_BURST),
+        'youtube_data': (Config.YOUTUBE_DATA_RATE_PER_SECOND, Config.YOUTUBE_DATA_BURST),
+        'transcript': (Config.TRANSCRIPT_RATE_PER_SECOND, Config.TRANSCRIPT_BURST),
+    }
+    rate, burst = limits[upstream]
+    return get_rate_limiter(
+        upstream, rate, burst,
+        backoff_base=Config.BACKOFF_BASE_SECONDS,
+        backoff_max=Config.BACKOFF_MAX_SECONDS
+    )
+
+
+def rate_limiter_stats() -> Dict[str, Dict[str, Any]]:
+    with _limiters_lock:
+        limiters = dict(_limiters)
+    return {name: limiter.stats() for name, limiter in limiters.items()}
@@ -0,0 +1,158 @@
+import bisect
+import math
+import re
+from collections import Counter, defaultdict
+from typing import Any, Dict, List
+
+import numpy as np
+
+_TOKEN_PATTERN = re.compile(r"[a-z0-9]+(?:'[a-z]+)?")
+
+STOPWORDS = frozenset("""
+a about above after again all am an and any are as at be because been before being below
+between both but by can could did do does doing down during each few for from further had
+has have having he her here hers him his how i if in into is it its itself just me more most
+my no nor not now of off on once only or other our out over own same she should so some such
+than that the their them then there these they this those through to too under until up very
+was we were what when where which while who whom why will with would you your yours
+""".split())
+
+
+# Phrasing that changes how a question is asked but not what it asks about
+QUESTION_FILLER_WORDS = frozenset("""
+explain explained explaining describe define definition meaning mean means tell please
+understand know help show give simple simply briefly exactly actually
+""".split())
+
+# Stopwords that change what a question asks, kept in answer cache keys. "what" is not
+# one: "what is X", "explain X" and "tell me about X" all ask for the same answer
+QUESTION_INTENT_WORDS = frozenset("""
+not no nor never why how when where which who whom
+""".split())
+
+
+def _fold_plural(token: str) -> str:
+    """Strip a simple plural 's' ("closures" -> "closure", but not "class")"""
+    if len(token) > 3 and token.endswith('s') and not token.endswith('ss'):
+        return token[:-1]
+    return token
+
+
+def tokenize(text: str) -> List[str]:
+    """Lowercase word tokens with stopwords removed and simple plurals folded"""
+    return [
+        _fold_plural(token) for token in _TOKEN_PATTERN.findall((text or '').lower())
+        if token not in STOPWORDS
+    ]
+
+
+def normalize_question(text: str) -> str:
+    """Canonical form of a question for cache keys.
+
+    Case, punctuation, stopwords, neutral phrasing ("what is", "explain", "define",
+    "tell me about"), simple plurals and word order are ignored, so "What is X?" and
+    "explain x" normalize to the same key. Negations, the wh-words other than "what"
+    and intent words such as "example" or "compare" are kept, since they change which
+    answer is right.
+    """
+    tokens = set()
+    for token in _TOKEN_PATTERN.findall((text or '').lower()):
+        if token.endswith("n't"):
+            # "isn't", "doesn't": the auxiliary is a stopword, the negation is not
+            tokens.add('not')
+            continue
+        token = token.split("'")[0]  # "what's", "python's"
+        if token in STOPWORDS and token not in QUESTION_INTENT_WORDS:
+            continue
+        if token in QUESTION_FILLER_WORDS:
+            continue
+        tokens.add(_fold_plural(token))
+    return ' '.join(sorted(tokens))
+
+
+def normalize_concept_name(name: str) -> str:
+    """Canonical form of a concept name for deduplication: lowercase words with
+    punctuation and stopwords removed and simple plurals folded, sorted. Unlike
+    normalize_question, no word is treated as phrasing or intent."""
+    return ' '.join(sorted(set(tokenize(name))))
+
+
+class BM25Index:
+    """Okapi BM25 lexical index over a fixed list of documents, scored with NumPy.
+
+    Postings are stored per term as parallel (document index, term frequency) arrays,
+    so a query only touches the documents that contain its terms.
+    """
+
+    def __init__(self, documents: List[str], k1: float = 1.5, b: float = 0.75):
+        self.k1 = k1
+        self.b = b
+        self.size = len(documents)
+
+        doc_lengths = np.zeros(self.size, dtype=np.float64)
+        postings: Dict[str, List[tuple]] = defaultdict(list)
+        for doc_index, document in enumerate(documents):
+            tokens = tokenize(document)
+            doc_lengths[doc_index] = len(tokens)
+            for term, frequency in Counter(tokens).items():
+                postings[term].append((doc_index, frequency))
+
+        average_length = doc_lengths.mean() if self.size and doc_lengths.mean() > 0 else 1.0
+        # Per-document length normalisation term of the BM25 denominator
+        self._length_norm = k1 * (1 - b + b * doc_lengths / average_length)
+
+        self._postings: Dict[str, tuple] = {}
+        for term, entries in postings.items():
+            doc_ids = np.fromiter((doc for doc, _ in entries), dtype=np.int64, count=len(entries))
+            freqs = np.fromiter((freq for _, freq in entries), dtype=np.float64, count=len(entries))
+            idf = math.log(1 + (self.size - len(entries) + 0.5) / (len(entries) + 0.5))
+            self._postings[term] = (doc_ids, freqs, idf)
+
+    def scores(self, query: str) -> np.ndarray:
+        """BM25 score of every document for the query"""
+        scores = np.zeros(self.size, dtype=np.float64)
+        for term in set(tokenize(query)):
+            posting = self._postings.get(term)
+            if posting is None:
+                continue
+            doc_ids, freqs, idf = posting
+            scores[doc_ids] += idf * freqs * (self.k1 + 1) / (freqs + self._length_norm[doc_ids])
+        return scores
+
+    def top_k(self, query: str, k: int) -> List[int]:
+        """Indices of the k best-matching documents with a positive score, best first"""
+        if not self.size or k <= 0:
+            return []
+        scores = self.scores(query)
+        k = min(k, self.size)
+        candidates = np.argpartition(-scores, k - 1)[:k]
+        ranked = candidates[np.argsort(-scores[candidates], kind='stable')]
+        return [int(index) for index in ranked if scores[index] > 0]
+
+
+class TranscriptIndex:
+    """Lexical and positional lookup over compacted transcript segments.
+
+    Segments are in timeline order, so a sorted start-time array supports O(log n)
+    selection of the context around a playback position.
+    """
+
+    def __init__(self, segments: List[Dict[str, Any]]):
+        self.segments = segments
+        self.starts = [segment['start'] for segment in segments]
+        self.bm25 = BM25Index([segment['text'] for segment in segments])
+
+    def between(self, start_seconds: float, end_seconds: float) -> List[Dict[str, Any]]:
+        """Segments overlapping [start_seconds, end_seconds], in timeline order"""
+        # The segment in progress at start_seconds begins at or before it
+        first = max(bisect.bisect_right(self.starts, start_seconds) - 1, 0)
+        last = bisect.bisect_right(self.starts, end_seconds)
+        return [
+            segment for segment in self.segments[first:last]
+            if segment['end'] >= start_seconds
+        ]
+
+    def search(self, query: str, k: int) -> List[Dict[str, Any]]:
+        """Top-k relevant segments for the query, returned in timeline order"""
+        hits = self.bm25.top_k(query, k)
+        return [self.segments[index] for index in sorted(hits)]
@@ -0,0 +1,97 @@
+import threading
+from typing import Any, Callable, Dict, Hashable, Optional
+
+
+class _Call:
+    __slots__ = ('event', 'result', 'error', 'context')
+
+    def __init__(self):
+        self.event = threading.Event()
+        self.result = None
+        self.error = None
+        self.context: Dict[str, Any] = {}
+
+
+class SingleFlight:
+    """Coalesce concurrent identical computations.
+
+    The first caller for a key runs the function; callers arriving while it is in flight
+    wait and receive the same result (or exception). Nothing is remembered once the
+    call completes, so this complements caches rather than replacing them.
+    """
+
+    def __init__(self, name: str):
+        self.name = name
+        self._calls: Dict[Hashable, _Call] = {}
+        self._lock = threading.Lock()
+        self.executed = 0
+        self.coalesced = 0
+
+    def do(self, key: Hashable, fn: Callable[[], Any],
+           join: Optional[Callable[[Dict[str, Any]], None]] = None) -> Any:
+        """Run fn, or wait for the in-flight call with the same key.
+
+        join, if given, is called with a context dict shared by every caller of one call.
+        It runs under the group lock as the caller joins, before the leader starts fn, so
+        per-call state such as progress subscribers lives and dies with the call itself.
+        """
+        with self._lock:
+            call = self._calls.get(key)
+            if call is None:
+                call = _Call()
+                self._calls[key] = call
+                self.executed += 1
+                leader = True
+            else:
+                self.coalesced += 1
+                leader = False
+            if join is not None:
+                join(call.context)
+
+        if not leader:
+            call.event.wait()
+            if call.error is not None:
+                raise call.error
+            return call.result
+
+        try:
+            call.result = fn()
+        except BaseException as e:
+            call.error = e
+            raise
+        finally:
+            with self._lock:
+                del self._calls[key]
+            call.event.set()
+        return call.result
+
+    def in_flight(self) -> int:
+        with self._lock:
+            return len(self._calls)
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            'executed': self.executed,
+            'coalesced': self.coalesced,
+            'in_flight': self.in_flight()
+        }
+
+
+_flights: Dict[str, SingleFlight] = {}
+_flights_lock = threading.Lock()
+
+
+def get_single_flight(name: str) -> SingleFlight:
+    """Process-wide coalescing group; created on first use and shared afterwards"""
+    with _flights_lock:
+        flight = _flights.get(name)
+        if flight is None:
+            flight = SingleFlight(name)
+            _flights[name] = flight
+        return flight
+
+
+def single_flight_stats() -> Dict[str, Dict[str, Any]]:
+    with _flights_lock:
+        flights = dict(_flights)
+    return {name: flight.stats() for name, flight in flights.items()}
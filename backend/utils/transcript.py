@@ -0,0 +1,144 @@
+import math
+import re
+from typing import Any, Dict, List
+
+# Caption noise such as [Music], [Applause], (laughter) and ">>" speaker-change markers
+_NOISE_PATTERN = re.compile(r'\[[^\]]*\]|\([^)]*(?:music|applause|laughter|inaudible)[^)]*\)|>>', re.IGNORECASE)
+_REPEATED_WORD_PATTERN = re.compile(r'\b(\w+)((?:\s+\1\b)+)', re.IGNORECASE)
+_SENTENCE_END_PATTERN = re.compile(r'[.!?]["\')\]]?$')
+
+# Words whose doubling is a stutter ("the the", "I I"); other words are only collapsed
+# at three or more, since "had had" or "that that" can be grammatical
+_STUTTER_WORDS = frozenset("a an and i so the to uh um uhm er erm".split())
+
+# Longest word overlap checked when auto-captions repeat recently spoken words, and the
+# trailing window searched for it; repeats not at the very end need a few words to count
+_MAX_OVERLAP_WORDS = 12
+_OVERLAP_WINDOW_WORDS = 24
+_MIN_INNER_OVERLAP_WORDS = 3
+
+
+def format_timestamp(seconds: float) -> str:
+    """Format seconds as MM:SS, or H:MM:SS past the first hour"""
+    total = int(seconds)
+    hours, remainder = divmod(total, 3600)
+    minutes, secs = divmod(remainder, 60)
+    if hours:
+        return f"{hours}:{minutes:02d}:{secs:02d}"
+    return f"{minutes:02d}:{secs:02d}"
+
+
+def estimate_tokens(text: str) -> int:
+    """Rough token count for English text (~4 characters per token)"""
+    return max(1, (len(text) + 3) // 4)
+
+
+def clean_caption_text(text: str) -> str:
+    """Strip caption noise markers and collapse stuttered repeated words"""
+    text = _NOISE_PATTERN.sub(' ', text or '')
+    text = _REPEATED_WORD_PATTERN.sub(_collapse_repeat, text)
+    return ' '.join(text.split())
+
+
+def _collapse_repeat(match: 're.Match') -> str:
+    word = match.group(1)
+    if word.lower() in _STUTTER_WORDS or len(match.group(2).split()) >= 2:
+        return word
+    return match.group(0)
+
+
+def _strip_overlap(recent: List[str], current: List[str]) -> List[str]:
+    """Drop the leading words of current that were already spoken in recent.
+
+    recent is the trailing word window across segment boundaries. A repeat of its tail
+    counts from two words (one for stutter words); a run matching further back, as when
+    captions re-emit a line that has since been extended, needs _MIN_INNER_OVERLAP_WORDS.
+    """
+    window = [w.lower() for w in recent[-_OVERLAP_WINDOW_WORDS:]]
+    head = [w.lower() for w in current[:_MAX_OVERLAP_WORDS]]
+    for size in range(min(len(window), len(head)), 0, -1):
+        prefix = head[:size]
+        if window[-size:] == prefix and (size > 1 or prefix[0] in _STUTTER_WORDS):
+            return current[size:]
+        if size >= _MIN_INNER_OVERLAP_WORDS and any(
+            window[i:i + size] == prefix for i in range(len(window) - size)
+        ):
+            return current[size:]
+    return current
+
+
+def compact_transcript(transcript: List[Dict[str, Any]], max_segment_seconds: float = 30.0,
+                       min_segment_seconds: float = 8.0) -> List[Dict[str, Any]]:
+    """Merge caption fragments into sentence- or window-level segments.
+
+    Noise is stripped, spans repeated across consecutive fragments are collapsed, and
+    a segment closes at a sentence end once it is at least min_segment_seconds long,
+    or unconditionally once it reaches max_segment_seconds.
+    Returns segments of the form {'start', 'end', 'text'}.
+    """
+    segments: List[Dict[str, Any]] = []
+    words: List[str] = []
+    recent: List[str] = []  # trailing words, kept across segment boundaries
+    segment_start = 0.0
+    segment_end = 0.0
+
+    def close_segment():
+        if words:
+            segments.append({'start': segment_start, 'end': segment_end, 'text': ' '.join(words)})
+
+    for entry in transcript:
+        text = clean_caption_text(str(entry.get('text', '')))
+        if not text:
+            continue
+        start = float(entry.get('start', 0))
+        end = start + float(entry.get('duration', 0))
+
+        fragment = _strip_overlap(recent, text.split())
+        if not fragment:
+            segment_end = max(segment_end, end)
+            continue
+
+        if not words:
+            segment_start = start
+        words.extend(fragment)
+        recent = (recent + fragment)[-_OVERLAP_WINDOW_WORDS:]
+        segment_end = max(segment_end, end)
+
+        duration = segment_end - segment_start
+        if duration >= max_segment_seconds or (
+            duration >= min_segment_seconds and _SENTENCE_END_PATTERN.search(words[-1])
+        ):
+            close_segment()
+            words = []
+
+    close_segment()
+    return segments
+
+
+def format_segments(segments: List[Dict[str, Any]], token_budget: int) -> str:
+    """Render segments as '[MM:SS] text' lines that fit within token_budget.
+
+    When everything does not fit, segments are sampled at an even stride across the
+    whole timeline rather than cut at the front, so coverage spans the full video.
+    """
+    lines = [f"[{format_timestamp(segment['start'])}] {segment['text']}" for segment in segments]
+    if not lines:
+        return ''
+
+    costs = [estimate_tokens(line) + 1 for line in lines]
+    total = sum(costs)
+    if total <= token_budget:
+        return "\n".join(lines)
+
+    stride = max(1, math.ceil(total / max(token_budget, 1)))
+    selected = set()
+    used = 0
+    # Evenly spaced pass first, then offset passes fill any remaining budget evenly
+    for offset in range(stride):
+        for index in range(offset, len(lines), stride):
+            if used + costs[index] > token_budget:
+                continue
+            selected.add(index)
+            used += costs[index]
+
+    return "\n".join(lines[index] for index in sorted(selected))